@@ -1,8 +1,38 @@
 from django.contrib import admin
-from .models import Servicio
+from django.db.models import Count, Q
+from .models import ImportacionCatalogo, Paquete, PaqueteItem, Servicio
 
 @admin.register(Servicio)
 class ServicioAdmin(admin.ModelAdmin):
     list_display = ('codigo', 'nombre', 'area', 'pvp_sugerido', 'activo')
     search_fields = ('codigo', 'nombre', 'area')
     list_filter = ('area', 'activo')
+
+
+@admin.register(ImportacionCatalogo)
+class ImportacionCatalogoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre_original', 'estado', 'creada', 'procesados', 'total_rechazos')
+    list_filter = ('estado',)
+
+
+class PaqueteItemInline(admin.TabularInline):
+    model = PaqueteItem
+    extra = 1
+    raw_id_fields = ('servicio',)
+
+
+@admin.register(Paquete)
+class PaqueteAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'activo', 'no_disponibles')
+    search_fields = ('nombre',)
+    list_filter = ('activo',)
+    inlines = [PaqueteItemInline]
+
+    def get_queryset(self, request):
+        # Ítems cuyo servicio se borró del catálogo.
+        return super().get_queryset(request).annotate(
+            _no_disponibles=Count('items', filter=Q(items__servicio__isnull=True)))
+
+    @admin.display(description='Servicios no disponibles', ordering='_no_disponibles')
+    def no_disponibles(self, obj):
+        return obj._no_disponibles
@@ -0,0 +1,23 @@
+"""Filas del catálogo para exportar a CSV o XLSX (ver ``config.tablas``).
+
+Las cuatro primeras columnas son las que lee la importación
+(``codigo, nombre, area, precio``), así que el archivo exportado se puede
+volver a importar tal cual.
+"""
+from .models import Servicio
+
+TAMANO_BLOQUE = 2000
+ENCABEZADOS = [
+    "codigo", "nombre", "area", "precio", "costo_base",
+    "pvp_corporativo", "porcentaje_ganancia", "activo",
+]
+
+
+def filas(solo_activos=False):
+    qs = Servicio.objects.order_by("codigo")
+    if solo_activos:
+        qs = qs.filter(activo=True)
+    columnas = qs.values_list("codigo", "nombre", "area", "pvp_sugerido", "costo_base",
+                              "pvp_corporativo", "porcentaje_ganancia", "activo")
+    for codigo, nombre, area, precio, costo, corporativo, ganancia, activo in columnas.iterator(chunk_size=TAMANO_BLOQUE):
+        yield codigo, nombre, area or "", precio, costo, corporativo, ganancia, "sí" if activo else "no"
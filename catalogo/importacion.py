@@ -0,0 +1,301 @@
+"""Importación del catálogo desde Excel (.xlsx) o CSV.
+
+El archivo se lee fila por fila (openpyxl en modo ``read_only`` o ``csv``),
+las filas se validan y se agrupan en lotes. Hay dos formas de aplicarlos:
+
+* reemplazar: cada lote se escribe con ``bulk_create`` haciendo *upsert* por
+  ``codigo`` y al final se borran los códigos que no venían en el archivo.
+* sincronizar: se compara el archivo con el catálogo actual y solo se
+  escriben las altas, los cambios y las desactivaciones (``activo=False``).
+
+Las columnas esperadas son ``codigo, nombre, area, precio`` y la primera fila
+es el encabezado.
+"""
+import csv
+import os
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+import openpyxl
+from django.db import transaction
+
+from . import indice, precios
+from .models import Servicio
+
+TAMANO_LOTE = 1000
+MAX_RECHAZOS = 200
+_PRECIO_MAXIMO = Decimal("99999999.99")
+_CAMPOS_UPSERT = [
+    "nombre", "area", "costo_base", "pvp_sugerido",
+    "pvp_corporativo", "porcentaje_ganancia", "activo",
+]
+# Campos que el archivo determina y que se comparan al sincronizar.
+_CAMPOS_SYNC = ["nombre", "area", "costo_base", "pvp_sugerido", "pvp_corporativo", "activo"]
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+@dataclass
+class ResultadoImportacion:
+    procesados: int = 0
+    eliminados: int = 0
+    total_rechazos: int = 0
+    rechazos: list = field(default_factory=list)
+    segundos: float = 0.0
+
+    @property
+    def filas_por_segundo(self):
+        return (self.procesados + self.total_rechazos) / self.segundos if self.segundos else 0.0
+
+    def rechazar(self, numero, motivo):
+        self.total_rechazos += 1
+        if len(self.rechazos) < MAX_RECHAZOS:
+            self.rechazos.append((numero, motivo))
+
+
+@dataclass
+class CambiosCatalogo:
+    """Diferencias entre un archivo y el catálogo, listas para aplicar."""
+
+    nuevos: list = field(default_factory=list)
+    actualizados: list = field(default_factory=list)
+    desactivados: list = field(default_factory=list)  # (id, codigo)
+    sin_cambios: int = 0
+    leidos: int = 0
+
+    @property
+    def total(self):
+        return len(self.nuevos) + len(self.actualizados) + len(self.desactivados)
+
+    def resumen(self, ejemplos=10):
+        return {
+            "nuevos": len(self.nuevos),
+            "actualizados": len(self.actualizados),
+            "desactivados": len(self.desactivados),
+            "sin_cambios": self.sin_cambios,
+            "ejemplos": {
+                "nuevos": [f"{s.codigo} - {s.nombre}" for s in self.nuevos[:ejemplos]],
+                "actualizados": [f"{s.codigo} - {s.nombre}" for s in self.actualizados[:ejemplos]],
+                "desactivados": [codigo for _, codigo in self.desactivados[:ejemplos]],
+            },
+        }
+
+
+def leer_filas(ruta):
+    """Genera ``(numero_de_fila, valores)`` sin cargar el archivo completo."""
+    if os.path.splitext(ruta)[1].lower() == ".csv":
+        with open(ruta, newline="", encoding="utf-8-sig") as f:
+            muestra = f.read(4096)
+            f.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+            except csv.Error:
+                dialecto = csv.excel
+            lector = csv.reader(f, dialecto)
+            next(lector, None)
+            for numero, fila in enumerate(lector, start=2):
+                yield numero, fila
+        return
+
+    wb = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        for numero, fila in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2):
+            yield numero, fila
+    finally:
+        wb.close()
+
+
+def estimar_filas(ruta):
+    """Cantidad aproximada de filas de datos, o ``None`` si no se conoce."""
+    if os.path.splitext(ruta)[1].lower() == ".csv":
+        return None
+    wb = openpyxl.load_workbook(ruta, read_only=True)
+    try:
+        total = wb.active.max_row
+    finally:
+        wb.close()
+    return total - 1 if total else None
+
+
+def _texto(valor, largo, nombre):
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    texto = str(valor).strip() if valor is not None else ""
+    if len(texto) > largo:
+        raise FilaInvalida(f"{nombre} supera {largo} caracteres")
+    return texto
+
+
+def _precio(valor):
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        return Decimal("0.00")
+    try:
+        if isinstance(valor, str):
+            valor = valor.strip().replace("$", "")
+            if "," in valor and "." not in valor:
+                valor = valor.replace(",", ".")
+        precio = Decimal(str(valor)).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        raise FilaInvalida(f"precio inválido: {valor!r}")
+    if precio < 0 or precio > _PRECIO_MAXIMO:
+        raise FilaInvalida(f"precio fuera de rango: {precio}")
+    return precio
+
+
+def convertir_fila(valores):
+    """Valida una fila y devuelve un ``Servicio`` sin guardar (o ``None`` si está vacía)."""
+    valores = list(valores[:4]) + [None] * (4 - len(valores[:4]))
+    if all(v is None or str(v).strip() == "" for v in valores):
+        return None
+    codigo = _texto(valores[0], 20, "código")
+    nombre = _texto(valores[1], 255, "nombre")
+    if not codigo or not nombre:
+        raise FilaInvalida("faltan código o nombre")
+    area = _texto(valores[2], 100, "área") or None
+    precio = _precio(valores[3])
+    return Servicio(
+        codigo=codigo,
+        nombre=nombre,
+        area=area,
+        costo_base=precio,
+        pvp_sugerido=precio,
+        pvp_corporativo=precio,
+        porcentaje_ganancia=0,
+        activo=True,
+    )
+
+
+def leer_lotes(filas, resultado, tamano=TAMANO_LOTE):
+    """Genera ``(ultima_fila, servicios)``; las filas inválidas quedan en ``resultado``.
+
+    Dentro de un lote un código repetido conserva la última fila.
+    """
+    lote = {}
+    numero = 0
+    for numero, valores in filas:
+        try:
+            servicio = convertir_fila(valores)
+        except FilaInvalida as e:
+            resultado.rechazar(numero, str(e))
+            continue
+        if servicio is None:
+            continue
+        lote[servicio.codigo] = servicio
+        if len(lote) >= tamano:
+            yield numero, list(lote.values())
+            lote = {}
+    if lote:
+        yield numero, list(lote.values())
+
+
+def guardar_lote(servicios):
+    """Inserta o actualiza por ``codigo`` en una sola sentencia por lote."""
+    Servicio.objects.bulk_create(
+        servicios,
+        update_conflicts=True,
+        unique_fields=["codigo"],
+        update_fields=_CAMPOS_UPSERT,
+    )
+    precios.recalcular(codigos=[s.codigo for s in servicios])
+
+
+def eliminar_ausentes(codigos):
+    """Borra los servicios cuyo código no apareció en el archivo."""
+    ausentes = [pk for pk, codigo in Servicio.objects.values_list("id", "codigo").iterator(chunk_size=2000)
+                if codigo not in codigos]
+    for i in range(0, len(ausentes), 500):
+        Servicio.objects.filter(id__in=ausentes[i:i + 500]).delete()
+    return len(ausentes)
+
+
+def importar_catalogo(ruta, tamano_lote=TAMANO_LOTE):
+    """Reemplaza el catálogo por el contenido del archivo en una transacción.
+
+    Si algo falla a mitad de camino el catálogo queda como estaba.
+    """
+    resultado = ResultadoImportacion()
+    inicio = time.perf_counter()
+    codigos = set()
+
+    with transaction.atomic():
+        for _, lote in leer_lotes(leer_filas(ruta), resultado, tamano_lote):
+            guardar_lote(lote)
+            codigos.update(s.codigo for s in lote)
+            resultado.procesados += len(lote)
+        if not codigos:
+            raise FilaInvalida("el archivo no tiene filas válidas")
+        resultado.eliminados = eliminar_ausentes(codigos)
+        transaction.on_commit(indice.invalidar)
+
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def calcular_cambios(lotes, al_avanzar=None):
+    """Compara los lotes leídos con el catálogo por ``codigo`` sin escribir nada.
+
+    ``al_avanzar(ultima_fila)`` se llama después de cada lote.
+    """
+    existentes = {
+        codigo: (pk, *valores)
+        for codigo, pk, *valores in Servicio.objects.values_list("codigo", "id", *_CAMPOS_SYNC)
+        .iterator(chunk_size=2000)
+    }
+    cambios = CambiosCatalogo()
+    nuevos, actualizados, vistos = {}, {}, set()
+
+    for ultima_fila, lote in lotes:
+        cambios.leidos += len(lote)
+        for servicio in lote:
+            actual = existentes.get(servicio.codigo)
+            if actual is None:
+                nuevos[servicio.codigo] = servicio
+                continue
+            vistos.add(servicio.codigo)
+            servicio.pk = actual[0]
+            if tuple(actual[1:]) != tuple(getattr(servicio, c) for c in _CAMPOS_SYNC):
+                actualizados[servicio.codigo] = servicio
+            else:
+                actualizados.pop(servicio.codigo, None)
+        if al_avanzar:
+            al_avanzar(ultima_fila)
+
+    if not cambios.leidos:
+        raise FilaInvalida("el archivo no tiene filas válidas")
+
+    cambios.nuevos = list(nuevos.values())
+    cambios.actualizados = list(actualizados.values())
+    cambios.sin_cambios = len(vistos) - len(actualizados)
+    cambios.desactivados = [
+        (valores[0], codigo) for codigo, valores in existentes.items()
+        if codigo not in vistos and valores[-1]
+    ]
+    return cambios
+
+
+def aplicar_cambios(cambios):
+    """Escribe solo las diferencias, todo en una transacción."""
+    with transaction.atomic():
+        Servicio.objects.bulk_create(cambios.nuevos, batch_size=TAMANO_LOTE)
+        Servicio.objects.bulk_update(cambios.actualizados, _CAMPOS_SYNC, batch_size=500)
+        ids = [pk for pk, _ in cambios.desactivados]
+        for i in range(0, len(ids), 500):
+            Servicio.objects.filter(id__in=ids[i:i + 500]).update(activo=False)
+        precios.recalcular(ids=[s.pk for s in cambios.nuevos + cambios.actualizados])
+        if cambios.total:
+            transaction.on_commit(indice.invalidar)
+
+
+def sincronizar_catalogo(ruta, aplicar=False):
+    """Calcula (y opcionalmente aplica) los cambios que trae el archivo."""
+    resultado = ResultadoImportacion()
+    inicio = time.perf_counter()
+    cambios = calcular_cambios(leer_lotes(leer_filas(ruta), resultado))
+    resultado.procesados = cambios.leidos
+    if aplicar:
+        aplicar_cambios(cambios)
+    resultado.segundos = time.perf_counter() - inicio
+    return cambios, resultado
@@ -0,0 +1,157 @@
+"""Índice en memoria del catálogo activo para el autocompletado.
+
+Se construye una vez por proceso a partir de los servicios activos y se
+regenera cuando cambia la versión ``"catalogo"`` (ver ``config.versiones``).
+Las búsquedas ignoran mayúsculas y tildes y devuelven primero el código
+exacto, luego los prefijos y al final las coincidencias parciales.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+
+from config import versiones
+from metricas.registro import tramo
+
+from . import precios
+from .models import Servicio
+
+LIMITE = 15
+_NGRAMA = 3
+_SEPARADORES = re.compile(r"[^0-9a-z]+")
+
+# Posición de cada nivel en la tupla de precios; los precios con IVA van tres lugares después.
+_COLUMNAS = {nivel: i for i, (nivel, _) in enumerate(precios.NIVELES)}
+
+_lock = threading.Lock()
+_indice = None
+_version = None
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: ``'Ecografía'`` -> ``'ecografia'``."""
+    if not texto:
+        return ""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).casefold().strip()
+
+
+def _palabras(texto):
+    return _SEPARADORES.sub(" ", texto).split()
+
+
+class IndiceCatalogo:
+    """Prefijos cortos y trigramas de código, nombre y área de cada servicio."""
+
+    def __init__(self, filas):
+        self.registros = []
+        self.prefijos = defaultdict(list)
+        self.ngramas = defaultdict(list)
+
+        for pos, (pk, codigo, nombre, area, *valores) in enumerate(filas):
+            codigo_n = normalizar(codigo)
+            nombre_n = normalizar(nombre)
+            palabras = _palabras(f"{codigo_n} {nombre_n} {normalizar(area)}")
+            texto = " " + " ".join(palabras)
+            self.registros.append((pk, codigo, nombre, tuple(valores), codigo_n, nombre_n, texto))
+
+            cortos = {p[:n] for p in palabras for n in range(1, _NGRAMA) if len(p) >= n}
+            for prefijo in cortos:
+                self.prefijos[prefijo].append(pos)
+            gramas = {p[i:i + _NGRAMA] for p in palabras for i in range(len(p) - _NGRAMA + 1)}
+            for grama in gramas:
+                self.ngramas[grama].append(pos)
+
+    def __len__(self):
+        return len(self.registros)
+
+    def _candidatos(self, termino):
+        if len(termino) < _NGRAMA:
+            return self.prefijos.get(termino, ())
+        gramas = (termino[i:i + _NGRAMA] for i in range(len(termino) - _NGRAMA + 1))
+        return min((self.ngramas.get(g, ()) for g in gramas), key=len)
+
+    @staticmethod
+    def _coincide(texto, termino):
+        # Los términos cortos solo valen como inicio de palabra.
+        if len(termino) < _NGRAMA:
+            return " " + termino in texto
+        return termino in texto
+
+    def buscar(self, q, limite=LIMITE, nivel=precios.SUGERIDO):
+        """Lista de hasta ``limite`` servicios ordenados por relevancia.
+
+        ``precio`` y ``precio_con_iva`` son los del ``nivel`` pedido.
+        """
+        columna = _COLUMNAS[precios.nivel_valido(nivel)]
+        consulta = normalizar(q)
+        terminos = _palabras(consulta)
+        if not terminos:
+            return []
+
+        candidatos = min((self._candidatos(t) for t in terminos), key=len)
+        encontrados = []
+        for pos in candidatos:
+            registro = self.registros[pos]
+            texto = registro[6]
+            if all(self._coincide(texto, t) for t in terminos):
+                encontrados.append(registro)
+
+        def rango(registro):
+            codigo_n, nombre_n, texto = registro[4], registro[5], registro[6]
+            if codigo_n == consulta:
+                nivel = 0
+            elif codigo_n.startswith(consulta):
+                nivel = 1
+            elif nombre_n.startswith(consulta):
+                nivel = 2
+            elif all(" " + t in texto for t in terminos):
+                nivel = 3
+            else:
+                nivel = 4
+            return nivel, nombre_n
+
+        return [{
+            "id": pk,
+            "codigo": codigo,
+            "nombre": nombre,
+            "precio": float(valores[columna] or 0),
+            "precio_con_iva": float(valores[columna + 3] or 0),
+        } for pk, codigo, nombre, valores, *_ in heapq.nsmallest(limite, encontrados, key=rango)]
+
+
+def obtener_indice():
+    """Índice del proceso, reconstruido si el catálogo cambió."""
+    global _indice, _version
+    version = versiones.obtener("catalogo")
+    if _indice is None or _version != version:
+        with _lock:
+            if _indice is None or _version != version:
+                filas = (Servicio.objects.filter(activo=True)
+                         .order_by("codigo")
+                         .values_list("id", "codigo", "nombre", "area", *precios.columnas(con_iva=True)))
+                _indice = IndiceCatalogo(filas.iterator(chunk_size=2000))
+                _version = version
+    return _indice
+
+
+def buscar(q, limite=LIMITE, nivel=precios.SUGERIDO):
+    with tramo("busqueda_catalogo"):
+        return obtener_indice().buscar(q, limite, nivel)
+
+
+async def abuscar(q, limite=LIMITE, nivel=precios.SUGERIDO):
+    """Versión async de ``buscar``: solo sale del event loop si hay que reconstruir el índice."""
+    actual = _indice
+    if actual is None or _version != await versiones.aobtener("catalogo"):
+        actual = await sync_to_async(obtener_indice)()
+    with tramo("busqueda_catalogo"):
+        return actual.buscar(q, limite, nivel)
+
+
+def invalidar():
+    """Marca el catálogo como modificado en todos los procesos que comparten caché."""
+    versiones.invalidar("catalogo")
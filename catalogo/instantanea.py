@@ -0,0 +1,93 @@
+"""Instantánea comprimida del catálogo activo para buscar en el navegador.
+
+El formulario de proforma descarga el catálogo completo una vez y busca
+localmente en cada tecla. La instantánea va por columnas (``id``, ``codigo``,
+``nombre``, ``area`` y un arreglo de precios por nivel) para que el JSON sea
+compacto, y se genera y comprime (gzip y, si está instalado, brotli) una sola
+vez por versión ``"catalogo"``: las peticiones solo eligen qué bytes enviar.
+
+El ETag depende del contenido y de la codificación, así que el navegador
+revalida con ``If-None-Match`` y solo vuelve a descargar cuando el catálogo
+cambió.
+"""
+import gzip
+import hashlib
+import json
+import threading
+
+from django.core.cache import cache
+
+from config import versiones
+
+from . import precios
+from .models import Servicio
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli es opcional
+    brotli = None
+
+_DURACION = 24 * 60 * 60
+
+_lock = threading.Lock()
+_actual = None
+
+
+class Instantanea:
+    def __init__(self, version, crudo):
+        self.version = version
+        self.firma = hashlib.sha256(crudo).hexdigest()[:32]
+        self.codificaciones = {"identity": crudo, "gzip": gzip.compress(crudo, 9, mtime=0)}
+        if brotli is not None:
+            self.codificaciones["br"] = brotli.compress(crudo, quality=9, mode=brotli.MODE_TEXT)
+
+    def etag(self, codificacion):
+        """ETag fuerte: cada codificación es una representación distinta."""
+        return f'"{self.firma}"' if codificacion == "identity" else f'"{self.firma}-{codificacion}"'
+
+    def para(self, aceptadas):
+        """``(codificación, bytes)`` más chicos entre las que acepta el cliente."""
+        aceptadas = {c.split(";")[0].strip().lower() for c in (aceptadas or "").split(",")}
+        for codificacion in ("br", "gzip"):
+            if codificacion in aceptadas and codificacion in self.codificaciones:
+                return codificacion, self.codificaciones[codificacion]
+        return "identity", self.codificaciones["identity"]
+
+
+def generar(version):
+    """JSON por columnas de los servicios activos, ordenados por código."""
+    niveles = [nivel for nivel, _ in precios.NIVELES]
+    datos = {"version": version, "id": [], "codigo": [], "nombre": [], "area": [],
+             "precios": {nivel: [] for nivel in niveles}}
+    filas = (Servicio.objects.filter(activo=True)
+             .order_by("codigo")
+             .values_list("id", "codigo", "nombre", "area", *precios.columnas()))
+    for pk, codigo, nombre, area, *valores in filas.iterator(chunk_size=2000):
+        datos["id"].append(pk)
+        datos["codigo"].append(codigo)
+        datos["nombre"].append(nombre)
+        datos["area"].append(area or "")
+        for nivel, valor in zip(niveles, valores):
+            datos["precios"][nivel].append(float(valor or 0))
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def obtener():
+    """Instantánea de la versión vigente del catálogo.
+
+    Se guarda en el proceso y en la caché de Django, así que con una caché
+    compartida la genera un solo trabajador por cambio del catálogo.
+    """
+    global _actual
+    version = versiones.obtener("catalogo")
+    if _actual is not None and _actual.version == version:
+        return _actual
+    with _lock:
+        if _actual is None or _actual.version != version:
+            clave = f"catalogo:instantanea:{version}"
+            instantanea = cache.get(clave)
+            if instantanea is None:
+                instantanea = Instantanea(version, generar(version))
+                cache.set(clave, instantanea, _DURACION)
+            _actual = instantanea
+    return _actual
@@ -0,0 +1,25 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo import exportacion
+from config import tablas
+
+
+class Command(BaseCommand):
+    help = "Exporta el catálogo a CSV o Excel según la extensión de la salida (.csv o .xlsx)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("salida", help="Archivo a generar (.csv o .xlsx).")
+        parser.add_argument("--solo-activos", action="store_true")
+
+    def handle(self, *args, **options):
+        formato = os.path.splitext(options["salida"])[1].lower().lstrip(".")
+        if formato not in tablas.FORMATOS:
+            raise CommandError("La salida debe terminar en .csv o .xlsx.")
+
+        filas = exportacion.filas(solo_activos=options["solo_activos"])
+        with open(options["salida"], "wb") as f:
+            for parte in tablas.generar(formato, exportacion.ENCABEZADOS, filas, "Catálogo"):
+                f.write(parte)
+        self.stdout.write(self.style.SUCCESS(f"✅ Catálogo exportado a {options['salida']}."))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalogo.tareas import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Procesa las importaciones de catálogo encoladas (trabajador en segundo plano)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Procesa lo pendiente y termina.")
+        parser.add_argument("--intervalo", type=float, default=2.0,
+                            help="Segundos de espera entre revisiones de la cola.")
+
+    def handle(self, *args, **options):
+        while True:
+            procesadas = procesar_pendientes()
+            if procesadas:
+                self.stdout.write(f"{procesadas} importaciones procesadas.")
+            if options["una_vez"]:
+                return
+            time.sleep(options["intervalo"])
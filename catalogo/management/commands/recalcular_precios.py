@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from catalogo import indice, precios
+
+
+class Command(BaseCommand):
+    help = "Recalcula los niveles de precio de todo el catálogo (p. ej. tras cambiar IVA_PORCENTAJE)."
+
+    def handle(self, *args, **options):
+        total = precios.recalcular()
+        indice.invalidar()
+        self.stdout.write(self.style.SUCCESS(f"✅ Precios recalculados para {total} servicios."))
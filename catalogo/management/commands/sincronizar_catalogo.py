@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo.importacion import FilaInvalida, sincronizar_catalogo
+
+
+class Command(BaseCommand):
+    help = "Compara un archivo .xlsx/.csv con el catálogo y muestra (o aplica) los cambios."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument("--aplicar", action="store_true",
+                            help="Aplica los cambios; sin esta opción solo se muestra el resumen.")
+
+    def handle(self, *args, **options):
+        try:
+            cambios, resultado = sincronizar_catalogo(options["archivo"], aplicar=options["aplicar"])
+        except FilaInvalida as e:
+            raise CommandError(str(e))
+
+        resumen = cambios.resumen()
+        self.stdout.write(
+            f"{resultado.procesados} filas leídas ({resultado.filas_por_segundo:.0f} filas/s), "
+            f"{resultado.total_rechazos} rechazadas."
+        )
+        for numero, motivo in resultado.rechazos[:20]:
+            self.stdout.write(f"  fila {numero}: {motivo}")
+        self.stdout.write(
+            f"Nuevos: {resumen['nuevos']}  Actualizados: {resumen['actualizados']}  "
+            f"Desactivados: {resumen['desactivados']}  Sin cambios: {resumen['sin_cambios']}"
+        )
+        for tipo, ejemplos in resumen["ejemplos"].items():
+            for ejemplo in ejemplos:
+                self.stdout.write(f"  {tipo}: {ejemplo}")
+        if options["aplicar"]:
+            self.stdout.write(self.style.SUCCESS("Cambios aplicados."))
+        else:
+            self.stdout.write("Vista previa: usa --aplicar para guardar los cambios.")
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacionCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(max_length=500)),
+                ('nombre_original', models.CharField(max_length=255)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('completada', 'Completada'), ('error', 'Error')], db_index=True, default='pendiente', max_length=20)),
+                ('creada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('iniciada', models.DateTimeField(blank=True, null=True)),
+                ('finalizada', models.DateTimeField(blank=True, null=True)),
+                ('latido', models.DateTimeField(blank=True, null=True)),
+                ('filas_confirmadas', models.PositiveIntegerField(default=0)),
+                ('filas_estimadas', models.PositiveIntegerField(blank=True, null=True)),
+                ('procesados', models.PositiveIntegerField(default=0)),
+                ('eliminados', models.PositiveIntegerField(default=0)),
+                ('total_rechazos', models.PositiveIntegerField(default=0)),
+                ('rechazos', models.JSONField(blank=True, default=list)),
+                ('segundos', models.FloatField(default=0)),
+                ('mensaje', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-creada', '-id'],
+            },
+        ),
+    ]
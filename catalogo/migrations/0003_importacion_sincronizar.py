@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0002_importacioncatalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacioncatalogo',
+            name='confirmada',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='importacioncatalogo',
+            name='modo',
+            field=models.CharField(choices=[('sincronizar', 'Sincronizar (solo cambios, con vista previa)'), ('reemplazar', 'Reemplazar todo el catálogo')], default='sincronizar', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='importacioncatalogo',
+            name='resumen',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='importacioncatalogo',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('revision', 'Esperando confirmación'), ('completada', 'Completada'), ('error', 'Error')], db_index=True, default='pendiente', max_length=20),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0003_importacion_sincronizar'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicio',
+            index=models.Index(fields=['activo', 'nombre'], name='servicio_activo_nombre_idx'),
+        ),
+    ]
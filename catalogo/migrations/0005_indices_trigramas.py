@@ -0,0 +1,39 @@
+"""Índices GIN de trigramas para búsquedas ``icontains`` en PostgreSQL.
+
+En SQLite no hace nada: allí la búsqueda usa el índice en memoria.
+"""
+from django.db import migrations
+
+INDICES = [
+    ("servicio_nombre_trgm", "catalogo_servicio", "nombre"),
+    ("servicio_codigo_trgm", "catalogo_servicio", "codigo"),
+]
+
+
+def crear(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for nombre, tabla, columna in INDICES:
+        # Misma expresión que genera Django para icontains: UPPER(columna::text).
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gin (UPPER({columna}::text) gin_trgm_ops)"
+        )
+
+
+def borrar(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0004_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear, borrar),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:02
+
+from decimal import ROUND_HALF_UP, Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+CIEN = Decimal(100)
+
+
+def redondear(valor):
+    return Decimal(valor).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def calcular_precios(apps, schema_editor):
+    # Mismo cálculo que catalogo.precios.valores, copiado para no depender
+    # del módulo actual ni de sus modelos.
+    Servicio = apps.get_model("catalogo", "Servicio")
+    PrecioServicio = apps.get_model("catalogo", "PrecioServicio")
+    iva = Decimal(str(getattr(settings, "IVA_PORCENTAJE", 12)))
+    factor = 1 + iva / CIEN
+    filas = Servicio.objects.values_list(
+        "id", "costo_base", "pvp_sugerido", "pvp_corporativo", "porcentaje_ganancia")
+    nuevos = []
+    for pk, costo_base, pvp_sugerido, pvp_corporativo, porcentaje_ganancia in filas.iterator(chunk_size=2000):
+        sugerido = redondear(pvp_sugerido or 0)
+        corporativo = redondear(pvp_corporativo) if pvp_corporativo else sugerido
+        costo_margen = redondear((costo_base or 0) * (1 + (porcentaje_ganancia or 0) / CIEN))
+        nuevos.append(PrecioServicio(
+            servicio_id=pk, sugerido=sugerido, corporativo=corporativo,
+            costo_margen=costo_margen, iva_porcentaje=iva,
+            sugerido_con_iva=redondear(sugerido * factor),
+            corporativo_con_iva=redondear(corporativo * factor),
+            costo_margen_con_iva=redondear(costo_margen * factor),
+        ))
+    PrecioServicio.objects.bulk_create(nuevos, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0005_indices_trigramas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioServicio',
+            fields=[
+                ('servicio', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='precio', serialize=False, to='catalogo.servicio')),
+                ('sugerido', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('corporativo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('costo_margen', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('iva_porcentaje', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('sugerido_con_iva', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('corporativo_con_iva', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('costo_margen_con_iva', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+        ),
+        migrations.RunPython(calcular_precios, migrations.RunPython.noop),
+    ]
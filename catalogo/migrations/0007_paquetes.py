@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0006_precios_servicio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Paquete',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=150, unique=True)),
+                ('descripcion', models.TextField(blank=True)),
+                ('activo', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PaqueteItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(default=1)),
+                ('orden', models.PositiveIntegerField(default=0)),
+                ('paquete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='catalogo.paquete')),
+                ('servicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='paquetes', to='catalogo.servicio')),
+            ],
+            options={
+                'ordering': ['orden', 'id'],
+                'constraints': [models.UniqueConstraint(fields=('paquete', 'servicio'), name='paquete_servicio_unico')],
+            },
+        ),
+    ]
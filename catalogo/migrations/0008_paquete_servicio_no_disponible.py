@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0007_paquetes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paqueteitem',
+            name='servicio',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='paquetes', to='catalogo.servicio'),
+        ),
+    ]
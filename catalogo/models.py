@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Servicio(models.Model):
     codigo = models.CharField(max_length=20, unique=True)
@@ -10,5 +11,138 @@ class Servicio(models.Model):
     porcentaje_ganancia = models.DecimalField(max_digits=5, decimal_places=2, help_text="Ej: 30 para 30%")
     activo = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Listado y autocompletado: servicios activos ordenados por nombre.
+            models.Index(fields=["activo", "nombre"], name="servicio_activo_nombre_idx"),
+        ]
+
     def __str__(self):
         return f"{self.codigo} - {self.nombre}"
+
+
+class PrecioServicio(models.Model):
+    """Niveles de precio ya calculados de un servicio (ver ``catalogo.precios``).
+
+    Se recalculan al importar o editar el catálogo, así que cotizar solo
+    tiene que leer la columna del nivel pedido.
+    """
+
+    servicio = models.OneToOneField(Servicio, on_delete=models.CASCADE, primary_key=True, related_name="precio")
+    sugerido = models.DecimalField(max_digits=10, decimal_places=2)
+    corporativo = models.DecimalField(max_digits=10, decimal_places=2)
+    costo_margen = models.DecimalField(max_digits=10, decimal_places=2)
+    iva_porcentaje = models.DecimalField(max_digits=5, decimal_places=2)
+    sugerido_con_iva = models.DecimalField(max_digits=10, decimal_places=2)
+    corporativo_con_iva = models.DecimalField(max_digits=10, decimal_places=2)
+    costo_margen_con_iva = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"Precios de {self.servicio_id}"
+
+
+class ImportacionCatalogo(models.Model):
+    """Importación del catálogo que procesa el trabajador en segundo plano."""
+
+    PENDIENTE = "pendiente"
+    EN_PROCESO = "en_proceso"
+    REVISION = "revision"
+    COMPLETADA = "completada"
+    ERROR = "error"
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (EN_PROCESO, "En proceso"),
+        (REVISION, "Esperando confirmación"),
+        (COMPLETADA, "Completada"),
+        (ERROR, "Error"),
+    ]
+
+    SINCRONIZAR = "sincronizar"
+    REEMPLAZAR = "reemplazar"
+    MODOS = [
+        (SINCRONIZAR, "Sincronizar (solo cambios, con vista previa)"),
+        (REEMPLAZAR, "Reemplazar todo el catálogo"),
+    ]
+
+    archivo = models.CharField(max_length=500)
+    nombre_original = models.CharField(max_length=255)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE, db_index=True)
+    modo = models.CharField(max_length=20, choices=MODOS, default=SINCRONIZAR)
+    # En modo sincronizar, la primera pasada solo calcula el resumen de cambios.
+    confirmada = models.BooleanField(default=False)
+    resumen = models.JSONField(default=dict, blank=True)
+    creada = models.DateTimeField(default=timezone.now)
+    iniciada = models.DateTimeField(blank=True, null=True)
+    finalizada = models.DateTimeField(blank=True, null=True)
+    latido = models.DateTimeField(blank=True, null=True)
+
+    # Punto de control: última fila del archivo cuyo lote quedó confirmado.
+    filas_confirmadas = models.PositiveIntegerField(default=0)
+    filas_estimadas = models.PositiveIntegerField(blank=True, null=True)
+    procesados = models.PositiveIntegerField(default=0)
+    eliminados = models.PositiveIntegerField(default=0)
+    total_rechazos = models.PositiveIntegerField(default=0)
+    rechazos = models.JSONField(default=list, blank=True)
+    segundos = models.FloatField(default=0)
+    mensaje = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-creada", "-id"]
+
+    @property
+    def activa(self):
+        return self.estado in (self.PENDIENTE, self.EN_PROCESO)
+
+    @property
+    def porcentaje(self):
+        if self.estado == self.COMPLETADA:
+            return 100
+        if not self.filas_estimadas:
+            return None
+        return min(99, int(self.filas_confirmadas * 100 / (self.filas_estimadas + 1)))
+
+    def __str__(self):
+        return f"Importación {self.pk} - {self.nombre_original} ({self.estado})"
+
+
+class Paquete(models.Model):
+    """Conjunto de servicios que se cotizan juntos (perfiles, paquetes quirúrgicos...).
+
+    Solo guarda qué servicios y cuántos: los precios se leen del catálogo al
+    usarlo (ver ``catalogo.paquetes``).
+    """
+
+    nombre = models.CharField(max_length=150, unique=True)
+    descripcion = models.TextField(blank=True)
+    activo = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ["nombre"]
+
+    def __str__(self):
+        return self.nombre
+
+
+class PaqueteItem(models.Model):
+    """Servicio de un paquete.
+
+    Si el servicio se borra (p. ej. al reemplazar el catálogo con una
+    importación) el ítem se conserva sin servicio y se muestra como no
+    disponible, en vez de desaparecer del paquete sin aviso.
+    """
+
+    paquete = models.ForeignKey(Paquete, related_name="items", on_delete=models.CASCADE)
+    servicio = models.ForeignKey(Servicio, related_name="paquetes", null=True, on_delete=models.SET_NULL)
+    cantidad = models.PositiveIntegerField(default=1)
+    orden = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["orden", "id"]
+        constraints = [
+            models.UniqueConstraint(fields=["paquete", "servicio"], name="paquete_servicio_unico"),
+        ]
+
+    def __str__(self):
+        if self.servicio_id is None:
+            return f"Servicio no disponible x{self.cantidad}"
+        return f"{self.servicio_id} x{self.cantidad}"
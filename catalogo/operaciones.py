@@ -0,0 +1,240 @@
+"""Operaciones masivas sobre el catálogo en una sola petición.
+
+Cada operación es un diccionario con ``op``:
+
+* ``crear``: ``codigo``, ``nombre``, ``pvp_sugerido`` y opcionalmente ``area``,
+  ``costo_base``, ``pvp_corporativo``, ``porcentaje_ganancia``.
+* ``actualizar``: ``codigo`` y los campos que cambian (los mismos de ``crear``
+  y ``activo``).
+* ``desactivar`` / ``activar``: ``codigo``.
+* ``ajustar_precio``: ``area`` y ``porcentaje`` (por ejemplo ``5`` o ``-10``);
+  sube o baja el PVP sugerido y el corporativo de toda el área.
+
+Los servicios mencionados se leen con una consulta al principio y las
+operaciones por código se validan y aplican en memoria, en orden. Luego se
+escriben con un único *upsert* por ``codigo`` (``config.sql.upsert``). ``ajustar_precio`` es un único ``UPDATE ... WHERE
+area = ...`` y antes se escribe lo pendiente, así que se respeta el orden de
+las operaciones. Todo va en una transacción; al final se recalculan los
+niveles de precio de lo que cambió y se invalida el índice.
+"""
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Round
+
+from config import sql
+from metricas.registro import tramo
+
+from . import indice, precios
+from .importacion import FilaInvalida, _precio, _texto
+from .models import Servicio
+
+MAX_OPERACIONES = 20000
+_PORCENTAJE_MAXIMO = Decimal("999.99")
+_CAMPOS = [
+    "nombre", "area", "costo_base", "pvp_sugerido",
+    "pvp_corporativo", "porcentaje_ganancia", "activo",
+]
+_TIPOS = {"crear", "actualizar", "desactivar", "activar", "ajustar_precio"}
+
+
+class OperacionInvalida(FilaInvalida):
+    pass
+
+
+@dataclass
+class ResultadoOperaciones:
+    resultados: list = field(default_factory=list)
+    aplicadas: int = 0
+    errores: int = 0
+    segundos: float = 0.0
+
+    def ok(self, indice_op, tipo, **datos):
+        self.aplicadas += 1
+        self.resultados.append({"indice": indice_op, "op": tipo, "ok": True, **datos})
+
+    def error(self, indice_op, tipo, motivo, **datos):
+        self.errores += 1
+        self.resultados.append({"indice": indice_op, "op": tipo, "ok": False, "error": motivo, **datos})
+
+    def como_dict(self):
+        return {
+            "aplicadas": self.aplicadas,
+            "errores": self.errores,
+            "segundos": round(self.segundos, 3),
+            "resultados": self.resultados,
+        }
+
+
+def _porcentaje(valor):
+    porcentaje = _precio(valor)
+    if porcentaje > _PORCENTAJE_MAXIMO:
+        raise OperacionInvalida(f"porcentaje fuera de rango: {porcentaje}")
+    return porcentaje
+
+
+def _activo(valor):
+    if isinstance(valor, bool):
+        return valor
+    if str(valor).strip().lower() in ("1", "true", "si", "sí"):
+        return True
+    if str(valor).strip().lower() in ("0", "false", "no"):
+        return False
+    raise OperacionInvalida(f"activo inválido: {valor!r}")
+
+
+_CONVERSORES = {
+    "nombre": lambda v: _texto(v, 255, "nombre"),
+    "area": lambda v: _texto(v, 100, "área") or None,
+    "costo_base": _precio,
+    "pvp_sugerido": _precio,
+    "pvp_corporativo": lambda v: None if v is None or v == "" else _precio(v),
+    "porcentaje_ganancia": _porcentaje,
+    "activo": _activo,
+}
+
+
+def _codigo(op):
+    codigo = _texto(op.get("codigo"), 20, "código")
+    if not codigo:
+        raise OperacionInvalida("falta el código")
+    return codigo
+
+
+def _campos(op, permitidos):
+    """Valores convertidos de los campos de ``op`` que están en ``permitidos``."""
+    valores = {}
+    for campo in permitidos:
+        if campo in op:
+            valores[campo] = _CONVERSORES[campo](op[campo])
+    if valores.get("nombre") == "":
+        raise OperacionInvalida("el nombre no puede quedar vacío")
+    return valores
+
+
+class _Lote:
+    """Servicios leídos o creados en esta petición (``codigo -> {campo: valor}``)
+    con los cambios pendientes.
+    """
+
+    def __init__(self, codigos):
+        self.servicios = {}
+        codigos = list(codigos)
+        for i in range(0, len(codigos), 500):
+            filas = Servicio.objects.filter(codigo__in=codigos[i:i + 500]).values_list("codigo", *_CAMPOS)
+            for codigo, *valores in filas:
+                self.servicios[codigo] = dict(zip(_CAMPOS, valores))
+        self.pendientes = {}
+        self.escritos = set()
+
+    def aplicar(self, tipo, op):
+        codigo = _codigo(op)
+        servicio = self.servicios.get(codigo)
+
+        if tipo == "crear":
+            if servicio is not None:
+                raise OperacionInvalida("ya existe un servicio con ese código")
+            valores = _campos(op, [c for c in _CAMPOS if c != "activo"])
+            if not valores.get("nombre") or "pvp_sugerido" not in valores:
+                raise OperacionInvalida("faltan nombre o pvp_sugerido")
+            servicio = self.servicios[codigo] = {
+                "area": None, "costo_base": Decimal("0.00"), "pvp_corporativo": None,
+                "porcentaje_ganancia": Decimal("0.00"), "activo": True, **valores,
+            }
+        elif servicio is None:
+            raise OperacionInvalida("no existe un servicio con ese código")
+        elif tipo == "actualizar":
+            valores = _campos(op, _CAMPOS)
+            if not valores:
+                raise OperacionInvalida("no hay campos para actualizar")
+            servicio.update(valores)
+        else:
+            servicio["activo"] = tipo == "activar"
+        self.pendientes[codigo] = servicio
+        return codigo
+
+    def escribir(self):
+        """Upsert por ``codigo`` de los servicios con cambios pendientes."""
+        sql.upsert(Servicio, ["codigo"], _CAMPOS, [
+            (codigo, *(servicio[campo] for campo in _CAMPOS)) for codigo, servicio in self.pendientes.items()
+        ])
+        self.escritos.update(self.pendientes)
+        self.pendientes = {}
+
+    def ajustar_precio(self, area, porcentaje):
+        """``UPDATE`` de los precios de un área; devuelve cuántos servicios cambió."""
+        self.escribir()
+        factor = Value(1 + porcentaje / 100)
+        afectados = Servicio.objects.filter(area=area).update(
+            pvp_sugerido=Round(F("pvp_sugerido") * factor, 2),
+            pvp_corporativo=Round(F("pvp_corporativo") * factor, 2),
+        )
+        # Los servicios de esa área que ya están en memoria se releen.
+        en_memoria = [c for c, s in self.servicios.items() if s["area"] == area]
+        for i in range(0, len(en_memoria), 500):
+            filas = Servicio.objects.filter(codigo__in=en_memoria[i:i + 500]).values_list(
+                "codigo", "pvp_sugerido", "pvp_corporativo")
+            for codigo, sugerido, corporativo in filas:
+                self.servicios[codigo].update(pvp_sugerido=sugerido, pvp_corporativo=corporativo)
+        return afectados
+
+
+def aplicar(operaciones, todo_o_nada=False):
+    """Valida y aplica ``operaciones`` en una transacción.
+
+    Las operaciones inválidas se informan y se omiten; con ``todo_o_nada`` se
+    deshace todo si alguna es inválida.
+    """
+    resultado = ResultadoOperaciones()
+    inicio = time.perf_counter()
+    codigos = set()
+    for op in operaciones:
+        try:
+            codigos.add(_codigo(op))
+        except (AttributeError, FilaInvalida):
+            pass  # se informa al aplicar la operación
+    areas = set()
+
+    with tramo("catalogo_operaciones"), transaction.atomic():
+        lote = _Lote(codigos)
+        for i, op in enumerate(operaciones):
+            tipo = op.get("op") if isinstance(op, dict) else None
+            try:
+                if tipo not in _TIPOS:
+                    raise OperacionInvalida(f"operación desconocida: {tipo!r}")
+                if tipo == "ajustar_precio":
+                    area = _texto(op.get("area"), 100, "área")
+                    if not area:
+                        raise OperacionInvalida("falta el área")
+                    try:
+                        porcentaje = Decimal(str(op.get("porcentaje")))
+                    except ArithmeticError:
+                        raise OperacionInvalida(f"porcentaje inválido: {op.get('porcentaje')!r}")
+                    if not -100 < porcentaje <= 1000:
+                        raise OperacionInvalida(f"porcentaje fuera de rango: {porcentaje}")
+                    afectados = lote.ajustar_precio(area, porcentaje)
+                    areas.add(area)
+                    resultado.ok(i, tipo, area=area, afectados=afectados)
+                else:
+                    resultado.ok(i, tipo, codigo=lote.aplicar(tipo, op))
+            except FilaInvalida as e:
+                datos = {"codigo": op["codigo"]} if isinstance(op, dict) and "codigo" in op else {}
+                resultado.error(i, tipo, str(e), **datos)
+
+        if todo_o_nada and resultado.errores:
+            resultado.aplicadas = 0
+            transaction.set_rollback(True)
+        else:
+            lote.escribir()
+            if lote.escritos:
+                precios.recalcular(codigos=lote.escritos)
+            for area in areas:
+                precios.recalcular(ids=Servicio.objects.filter(area=area).values_list("id", flat=True))
+            if lote.escritos or areas:
+                transaction.on_commit(indice.invalidar)
+
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
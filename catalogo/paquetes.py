@@ -0,0 +1,72 @@
+"""Paquetes de servicios en memoria.
+
+La definición de los paquetes activos (nombre y servicios con su cantidad)
+se carga una vez por proceso con dos consultas y se regenera cuando cambia la
+versión ``"paquetes"`` (las señales la invalidan al editar un paquete). Los
+precios no se guardan: ``items`` los lee del catálogo vigente en una sola
+consulta para todos los servicios del paquete.
+"""
+import threading
+from collections import defaultdict
+
+from django.db.models.functions import Coalesce
+
+from config import versiones
+
+from . import precios
+from .models import Paquete, PaqueteItem, Servicio
+
+_lock = threading.Lock()
+_paquetes = None
+_version = None
+
+
+def obtener():
+    """``{id: (nombre, ((servicio_id, cantidad), ...))}`` de los paquetes activos, por nombre."""
+    global _paquetes, _version
+    version = versiones.obtener("paquetes")
+    if _paquetes is None or _version != version:
+        with _lock:
+            if _paquetes is None or _version != version:
+                contenido = defaultdict(list)
+                for paquete_id, servicio_id, cantidad in (PaqueteItem.objects.filter(paquete__activo=True)
+                                                          .values_list("paquete_id", "servicio_id", "cantidad")):
+                    contenido[paquete_id].append((servicio_id, cantidad))
+                _paquetes = {
+                    pk: (nombre, tuple(contenido[pk]))
+                    for pk, nombre in Paquete.objects.filter(activo=True).values_list("id", "nombre")
+                }
+                _version = version
+    return _paquetes
+
+
+def listar():
+    """``[(id, nombre), ...]`` para elegir un paquete."""
+    return [(pk, nombre) for pk, (nombre, _) in obtener().items()]
+
+
+def items(paquete_id, nivel=precios.SUGERIDO):
+    """``(items, no_disponibles)`` del paquete con el nombre, código y precio actuales del ``nivel``.
+
+    Una consulta para todos los servicios. Los inactivos o borrados del
+    catálogo no se devuelven y se cuentan en ``no_disponibles``. ``None`` si el
+    paquete no existe o no está activo.
+    """
+    paquete = obtener().get(paquete_id)
+    if paquete is None:
+        return None
+    _, contenido = paquete
+    precio = Coalesce(f"precio__{precios.nivel_valido(nivel)}", "pvp_sugerido")
+    servicios = {pk: (codigo, nombre, valor) for pk, codigo, nombre, valor in
+                 Servicio.objects.filter(id__in=[s for s, _ in contenido if s is not None], activo=True)
+                 .values_list("id", "codigo", "nombre", precio)}
+    disponibles = [
+        {"id": servicio_id, "codigo": servicios[servicio_id][0], "nombre": servicios[servicio_id][1],
+         "precio": float(servicios[servicio_id][2] or 0), "cantidad": cantidad}
+        for servicio_id, cantidad in contenido if servicio_id in servicios
+    ]
+    return disponibles, len(contenido) - len(disponibles)
+
+
+def invalidar():
+    versiones.invalidar("paquetes")
@@ -0,0 +1,138 @@
+"""Motor de precios del catálogo.
+
+Cada servicio tiene tres niveles de precio:
+
+* ``sugerido``: el PVP sugerido.
+* ``corporativo``: el PVP corporativo (o el sugerido si no tiene).
+* ``costo_margen``: el costo base más el porcentaje de ganancia.
+
+Los tres, con y sin IVA, se calculan por bloques con ``Decimal`` y se guardan
+en ``PrecioServicio`` al importar o editar el catálogo; al cotizar basta con
+leer la columna del nivel pedido. Los totales de una proforma (subtotal, IVA y
+total) también se calculan aquí para que el formulario, la base y el PDF usen
+el mismo redondeo.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db.models.functions import Coalesce
+
+from config import sql
+
+from .models import PrecioServicio, Servicio
+
+SUGERIDO = "sugerido"
+CORPORATIVO = "corporativo"
+COSTO_MARGEN = "costo_margen"
+NIVELES = [
+    (SUGERIDO, "PVP sugerido"),
+    (CORPORATIVO, "PVP corporativo"),
+    (COSTO_MARGEN, "Costo + margen"),
+]
+CENTAVOS = Decimal("0.01")
+_CIEN = Decimal(100)
+_TAMANO_BLOQUE = 2000
+_CAMPOS = [
+    "sugerido", "corporativo", "costo_margen", "iva_porcentaje",
+    "sugerido_con_iva", "corporativo_con_iva", "costo_margen_con_iva",
+]
+
+
+def redondear(valor):
+    return Decimal(valor).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def iva_porcentaje():
+    return Decimal(str(getattr(settings, "IVA_PORCENTAJE", 12)))
+
+
+def nivel_valido(nivel):
+    return nivel if nivel in dict(NIVELES) else SUGERIDO
+
+
+def valores(pk, costo_base, pvp_sugerido, pvp_corporativo, porcentaje_ganancia, iva):
+    """Fila ``(servicio_id, *_CAMPOS)`` de ``PrecioServicio`` para un servicio."""
+    sugerido = redondear(pvp_sugerido or 0)
+    corporativo = redondear(pvp_corporativo) if pvp_corporativo else sugerido
+    costo_margen = redondear((costo_base or 0) * (1 + (porcentaje_ganancia or 0) / _CIEN))
+    factor = 1 + iva / _CIEN
+    return (
+        pk, sugerido, corporativo, costo_margen, iva,
+        redondear(sugerido * factor), redondear(corporativo * factor), redondear(costo_margen * factor),
+    )
+
+
+def recalcular(ids=None, codigos=None):
+    """Recalcula los precios de los servicios ``ids`` o ``codigos`` (o de todo el catálogo).
+
+    Se procesa por bloques y cada bloque se escribe con un único *upsert*
+    (``config.sql.upsert``).
+    Devuelve cuántos servicios se calcularon.
+    """
+    iva = iva_porcentaje()
+    qs = Servicio.objects.order_by("id").values_list(
+        "id", "costo_base", "pvp_sugerido", "pvp_corporativo", "porcentaje_ganancia")
+    if ids is not None or codigos is not None:
+        campo, buscados = ("id__in", list(ids)) if ids is not None else ("codigo__in", list(codigos))
+        bloques = (qs.filter(**{campo: buscados[i:i + _TAMANO_BLOQUE]})
+                   for i in range(0, len(buscados), _TAMANO_BLOQUE))
+    else:
+        bloques = [qs]
+
+    total = 0
+    for bloque in bloques:
+        filas = []
+        for fila in bloque.iterator(chunk_size=_TAMANO_BLOQUE):
+            filas.append(valores(*fila, iva))
+            if len(filas) >= _TAMANO_BLOQUE:
+                total += sql.upsert(PrecioServicio, ["servicio"], _CAMPOS, filas)
+                filas = []
+        total += sql.upsert(PrecioServicio, ["servicio"], _CAMPOS, filas)
+    return total
+
+
+def columnas(con_iva=False):
+    """Expresiones para ``Servicio.objects.values_list``: un precio por nivel (en el orden
+    de ``NIVELES``, y luego los con IVA si se piden). Si un servicio aún no tiene
+    ``PrecioServicio`` se usa su PVP sugerido.
+    """
+    niveles = [nivel for nivel, _ in NIVELES]
+    if con_iva:
+        niveles += [f"{nivel}_con_iva" for nivel in niveles]
+    return [Coalesce(f"precio__{columna}", "pvp_sugerido") for columna in niveles]
+
+
+def precios_de(ids, nivel=SUGERIDO):
+    """``{servicio_id: precio}`` del nivel pedido, en una consulta."""
+    nivel = nivel_valido(nivel)
+    return dict(PrecioServicio.objects.filter(servicio_id__in=ids).values_list("servicio_id", nivel))
+
+
+def copiar_catalogo(items, nivel=SUGERIDO):
+    """Completa ``codigo`` y ``precio_catalogo`` de los ítems con ``servicio_id``, en una consulta.
+
+    Los que ya tienen código se dejan como están; si el servicio ya no existe
+    se quita el enlace.
+    """
+    ids = {item.servicio_id for item in items if item.servicio_id and not item.codigo}
+    if not ids:
+        return
+    precio = Coalesce(f"precio__{nivel_valido(nivel)}", "pvp_sugerido")
+    catalogo = {pk: (codigo, valor) for pk, codigo, valor in
+                Servicio.objects.filter(id__in=ids).values_list("id", "codigo", precio)}
+    for item in items:
+        if item.servicio_id in ids and not item.codigo:
+            item.codigo, item.precio_catalogo = catalogo.get(item.servicio_id, ("", None))
+            if not item.codigo:
+                item.servicio_id = None
+
+
+def totales(subtotales, porcentaje=None):
+    """``(subtotal, iva, total)`` a partir de los subtotales de los ítems.
+
+    El IVA se calcula una sola vez sobre la suma, no ítem por ítem.
+    """
+    porcentaje = iva_porcentaje() if porcentaje is None else Decimal(porcentaje)
+    subtotal = sum((Decimal(s) for s in subtotales), Decimal("0.00"))
+    iva = redondear(subtotal * porcentaje / _CIEN)
+    return subtotal, iva, subtotal + iva
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import indice, paquetes, precios
+from .models import Paquete, PaqueteItem, Servicio
+
+
+@receiver(post_save, sender=Servicio)
+def servicio_guardado(sender, instance, raw=False, **kwargs):
+    """Recalcula los niveles de precio en la misma transacción que el cambio."""
+    if not raw:
+        precios.recalcular(ids=[instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Servicio)
+def servicio_modificado(sender, **kwargs):
+    """Invalida el índice de autocompletado cuando se confirma el cambio."""
+    transaction.on_commit(indice.invalidar)
+
+
+@receiver(post_delete, sender=Servicio)
+def servicio_borrado(sender, **kwargs):
+    """Sus ítems de paquete quedan sin servicio (``SET_NULL`` no emite señales): recarga los paquetes."""
+    transaction.on_commit(paquetes.invalidar)
+
+
+@receiver([post_save, post_delete], sender=Paquete)
+@receiver([post_save, post_delete], sender=PaqueteItem)
+def paquete_modificado(sender, **kwargs):
+    """Invalida los paquetes en memoria cuando se confirma el cambio."""
+    transaction.on_commit(paquetes.invalidar)
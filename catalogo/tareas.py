@@ -0,0 +1,216 @@
+"""Trabajador de importaciones del catálogo.
+
+Las importaciones se guardan en ``ImportacionCatalogo`` y se procesan de a una
+por vez, ya sea con ``manage.py procesar_importaciones`` o con un hilo que el
+propio proceso web levanta al encolar.
+
+En modo reemplazar cada lote se confirma junto con el punto de control de la
+importación, así que si el proceso muere se retoma desde el último lote
+confirmado. En modo sincronizar la primera pasada solo calcula el resumen de
+cambios (estado ``revision``); al confirmarla se vuelve a comparar el archivo
+y se aplican los cambios en una única transacción.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from metricas.registro import tramo
+
+from . import indice
+from .importacion import (
+    FilaInvalida, ResultadoImportacion, aplicar_cambios, calcular_cambios,
+    eliminar_ausentes, estimar_filas, guardar_lote, leer_filas, leer_lotes,
+)
+from .models import ImportacionCatalogo
+
+logger = logging.getLogger(__name__)
+
+# Una importación en curso sin latido durante este lapso se considera abandonada.
+LATIDO_VENCIDO = timedelta(minutes=5)
+
+_hilo = None
+_hilo_lock = threading.Lock()
+_aviso = threading.Event()
+
+
+def encolar(ruta, nombre_original, modo=ImportacionCatalogo.SINCRONIZAR):
+    """Registra la importación y despierta al hilo local si está habilitado."""
+    job = ImportacionCatalogo.objects.create(archivo=ruta, nombre_original=nombre_original, modo=modo)
+    despertar()
+    return job
+
+
+def confirmar(job):
+    """Vuelve a encolar una importación revisada para que se apliquen sus cambios."""
+    job.confirmada = True
+    job.estado = ImportacionCatalogo.PENDIENTE
+    job.save(update_fields=["confirmada", "estado"])
+    despertar()
+
+
+def despertar():
+    if getattr(settings, "IMPORTACIONES_EN_HILO", True):
+        transaction.on_commit(iniciar_hilo)
+
+
+def tomar_siguiente():
+    """Reserva la importación pendiente más antigua si no hay otra en curso."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        activas = list(
+            ImportacionCatalogo.objects.select_for_update()
+            .filter(estado__in=[ImportacionCatalogo.PENDIENTE, ImportacionCatalogo.EN_PROCESO])
+            .order_by("creada", "id")
+        )
+        for job in activas:
+            if job.estado == ImportacionCatalogo.EN_PROCESO:
+                if job.latido and job.latido > ahora - LATIDO_VENCIDO:
+                    return None
+                logger.warning("Retomando importación abandonada %s", job.pk)
+        if not activas:
+            return None
+        job = activas[0]
+        job.estado = ImportacionCatalogo.EN_PROCESO
+        job.iniciada = job.iniciada or ahora
+        job.latido = ahora
+        job.save(update_fields=["estado", "iniciada", "latido"])
+        return job
+
+
+def _reemplazar(job, resultado):
+    """Escribe los lotes pendientes y devuelve los códigos leídos del archivo."""
+    codigos = set()
+    for ultima_fila, lote in leer_lotes(leer_filas(job.archivo), resultado):
+        codigos.update(s.codigo for s in lote)
+        resultado.procesados += len(lote)
+        if ultima_fila <= job.filas_confirmadas:
+            continue  # ya confirmado en una ejecución anterior
+        with tramo("importacion_lote"), transaction.atomic():
+            guardar_lote(lote)
+            job.filas_confirmadas = ultima_fila
+            job.procesados = resultado.procesados
+            job.total_rechazos = resultado.total_rechazos
+            job.latido = timezone.now()
+            job.save(update_fields=["filas_confirmadas", "procesados", "total_rechazos", "latido"])
+
+    if not codigos:
+        raise FilaInvalida("el archivo no tiene filas válidas")
+    return codigos
+
+
+def _sincronizar(job, resultado):
+    def al_avanzar(ultima_fila):
+        job.filas_confirmadas = ultima_fila
+        job.total_rechazos = resultado.total_rechazos
+        job.latido = timezone.now()
+        job.save(update_fields=["filas_confirmadas", "total_rechazos", "latido"])
+
+    # Sin transacción abierta: el avance de la lectura se ve desde la web.
+    job.filas_confirmadas = 0
+    with tramo("importacion_comparar"):
+        cambios = calcular_cambios(leer_lotes(leer_filas(job.archivo), resultado), al_avanzar)
+    resultado.procesados = cambios.leidos
+    job.resumen = cambios.resumen()
+    if not job.confirmada:
+        return False
+    with tramo("importacion_aplicar"):
+        aplicar_cambios(cambios)
+    return True
+
+
+def procesar(job):
+    """Ejecuta (o retoma) una importación reservada con ``tomar_siguiente``."""
+    resultado = ResultadoImportacion()
+    inicio = time.perf_counter()
+    # Una sincronización sin confirmar solo compara: no cambia el catálogo.
+    escribe = job.modo == ImportacionCatalogo.REEMPLAZAR or job.confirmada
+
+    try:
+        if job.filas_estimadas is None:
+            job.filas_estimadas = estimar_filas(job.archivo)
+            job.save(update_fields=["filas_estimadas"])
+
+        codigos = None
+        if job.modo == ImportacionCatalogo.REEMPLAZAR:
+            codigos = _reemplazar(job, resultado)
+            terminada = True
+        else:
+            terminada = _sincronizar(job, resultado)
+
+        # Los borrados y el cierre de la importación se confirman juntos: si algo
+        # falla el catálogo no queda a medio reemplazar con la importación en curso.
+        with transaction.atomic():
+            if codigos is not None:
+                job.eliminados = eliminar_ausentes(codigos)
+            job.estado = ImportacionCatalogo.COMPLETADA if terminada else ImportacionCatalogo.REVISION
+            job.procesados = resultado.procesados
+            job.total_rechazos = resultado.total_rechazos
+            job.rechazos = resultado.rechazos
+            job.segundos = job.segundos + time.perf_counter() - inicio
+            job.finalizada = timezone.now() if terminada else None
+            job.save()
+        if terminada and os.path.exists(job.archivo):
+            os.remove(job.archivo)
+    except Exception as e:
+        logger.exception("Falló la importación %s", job.pk)
+        job.estado = ImportacionCatalogo.ERROR
+        job.mensaje = str(e)
+        job.rechazos = resultado.rechazos
+        job.segundos = job.segundos + time.perf_counter() - inicio
+        job.finalizada = timezone.now()
+        job.save(update_fields=["estado", "mensaje", "rechazos", "segundos", "finalizada"])
+    finally:
+        if escribe:
+            indice.invalidar()
+    return job
+
+
+def procesar_pendientes():
+    """Procesa importaciones hasta que no quede ninguna pendiente."""
+    procesadas = 0
+    while True:
+        job = tomar_siguiente()
+        if job is None:
+            return procesadas
+        procesar(job)
+        procesadas += 1
+
+
+def _ejecutar_hilo():
+    global _hilo
+    try:
+        while True:
+            with _hilo_lock:
+                if not _aviso.is_set():
+                    _hilo = None
+                    return
+                _aviso.clear()
+            close_old_connections()
+            try:
+                procesar_pendientes()
+            except Exception:
+                # p. ej. la base no responde: se registra y el hilo sigue vivo.
+                logger.exception("Falló el hilo de importaciones")
+    finally:
+        with _hilo_lock:
+            # Si el hilo muere, el próximo aviso debe poder crear otro.
+            if _hilo is threading.current_thread():
+                _hilo = None
+        connections.close_all()
+
+
+def iniciar_hilo():
+    """Despierta al hilo trabajador del proceso, creándolo si hace falta; lo devuelve."""
+    global _hilo
+    with _hilo_lock:
+        _aviso.set()
+        if _hilo is None:
+            _hilo = threading.Thread(target=_ejecutar_hilo, name="importaciones", daemon=True)
+            _hilo.start()
+        return _hilo
@@ -1,3 +1,475 @@
-from django.test import TestCase
+import csv
+import functools
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import exportacion, importacion, indice, paquetes, precios, tareas
+from .models import ImportacionCatalogo, Paquete, PaqueteItem, PrecioServicio, Servicio
+
+
+@override_settings(IVA_PORCENTAJE=Decimal("12"))
+class PreciosTests(TestCase):
+    def setUp(self):
+        self.servicio = Servicio.objects.create(
+            codigo="LAB001", nombre="Hemograma completo", area="Laboratorio",
+            costo_base=Decimal("10.00"), pvp_sugerido=Decimal("20.00"),
+            pvp_corporativo=Decimal("18.00"), porcentaje_ganancia=Decimal("50"),
+        )
+        indice.invalidar()
+
+    def test_niveles_se_calculan_al_guardar(self):
+        precio = PrecioServicio.objects.get(servicio=self.servicio)
+        self.assertEqual(
+            (precio.sugerido, precio.corporativo, precio.costo_margen),
+            (Decimal("20.00"), Decimal("18.00"), Decimal("15.00")),
+        )
+        self.assertEqual(precio.sugerido_con_iva, Decimal("22.40"))
+
+    def test_recalcular_en_bloque(self):
+        Servicio.objects.filter(pk=self.servicio.pk).update(costo_base=Decimal("20.00"), pvp_sugerido=Decimal("30.00"),
+                                porcentaje_ganancia=Decimal("50"))
+        self.assertEqual(precios.recalcular(codigos=["LAB001"]), 1)
+        self.assertEqual(precios.precios_de([self.servicio.pk]), {self.servicio.pk: Decimal("30.00")})
+
+    def test_autocompletado_por_nivel(self):
+        url = reverse("servicio_search")
+        [corporativo] = self.client.get(url, {"q": "LAB001", "nivel": "corporativo"}).json()
+        self.assertEqual((corporativo["precio"], corporativo["precio_con_iva"]), (18.0, 20.16))
+        [sugerido] = self.client.get(url, {"q": "LAB001", "nivel": "otro"}).json()
+        self.assertEqual(sugerido["precio"], 20.0)
+
+    def test_totales_redondean_el_iva_una_vez(self):
+        self.assertEqual(
+            precios.totales([Decimal("0.10")] * 3, Decimal("12")),
+            (Decimal("0.30"), Decimal("0.04"), Decimal("0.34")),
+        )
+
+
+class InstantaneaTests(TestCase):
+    def setUp(self):
+        Servicio.objects.create(codigo="IMG001", nombre="Ecografía abdominal", area="Imagen",
+                                costo_base=Decimal("20.00"), pvp_sugerido=Decimal("30.00"),
+                                porcentaje_ganancia=Decimal("50"))
+        Servicio.objects.create(codigo="IMG002", nombre="Radiografía", area="Imagen",
+                                costo_base=Decimal("10.00"), pvp_sugerido=Decimal("15.00"),
+                                porcentaje_ganancia=Decimal("50"), activo=False)
+        indice.invalidar()
+
+    def test_columnas_comprimidas_y_revalidacion(self):
+        url = reverse("servicio_instantanea")
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        datos = json.loads(gzip.decompress(response.content))
+        self.assertEqual(datos["codigo"], ["IMG001"])
+        self.assertEqual(datos["precios"]["sugerido"], [30.0])
+
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Servicio.objects.filter(codigo="IMG002").update(activo=True)
+        indice.invalidar()
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class ListadoCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Servicio.objects.create(codigo="LAB001", nombre="Hemograma", costo_base=Decimal("5"),
+                                pvp_sugerido=Decimal("8"), porcentaje_ganancia=Decimal("40"))
+
+    def test_fragmento_y_304(self):
+        url = reverse("servicio_list")
+        response = self.client.get(url)
+        self.assertContains(response, "LAB001")
+
+        # Solo se consulta la importación en curso; la página y el total salen de la caché.
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get(url), "LAB001")
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Servicio.objects.filter(codigo="LAB001").get().delete()
+        self.assertNotContains(self.client.get(url), "LAB001")
+
+
+class ExportacionTests(TestCase):
+    def setUp(self):
+        Servicio.objects.create(codigo="LAB001", nombre="Hemograma, completo", area="Laboratorio",
+                                costo_base=Decimal("5"), pvp_sugerido=Decimal("8.50"),
+                                porcentaje_ganancia=Decimal("40"))
+        Servicio.objects.create(codigo="LAB002", nombre="Glucosa", costo_base=Decimal("2"),
+                                pvp_sugerido=Decimal("3"), porcentaje_ganancia=Decimal("40"), activo=False)
+
+    def test_csv_se_puede_volver_a_importar(self):
+        response = self.client.get(reverse("servicio_exportar"), {"activos": "1"})
+        self.assertTrue(response.streaming)
+        texto = b"".join(response.streaming_content).decode("utf-8-sig")
+        encabezado, *filas = csv.reader(io.StringIO(texto))
+        self.assertEqual(encabezado[:4], ["codigo", "nombre", "area", "precio"])
+        [servicio] = [importacion.convertir_fila(fila) for fila in filas]
+        self.assertEqual((servicio.codigo, servicio.nombre, servicio.pvp_sugerido),
+                         ("LAB001", "Hemograma, completo", Decimal("8.50")))
+
+    async def test_csv_por_partes_con_asgi(self):
+        leidas = []
+
+        def filas(solo_activos):
+            for codigo in ["LAB001", "LAB002", "LAB003"]:
+                leidas.append(codigo)
+                yield [codigo, "Servicio", "", Decimal("1.00")]
+
+        with mock.patch.object(exportacion, "filas", filas), mock.patch("config.tablas.FILAS_POR_BLOQUE", 2):
+            response = await self.async_client.get(reverse("servicio_exportar"))
+            self.assertTrue(response.is_async)
+            partes = aiter(response.streaming_content)
+            await anext(partes)
+            # El primer bloque sale sin haber leído todas las filas.
+            self.assertEqual(leidas, ["LAB001"])
+            resto = [parte async for parte in partes]
+        self.assertEqual(leidas, ["LAB001", "LAB002", "LAB003"])
+        self.assertEqual(len(resto), 2)
+
+    def test_xlsx(self):
+        response = self.client.get(reverse("servicio_exportar"), {"formato": "xlsx"})
+        hoja = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+        self.assertEqual([fila[0] for fila in hoja.iter_rows(values_only=True)], ["codigo", "LAB001", "LAB002"])
+
+
+class ImportacionTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        Servicio.objects.create(codigo="LAB001", nombre="Hemograma", costo_base=5, pvp_sugerido=8,
+                                porcentaje_ganancia=0)
+        Servicio.objects.create(codigo="VIEJO", nombre="Ya no se ofrece", costo_base=1, pvp_sugerido=1,
+                                porcentaje_ganancia=0)
+
+    def _csv(self, texto, nombre="catalogo.csv"):
+        ruta = os.path.join(self.directorio.name, nombre)
+        with open(ruta, "w", encoding="utf-8-sig", newline="") as f:
+            f.write(texto)
+        return ruta
+
+    def _xlsx(self, filas):
+        wb = openpyxl.Workbook()
+        wb.active.append(["codigo", "nombre", "area", "precio"])
+        for fila in filas:
+            wb.active.append(fila)
+        contenido = io.BytesIO()
+        wb.save(contenido)
+        return contenido.getvalue()
+
+    def _subir(self, nombre, contenido, modo=ImportacionCatalogo.REEMPLAZAR):
+        with self.settings(MEDIA_ROOT=self.directorio.name, IMPORTACIONES_EN_HILO=False):
+            self.client.post(reverse("importar_catalogo"), {
+                "archivo": SimpleUploadedFile(nombre, contenido), "modo": modo})
+        self.assertEqual(tareas.procesar_pendientes(), 1)
+        return ImportacionCatalogo.objects.get()
+
+    def _catalogo(self):
+        return list(Servicio.objects.order_by("codigo").values_list("codigo", "nombre", "area", "pvp_sugerido"))
+
+    def test_csv_con_punto_y_coma_en_varios_lotes(self):
+        ruta = self._csv("codigo;nombre;area;precio\n"
+                         "LAB001;Hemograma completo;Laboratorio;8,50\n"
+                         "LAB002;Glucosa;;$3\n"
+                         "LAB003;Urea;Laboratorio;4\n")
+        resultado = importacion.importar_catalogo(ruta, tamano_lote=2)
+        self.assertEqual((resultado.procesados, resultado.eliminados, resultado.total_rechazos), (3, 1, 0))
+        self.assertEqual(self._catalogo(), [
+            ("LAB001", "Hemograma completo", "Laboratorio", Decimal("8.50")),
+            ("LAB002", "Glucosa", None, Decimal("3.00")),
+            ("LAB003", "Urea", "Laboratorio", Decimal("4.00")),
+        ])
+
+    def test_csv_subido(self):
+        job = self._subir("catalogo.csv", "codigo,nombre,area,precio\nLAB001,Hemograma,,9\n".encode())
+        self.assertEqual((job.estado, job.procesados, job.eliminados),
+                         (ImportacionCatalogo.COMPLETADA, 1, 1))
+        self.assertEqual(self._catalogo(), [("LAB001", "Hemograma", None, Decimal("9.00"))])
+        self.assertFalse(os.path.exists(job.archivo))
+
+    def test_xlsx_subido(self):
+        job = self._subir("catalogo.xlsx", self._xlsx([["LAB001", "Hemograma", "Laboratorio", 9.5],
+                                                       [1002, "Glucosa", None, None]]))
+        self.assertEqual(job.estado, ImportacionCatalogo.COMPLETADA)
+        self.assertEqual(self._catalogo(), [
+            ("1002", "Glucosa", None, Decimal("0.00")),
+            ("LAB001", "Hemograma", "Laboratorio", Decimal("9.50")),
+        ])
+
+    def test_filas_invalidas_quedan_en_el_reporte(self):
+        ruta = self._csv("codigo,nombre,area,precio\n"
+                         "LAB001,Hemograma,,8\n"
+                         ",Sin código,,1\n"
+                         "LAB002,Glucosa,,abc\n"
+                         "LAB003,Urea,,-2\n"
+                         ",,,\n"
+                         "LAB004,Creatinina,,5\n")
+        resultado = importacion.importar_catalogo(ruta)
+        self.assertEqual((resultado.procesados, resultado.total_rechazos), (2, 3))
+        self.assertEqual(resultado.rechazos, [
+            (3, "faltan código o nombre"),
+            (4, "precio inválido: 'abc'"),
+            (5, "precio fuera de rango: -2.00"),
+        ])
+        self.assertEqual([fila[0] for fila in self._catalogo()], ["LAB001", "LAB004"])
+
+    def test_sin_filas_validas_no_toca_el_catalogo(self):
+        ruta = self._csv("codigo,nombre,area,precio\nLAB009,,,1\n")
+        with self.assertRaisesMessage(importacion.FilaInvalida, "no tiene filas válidas"):
+            importacion.importar_catalogo(ruta)
+        self.assertEqual([fila[0] for fila in self._catalogo()], ["LAB001", "VIEJO"])
+
+        with self.assertLogs("catalogo.tareas", "ERROR"):
+            job = self._subir("vacio.xlsx", self._xlsx([]))
+        self.assertEqual(job.estado, ImportacionCatalogo.ERROR)
+        self.assertIn("no tiene filas válidas", job.mensaje)
+        self.assertEqual(Servicio.objects.count(), 2)
+
+
+class SincronizacionTests(TestCase):
+    def setUp(self):
+        for codigo, nombre, precio, activo in [
+            ("LAB001", "Hemograma", "8.00", True), ("LAB002", "Glucosa", "3.00", True),
+            ("LAB003", "Urea", "4.00", True), ("LAB004", "Creatinina", "5.00", False),
+        ]:
+            Servicio.objects.create(codigo=codigo, nombre=nombre, costo_base=precio, pvp_sugerido=precio,
+                                    pvp_corporativo=precio, porcentaje_ganancia=0, activo=activo)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = os.path.join(directorio.name, "catalogo.csv")
+        with open(self.ruta, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows([["codigo", "nombre", "area", "precio"], ["LAB001", "Hemograma", "", "8"],
+                                     ["LAB002", "Glucosa", "", "3.50"], ["LAB005", "Urea en orina", "", "6"]])
+
+    def _catalogo(self):
+        return list(Servicio.objects.order_by("codigo").values_list("codigo", "pvp_sugerido", "activo"))
+
+    def _procesar(self, modo=ImportacionCatalogo.SINCRONIZAR):
+        ImportacionCatalogo.objects.create(archivo=self.ruta, nombre_original="catalogo.csv", modo=modo)
+        return tareas.procesar(tareas.tomar_siguiente())
+
+    def test_vista_previa_no_escribe(self):
+        antes = self._catalogo()
+        with mock.patch.object(tareas.indice, "invalidar") as invalidar:
+            job = self._procesar()
+        self.assertEqual(job.estado, ImportacionCatalogo.REVISION)
+        self.assertEqual({c: job.resumen[c] for c in ("nuevos", "actualizados", "desactivados", "sin_cambios")},
+                         {"nuevos": 1, "actualizados": 1, "desactivados": 1, "sin_cambios": 1})
+        self.assertEqual(job.resumen["ejemplos"]["desactivados"], ["LAB003"])
+        self.assertEqual(self._catalogo(), antes)
+        invalidar.assert_not_called()
+        self.assertTrue(os.path.exists(self.ruta))
+
+    def test_aplicar_actualiza_y_desactiva(self):
+        job = self._procesar()
+        tareas.confirmar(job)
+        job = tareas.procesar(tareas.tomar_siguiente())
+        self.assertEqual(job.estado, ImportacionCatalogo.COMPLETADA)
+        self.assertEqual(self._catalogo(), [
+            ("LAB001", Decimal("8.00"), True),
+            ("LAB002", Decimal("3.50"), True),
+            ("LAB003", Decimal("4.00"), False),
+            ("LAB004", Decimal("5.00"), False),
+            ("LAB005", Decimal("6.00"), True),
+        ])
+        self.assertEqual(PrecioServicio.objects.get(servicio__codigo="LAB002").sugerido, Decimal("3.50"))
+
+    def test_reemplazar_borra_los_ausentes(self):
+        job = self._procesar(ImportacionCatalogo.REEMPLAZAR)
+        self.assertEqual((job.estado, job.eliminados), (ImportacionCatalogo.COMPLETADA, 2))
+        self.assertEqual([fila[0] for fila in self._catalogo()], ["LAB001", "LAB002", "LAB005"])
+
+    def test_reemplazar_borra_y_cierra_en_una_transaccion(self):
+        def eliminar_y_fallar(codigos):
+            importacion.eliminar_ausentes(codigos)
+            raise OperationalError("disk I/O error")
+
+        with mock.patch.object(tareas, "eliminar_ausentes", eliminar_y_fallar), \
+                self.assertLogs("catalogo.tareas", "ERROR"):
+            job = self._procesar(ImportacionCatalogo.REEMPLAZAR)
+        self.assertEqual(job.estado, ImportacionCatalogo.ERROR)
+        # Los lotes quedaron escritos pero no se borró nada.
+        self.assertEqual([fila[0] for fila in self._catalogo()],
+                         ["LAB001", "LAB002", "LAB003", "LAB004", "LAB005"])
+
+
+class OperacionesTests(TestCase):
+    def setUp(self):
+        for codigo, area, precio in [("LAB001", "Laboratorio", "10.00"), ("LAB002", "Laboratorio", "20.00"),
+                                     ("IMG001", "Imagen", "30.00")]:
+            Servicio.objects.create(codigo=codigo, nombre=f"Servicio {codigo}", area=area,
+                                    costo_base=Decimal("1"), pvp_sugerido=Decimal(precio),
+                                    porcentaje_ganancia=Decimal("0"))
+        indice.invalidar()
+
+    def _enviar(self, lista, **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("servicio_operaciones"), {"operaciones": lista, **extra},
+                                    content_type="application/json")
+
+    def test_operaciones_en_orden_con_resultados(self):
+        response = self._enviar([
+            {"op": "crear", "codigo": "LAB003", "nombre": "Urea", "area": "Laboratorio", "pvp_sugerido": "4"},
+            {"op": "ajustar_precio", "area": "Laboratorio", "porcentaje": 5},
+            {"op": "actualizar", "codigo": "LAB002", "nombre": "Glucosa"},
+            {"op": "desactivar", "codigo": "IMG001"},
+            {"op": "actualizar", "codigo": "NOEXISTE", "nombre": "x"},
+        ])
+        datos = response.json()
+        self.assertEqual((datos["aplicadas"], datos["errores"]), (4, 1))
+        self.assertEqual(datos["resultados"][1]["afectados"], 3)
+        self.assertFalse(datos["resultados"][4]["ok"])
+
+        precios_actuales = dict(Servicio.objects.values_list("codigo", "pvp_sugerido"))
+        self.assertEqual(precios_actuales["LAB001"], Decimal("10.50"))
+        self.assertEqual(precios_actuales["LAB003"], Decimal("4.20"))
+        self.assertFalse(Servicio.objects.get(codigo="IMG001").activo)
+        self.assertEqual(PrecioServicio.objects.get(servicio__codigo="LAB002").sugerido, Decimal("21.00"))
+        [glucosa] = self.client.get(reverse("servicio_search"), {"q": "Glucosa"}).json()
+        self.assertEqual(glucosa["precio"], 21.0)
+
+    def test_todo_o_nada(self):
+        response = self._enviar([
+            {"op": "ajustar_precio", "area": "Imagen", "porcentaje": 10},
+            {"op": "crear", "codigo": "LAB001", "nombre": "Repetido", "pvp_sugerido": "1"},
+        ], todo_o_nada=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Servicio.objects.get(codigo="IMG001").pvp_sugerido, Decimal("30.00"))
+
+
+class PaquetesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.hemograma = Servicio.objects.create(
+            codigo="LAB01", nombre="Hemograma", costo_base=5, pvp_sugerido=8, pvp_corporativo=7,
+            porcentaje_ganancia=40)
+        self.glucosa = Servicio.objects.create(
+            codigo="LAB02", nombre="Glucosa", costo_base=2, pvp_sugerido=3, porcentaje_ganancia=40)
+        self.paquete = Paquete.objects.create(nombre="Perfil básico")
+        PaqueteItem.objects.create(paquete=self.paquete, servicio=self.glucosa, cantidad=2, orden=2)
+        PaqueteItem.objects.create(paquete=self.paquete, servicio=self.hemograma, orden=1)
+
+    def test_definicion_en_memoria_y_precios_actuales(self):
+        paquetes.items(self.paquete.pk)
+        with self.assertNumQueries(1):
+            items, no_disponibles = paquetes.items(self.paquete.pk, precios.CORPORATIVO)
+        self.assertEqual(no_disponibles, 0)
+        self.assertEqual([(i["codigo"], i["cantidad"], i["precio"]) for i in items],
+                         [("LAB01", 1, 7.0), ("LAB02", 2, 3.0)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hemograma.pvp_corporativo = Decimal("6.50")
+            self.hemograma.save()
+            self.glucosa.activo = False
+            self.glucosa.save()
+        items, no_disponibles = paquetes.items(self.paquete.pk, precios.CORPORATIVO)
+        self.assertEqual([(i["codigo"], i["precio"]) for i in items], [("LAB01", 6.5)])
+        self.assertEqual(no_disponibles, 1)
+
+    def test_importacion_que_reemplaza_no_borra_el_item_del_paquete(self):
+        self.assertEqual(len(paquetes.items(self.paquete.pk)[0]), 2)
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, "catalogo.csv")
+            with open(ruta, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows([["codigo", "nombre", "area", "precio"], ["LAB01", "Hemograma", "", "9"]])
+            with self.captureOnCommitCallbacks(execute=True):
+                resultado = importacion.importar_catalogo(ruta)
+        self.assertEqual(resultado.eliminados, 1)
+        self.assertEqual(list(self.paquete.items.values_list("servicio", "cantidad")),
+                         [(self.hemograma.pk, 1), (None, 2)])
+        response = self.client.get(reverse("paquete_items", args=[self.paquete.pk]))
+        self.assertEqual([i["codigo"] for i in response.json()["items"]], ["LAB01"])
+        self.assertEqual(response.json()["no_disponibles"], 1)
+
+    def test_editar_paquete_invalida(self):
+        self.assertEqual(paquetes.listar(), [(self.paquete.pk, "Perfil básico")])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paquete.activo = False
+            self.paquete.save()
+        self.assertEqual(paquetes.listar(), [])
+        response = self.client.get(reverse("paquete_items", args=[self.paquete.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class TareasTests(TestCase):
+    def test_el_hilo_sobrevive_a_un_error_de_la_base(self):
+        with mock.patch.object(tareas, "procesar_pendientes",
+                               side_effect=[OperationalError("database is locked"), 0]) as procesar, \
+                self.assertLogs("catalogo.tareas", "ERROR"):
+            tareas.iniciar_hilo().join()
+            self.assertIsNone(tareas._hilo)
+            # El siguiente aviso levanta otro hilo y la cola vuelve a procesarse.
+            tareas.iniciar_hilo().join()
+        self.assertEqual(procesar.call_count, 2)
+        self.assertIsNone(tareas._hilo)
+
+    def _job(self, filas, **campos):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ruta = os.path.join(directorio.name, "catalogo.csv")
+        with open(ruta, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows([["codigo", "nombre", "area", "precio"], *filas])
+        return ImportacionCatalogo.objects.create(archivo=ruta, nombre_original="catalogo.csv", **campos)
+
+    def test_retoma_desde_el_ultimo_lote_confirmado(self):
+        Servicio.objects.create(codigo="VIEJO", nombre="Ya no se ofrece", costo_base=1, pvp_sugerido=1,
+                                porcentaje_ganancia=0)
+        job = self._job([[f"LAB{i}", f"Servicio {i}", "", i] for i in range(1, 6)],
+                        modo=ImportacionCatalogo.REEMPLAZAR)
+        lotes = []
+
+        def guardar(lote, fallar=False):
+            lotes.append([s.codigo for s in lote])
+            if fallar and len(lotes) == 2:
+                raise OperationalError("disk I/O error")
+            importacion.guardar_lote(lote)
+
+        # Lotes de dos filas: (filas 2-3), (4-5), (6).
+        with mock.patch.object(tareas, "leer_lotes", functools.partial(importacion.leer_lotes, tamano=2)):
+            with mock.patch.object(tareas, "guardar_lote", functools.partial(guardar, fallar=True)), \
+                    self.assertLogs("catalogo.tareas", "ERROR"):
+                tareas.procesar(tareas.tomar_siguiente())
+            job.refresh_from_db()
+            self.assertEqual((job.estado, job.filas_confirmadas), (ImportacionCatalogo.ERROR, 3))
+            self.assertEqual(Servicio.objects.count(), 3)  # primer lote + el viejo, sin borrar
+
+            job.estado = ImportacionCatalogo.PENDIENTE
+            job.save(update_fields=["estado"])
+            lotes.clear()
+            with mock.patch.object(tareas, "guardar_lote", guardar):
+                tareas.procesar(tareas.tomar_siguiente())
+        self.assertEqual(lotes, [["LAB3", "LAB4"], ["LAB5"]])
+        job.refresh_from_db()
+        self.assertEqual((job.estado, job.procesados, job.eliminados), (ImportacionCatalogo.COMPLETADA, 5, 1))
+        self.assertEqual(sorted(Servicio.objects.values_list("codigo", flat=True)),
+                         ["LAB1", "LAB2", "LAB3", "LAB4", "LAB5"])
+
+    def test_toma_una_importacion_con_latido_vencido(self):
+        colgada = self._job([["LAB1", "Hemograma", "", 8]], estado=ImportacionCatalogo.EN_PROCESO,
+                            latido=timezone.now() - tareas.LATIDO_VENCIDO - timedelta(seconds=1))
+        self._job([["LAB2", "Glucosa", "", 3]])
+        with self.assertLogs("catalogo.tareas", "WARNING"):
+            self.assertEqual(tareas.tomar_siguiente(), colgada)
+        colgada.refresh_from_db()
+        self.assertGreater(colgada.latido, timezone.now() - timedelta(minutes=1))
+        # Mientras su latido esté al día nadie más toma otra importación.
+        self.assertIsNone(tareas.tomar_siguiente())
@@ -9,5 +9,13 @@ urlpatterns = [
     path("eliminar-seleccionados/", views.servicio_bulk_delete, name="servicio_bulk_delete"),
     path("eliminar-todo/", views.servicio_delete_all, name="servicio_delete_all"),
     path("importar/", views.importar_catalogo_view, name="importar_catalogo"),
+    path("importar/<int:pk>/estado/", views.importacion_estado, name="importacion_estado"),
+    path("importar/<int:pk>/reintentar/", views.importacion_reintentar, name="importacion_reintentar"),
+    path("importar/<int:pk>/aplicar/", views.importacion_aplicar, name="importacion_aplicar"),
+    path("importar/<int:pk>/descartar/", views.importacion_descartar, name="importacion_descartar"),
+    path("operaciones/", views.servicio_operaciones, name="servicio_operaciones"),
+    path("exportar/", views.servicio_exportar, name="servicio_exportar"),
     path("buscar/", views.servicio_search, name="servicio_search"),
+    path("instantanea/", views.servicio_instantanea, name="servicio_instantanea"),
+    path("paquetes/<int:pk>/items/", views.paquete_items, name="paquete_items"),
 ]
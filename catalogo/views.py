@@ -1,40 +1,116 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.db.models import Q
 from django.core.files.storage import FileSystemStorage
 from django.conf import settings
-from django.core.paginator import Paginator  # 👈 agregado
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 
+import hashlib
+import json
 import os
-import openpyxl
+from datetime import timedelta
 
-from .models import Servicio
+from config import condicional, tablas, versiones
+
+from . import exportacion, indice, instantanea, operaciones, paquetes, tareas
+from .models import ImportacionCatalogo, Servicio
+
+
+POR_PAGINA = 50
 
 
 def servicio_list(request):
-    """Listado con buscador, opciones masivas y paginación."""
-    query = request.GET.get("q", "")
-    if query:
-        servicios = Servicio.objects.filter(
-            Q(nombre__icontains=query) |
-            Q(codigo__icontains=query) |
-            Q(area__icontains=query)
-        )
-    else:
-        servicios = Servicio.objects.all()
+    """Listado con buscador, opciones masivas y paginación por código.
 
-    # 👇 Paginación: máximo 50 registros por página
-    paginator = Paginator(servicios.order_by("codigo"), 50)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    La página se pide con ``?despues=<codigo>`` o ``?antes=<codigo>`` (o
+    ``?ultima=1``) y se busca con ``WHERE codigo > ...`` sobre el índice único,
+    así que la última página cuesta lo mismo que la primera. El total se cuenta
+    una vez por búsqueda y versión del catálogo.
 
-    return render(request, "catalogo/servicio_list.html", {
-        "servicios": page_obj.object_list,
-        "page_obj": page_obj,
-        "query": query,
-    })
+    Mientras el catálogo no cambie la página se revalida con un 304, y la
+    tabla se guarda como fragmento en caché: en ese caso la página y el total
+    no se consultan (se calculan solo si la plantilla los usa).
+    """
+    query = request.GET.get("q", "")
+    importacion = _importacion_reciente()
+    estado = (importacion.pk, importacion.estado, importacion.procesados,
+              importacion.total_rechazos, importacion.mensaje) if importacion else ()
+    etiqueta = condicional.etag(request, "catalogo", extra=estado)
+
+    def generar():
+        if query:
+            servicios = Servicio.objects.filter(
+                Q(nombre__icontains=query) |
+                Q(codigo__icontains=query) |
+                Q(area__icontains=query)
+            )
+        else:
+            servicios = Servicio.objects.all()
+
+        def pagina():
+            datos = _pagina_por_codigo(
+                servicios,
+                despues=request.GET.get("despues"),
+                antes=request.GET.get("antes"),
+                ultima=request.GET.get("ultima") == "1",
+            )
+            datos["total"] = _contar(servicios, query)
+            return datos
+
+        return render(request, "catalogo/servicio_list.html", {
+            "pagina": SimpleLazyObject(pagina),
+            "query": query,
+            "importacion": importacion,
+            "version": versiones.obtener("catalogo"),
+        })
+
+    return condicional.responder(request, etiqueta, generar)
+
+
+def _pagina_por_codigo(servicios, despues=None, antes=None, ultima=False, tamano=POR_PAGINA):
+    """Una página ordenada por código, pidiendo una fila de más para saber si hay otra."""
+    if antes or ultima:
+        if antes:
+            servicios = servicios.filter(codigo__lt=antes)
+        filas = list(servicios.order_by("-codigo")[:tamano + 1])
+        hay_anterior, hay_siguiente = len(filas) > tamano, bool(antes)
+        filas = filas[:tamano][::-1]
+    else:
+        if despues:
+            servicios = servicios.filter(codigo__gt=despues)
+        filas = list(servicios.order_by("codigo")[:tamano + 1])
+        hay_anterior, hay_siguiente = bool(despues), len(filas) > tamano
+        filas = filas[:tamano]
+    return {
+        "servicios": filas,
+        "anterior": filas[0].codigo if hay_anterior and filas else None,
+        "siguiente": filas[-1].codigo if hay_siguiente and filas else None,
+    }
+
+
+def _contar(servicios, query):
+    """Total de la búsqueda; se recalcula solo cuando cambia el catálogo."""
+    firma = hashlib.md5(query.encode()).hexdigest()
+    clave = f"catalogo:total:{versiones.obtener('catalogo')}:{firma}"
+    total = cache.get(clave)
+    if total is None:
+        total = servicios.count()
+        cache.set(clave, total, 60 * 60)
+    return total
+
+
+def _importacion_reciente():
+    """Última importación si sigue en curso o terminó hace poco."""
+    job = ImportacionCatalogo.objects.first()
+    if job and (job.activa or job.estado == ImportacionCatalogo.REVISION
+                or job.finalizada and timezone.now() - job.finalizada < timedelta(minutes=10)):
+        return job
+    return None
 
 
 @require_http_methods(["POST"])
@@ -112,60 +188,150 @@ def servicio_delete_all(request):
 
 
 def importar_catalogo_view(request):
-    """Importar un archivo Excel .xlsx y reemplazar el catálogo."""
+    """Encolar un archivo Excel .xlsx o CSV para sincronizar o reemplazar el catálogo."""
     if request.method == "POST" and request.FILES.get("archivo"):
         archivo = request.FILES["archivo"]
+        modo = request.POST.get("modo", ImportacionCatalogo.SINCRONIZAR)
+        if modo not in dict(ImportacionCatalogo.MODOS):
+            modo = ImportacionCatalogo.SINCRONIZAR
         fs = FileSystemStorage(location=os.path.join(settings.MEDIA_ROOT, "uploads"))
         filename = fs.save(archivo.name, archivo)
-        filepath = fs.path(filename)
-
-        try:
-            wb = openpyxl.load_workbook(filepath)
-            sheet = wb.active
-            count = 0
-            Servicio.objects.all().delete()  # 🔥 borra la base antes de cargar nueva
-
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                codigo, nombre, area, precio = row[:4]
-                if not codigo or not nombre:
-                    continue
-                Servicio.objects.create(
-                    codigo=str(codigo).strip(),
-                    nombre=str(nombre).strip(),
-                    area=(str(area).strip() if area else None),
-                    costo_base=float(precio or 0),
-                    pvp_sugerido=float(precio or 0),
-                    pvp_corporativo=float(precio or 0),
-                    porcentaje_ganancia=0,
-                    activo=True,
-                )
-                count += 1
-
-            messages.success(request, f"✅ Se cargaron {count} servicios desde el archivo.")
-        except Exception as e:
-            messages.error(request, f"❌ Error procesando archivo: {e}")
-
-        os.remove(filepath)  # limpiar archivo temporal
+        tareas.encolar(fs.path(filename), archivo.name, modo)
+        messages.info(request, f"⏳ El archivo '{archivo.name}' quedó en cola de importación.")
+        return redirect("servicio_list")
+
+    return redirect("servicio_list")
+
+
+def importacion_estado(request, pk):
+    """Endpoint JSON con el avance de una importación."""
+    job = get_object_or_404(ImportacionCatalogo, pk=pk)
+    return JsonResponse({
+        "id": job.pk,
+        "archivo": job.nombre_original,
+        "estado": job.estado,
+        "estado_display": job.get_estado_display(),
+        "activa": job.activa,
+        "porcentaje": job.porcentaje,
+        "procesados": job.procesados,
+        "eliminados": job.eliminados,
+        "total_rechazos": job.total_rechazos,
+        "rechazos": job.rechazos[:10],
+        "resumen": job.resumen,
+        "filas_por_segundo": round(job.procesados / job.segundos) if job.segundos else None,
+        "mensaje": job.mensaje,
+    })
+
+
+@require_http_methods(["POST"])
+def importacion_reintentar(request, pk):
+    """Volver a encolar una importación fallida; retoma desde el último lote confirmado."""
+    job = get_object_or_404(ImportacionCatalogo, pk=pk, estado=ImportacionCatalogo.ERROR)
+    if not os.path.exists(job.archivo):
+        messages.error(request, "❌ El archivo de la importación ya no existe; súbelo de nuevo.")
         return redirect("servicio_list")
+    job.estado = ImportacionCatalogo.PENDIENTE
+    job.mensaje = ""
+    job.finalizada = None
+    job.save(update_fields=["estado", "mensaje", "finalizada"])
+    tareas.despertar()
+    messages.info(request, f"⏳ Se reintentará la importación de '{job.nombre_original}'.")
+    return redirect("servicio_list")
+
+
+@require_http_methods(["POST"])
+def importacion_aplicar(request, pk):
+    """Aplicar los cambios de una sincronización ya revisada."""
+    job = get_object_or_404(ImportacionCatalogo, pk=pk, estado=ImportacionCatalogo.REVISION)
+    tareas.confirmar(job)
+    messages.info(request, f"⏳ Aplicando los cambios de '{job.nombre_original}'.")
+    return redirect("servicio_list")
 
+
+@require_http_methods(["POST"])
+def importacion_descartar(request, pk):
+    """Descartar una sincronización sin aplicar sus cambios."""
+    job = get_object_or_404(ImportacionCatalogo, pk=pk, estado=ImportacionCatalogo.REVISION)
+    if os.path.exists(job.archivo):
+        os.remove(job.archivo)
+    job.delete()
+    messages.info(request, f"🗑 Se descartó la importación de '{job.nombre_original}'.")
     return redirect("servicio_list")
 
 
-def servicio_search(request):
-    """Endpoint JSON para autocompletar ítems en proforma."""
+@require_http_methods(["POST"])
+def servicio_operaciones(request):
+    """Aplica en bloque operaciones JSON sobre el catálogo (ver ``catalogo.operaciones``).
+
+    Cuerpo: ``{"operaciones": [...], "todo_o_nada": false}``; se envía con la
+    cabecera ``X-CSRFToken``. Responde el resultado de cada operación.
+    """
+    try:
+        datos = json.loads(request.body)
+        lista = datos["operaciones"]
+        if not isinstance(lista, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Se espera un objeto JSON con la lista 'operaciones'."}, status=400)
+    if len(lista) > operaciones.MAX_OPERACIONES:
+        return JsonResponse({"error": f"Máximo {operaciones.MAX_OPERACIONES} operaciones por petición."},
+                            status=400)
+
+    resultado = operaciones.aplicar(lista, todo_o_nada=bool(datos.get("todo_o_nada")))
+    estado = 400 if datos.get("todo_o_nada") and resultado.errores else 200
+    return JsonResponse(resultado.como_dict(), status=estado)
+
+
+def servicio_exportar(request):
+    """Descarga el catálogo como CSV o Excel (``?formato=xlsx``), generado mientras se envía."""
+    formato = request.GET.get("formato") or "csv"
+    if formato not in tablas.FORMATOS:
+        return HttpResponseBadRequest("Formato inválido.")
+    filas = exportacion.filas(solo_activos=request.GET.get("activos") == "1")
+    return tablas.respuesta(request, formato, "catalogo", exportacion.ENCABEZADOS, filas, "Catálogo")
+
+
+async def servicio_search(request):
+    """Endpoint JSON para autocompletar ítems en proforma (``?nivel=`` elige el precio).
+
+    Es async: con ASGI muchas búsquedas simultáneas comparten el event loop,
+    porque el índice vive en memoria y no se consulta la base.
+    """
     q = request.GET.get("q", "").strip()
     if not q:
         return JsonResponse([], safe=False)
 
-    servicios = Servicio.objects.filter(
-        Q(nombre__icontains=q) | Q(codigo__icontains=q)
-    ).filter(activo=True)[:15]
-
-    data = [{
-        "id": s.id,
-        "codigo": s.codigo,
-        "nombre": s.nombre,
-        "precio": float(s.pvp_sugerido or 0),
-    } for s in servicios]
-
-    return JsonResponse(data, safe=False)
+    return JsonResponse(await indice.abuscar(q, nivel=request.GET.get("nivel")), safe=False)
+
+
+def servicio_instantanea(request):
+    """Catálogo activo completo y comprimido para buscar en el navegador.
+
+    Se revalida con ``If-None-Match``: mientras el catálogo no cambie la
+    respuesta es un 304 sin cuerpo.
+    """
+    datos = instantanea.obtener()
+    codificacion, cuerpo = datos.para(request.headers.get("Accept-Encoding"))
+    etag = datos.etag(codificacion)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(cuerpo, content_type="application/json")
+        if codificacion != "identity":
+            response.headers["Content-Encoding"] = codificacion
+    response.headers["ETag"] = etag
+    response.headers["X-Catalogo-Version"] = datos.version
+    patch_vary_headers(response, ["Accept-Encoding"])
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def paquete_items(request, pk):
+    """Ítems de un paquete con los precios actuales (``?nivel=``) para agregarlos a la proforma.
+
+    La definición del paquete sale de memoria; solo se consultan los precios.
+    """
+    resultado = paquetes.items(pk, request.GET.get("nivel"))
+    if resultado is None:
+        return JsonResponse({"error": "Paquete no encontrado."}, status=404)
+    items, no_disponibles = resultado
+    return JsonResponse({"items": items, "no_disponibles": no_disponibles})
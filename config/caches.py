@@ -0,0 +1,58 @@
+"""Configuración de la caché a partir de ``CACHE_URL``.
+
+Formatos aceptados::
+
+    file:///cache/django           (ruta relativa a BASE_DIR; por defecto)
+    locmem://                      (memoria del proceso; solo con un único proceso)
+    file:////var/cache/proformas   (ruta absoluta)
+    redis://localhost:6379/1       (requiere el paquete ``redis``)
+
+Los tokens de versión (``config.versiones``) viven en esta caché: con varios
+procesos (los workers de gunicorn y el trabajador de importaciones) hace falta
+una caché compartida, de archivos o Redis, para que un cambio hecho en un
+proceso invalide lo que guardaron los demás. Por eso la predeterminada es la
+de archivos, y ``gunicorn.conf.py`` no arranca varios workers con ``locmem``.
+"""
+import os
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+POR_DEFECTO = "file:///cache/django"
+
+_MOTORES = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "rediss": "django.core.cache.backends.redis.RedisCache",
+}
+
+
+def es_local(url):
+    """True si cada proceso tendría su propia caché (no sirve con varios procesos)."""
+    return urlsplit(url).scheme == "locmem"
+
+
+def configurar(url, base_dir):
+    """Traduce ``url`` al diccionario que espera ``CACHES["default"]``."""
+    partes = urlsplit(url)
+    motor = _MOTORES.get(partes.scheme)
+    if motor is None:
+        raise ValueError(f"CACHE_URL con esquema no soportado: {partes.scheme!r}")
+    cache = {
+        "BACKEND": motor,
+        "TIMEOUT": int(os.environ.get("CACHE_TIMEOUT", 300)),
+        "KEY_PREFIX": os.environ.get("CACHE_PREFIJO", "proformas"),
+    }
+    if partes.scheme == "locmem":
+        cache["LOCATION"] = partes.netloc or "proformas"
+        cache["OPTIONS"] = {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRADAS", 5000))}
+    elif partes.scheme == "file":
+        ruta = unquote(partes.path)
+        if ruta.startswith("/"):
+            ruta = ruta[1:]  # file:///relativa -> "relativa"; file:////abs -> "/abs"
+        ruta = Path(ruta or "cache/django")
+        cache["LOCATION"] = str(ruta if ruta.is_absolute() else Path(base_dir) / ruta)
+        cache["OPTIONS"] = {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRADAS", 5000))}
+    else:
+        cache["LOCATION"] = url
+    return cache
@@ -0,0 +1,41 @@
+"""GET condicional para páginas que solo cambian cuando cambian sus datos.
+
+El ETag combina los tokens de ``config.versiones`` de los datos que muestra la
+página con la URL completa y el secreto CSRF del navegador (los formularios de
+la página llevan un token derivado de él). Mientras nada de eso cambie, el
+navegador revalida con ``If-None-Match`` y recibe un 304 sin que se genere la
+página.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import versiones
+
+
+def etag(request, *nombres, extra=()):
+    """ETag de la página, o ``None`` si tiene mensajes pendientes de mostrar."""
+    # len() no marca los mensajes como leídos.
+    if len(messages.get_messages(request)):
+        return None
+    # get_token() fija el secreto de este navegador si aún no tiene cookie, así
+    # que la primera respuesta ya lleva el mismo ETag que las siguientes.
+    get_token(request)
+    partes = [versiones.obtener(nombre) for nombre in nombres]
+    partes += [request.get_full_path(), request.META.get("CSRF_COOKIE", "")]
+    partes += [str(valor) for valor in extra]
+    return quote_etag(hashlib.md5("\n".join(partes).encode()).hexdigest())
+
+
+def responder(request, etiqueta, generar):
+    """304 si el cliente ya tiene ``etiqueta``; si no, la respuesta de ``generar()``."""
+    response = get_conditional_response(request, etag=etiqueta) if etiqueta else None
+    if response is None:
+        response = generar()
+    if etiqueta:
+        response.headers["ETag"] = etiqueta
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
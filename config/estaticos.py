@@ -0,0 +1,48 @@
+"""Estáticos: nombres con hash, variantes comprimidas y servidos por WhiteNoise."""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class EstaticosComprimidos(CompressedManifestStaticFilesStorage):
+    """``collectstatic`` genera nombres con hash y archivos .gz/.br.
+
+    Mientras no exista el manifiesto (desarrollo, pruebas) las plantillas usan
+    los nombres originales en vez de fallar.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+class EstaticosMiddleware(WhiteNoiseMiddleware):
+    """``WhiteNoiseMiddleware`` que también acepta ASGI.
+
+    El de WhiteNoise solo es síncrono y con ASGI obligaría a Django a correr
+    en un hilo todas las vistas que están detrás, incluidas las async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
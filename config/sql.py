@@ -0,0 +1,61 @@
+"""Escrituras masivas en SQL directo cuando el ORM es el cuello de botella.
+
+``bulk_create(update_conflicts=True)`` prepara cada valor por separado y arma
+una sentencia por lote; con decenas de miles de filas eso tarda más que la
+propia base. ``upsert`` usa una sola sentencia preparada con ``executemany``
+(``INSERT ... ON CONFLICT ... DO UPDATE``, válida en SQLite y PostgreSQL).
+``acumular`` es igual pero suma los valores a los que ya había, y
+``actualizar`` solo modifica filas existentes (``UPDATE ... WHERE``).
+"""
+from django.db import connection
+
+
+def _escribir(modelo, clave, campos, filas, asignar):
+    if not filas:
+        return 0
+    columna = {f.name: f.column for f in modelo._meta.concrete_fields}
+    q = connection.ops.quote_name
+    tabla = q(modelo._meta.db_table)
+    claves = [q(columna[c]) for c in clave]
+    valores = [q(columna[c]) for c in campos]
+    columnas = claves + valores
+    sql = (
+        f"INSERT INTO {tabla} ({', '.join(columnas)}) "
+        f"VALUES ({', '.join(['%s'] * len(columnas))}) "
+        f"ON CONFLICT ({', '.join(claves)}) DO UPDATE SET "
+        + ", ".join(f"{c} = {asignar(tabla, c)}" for c in valores)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, filas)
+    return len(filas)
+
+
+def upsert(modelo, clave, campos, filas):
+    """Inserta o actualiza ``filas`` (tuplas en el orden ``clave + campos``).
+
+    Los valores van tal cual al controlador de la base (``Decimal``, ``bool``,
+    ``None``...), sin pasar por los campos del modelo.
+    """
+    return _escribir(modelo, clave, campos, filas, lambda tabla, c: f"EXCLUDED.{c}")
+
+
+def acumular(modelo, clave, campos, filas):
+    """Como ``upsert``, pero si la fila existe le suma los ``campos`` (admite negativos)."""
+    return _escribir(modelo, clave, campos, filas, lambda tabla, c: f"{tabla}.{c} + EXCLUDED.{c}")
+
+
+def actualizar(modelo, clave, campos, filas):
+    """``UPDATE`` de filas existentes; ``filas`` va en el mismo orden que en ``upsert``."""
+    if not filas:
+        return 0
+    columna = {f.name: f.column for f in modelo._meta.concrete_fields}
+    q = connection.ops.quote_name
+    sql = (
+        f"UPDATE {q(modelo._meta.db_table)} SET "
+        + ", ".join(f"{q(columna[c])} = %s" for c in campos)
+        + " WHERE " + " AND ".join(f"{q(columna[c])} = %s" for c in clave)
+    )
+    n = len(clave)
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [fila[n:] + fila[:n] for fila in filas])
+    return len(filas)
@@ -0,0 +1,103 @@
+"""Tablas a CSV o XLSX generadas por partes para descargarlas o guardarlas.
+
+Las filas llegan de un generador (normalmente ``values_list(...).iterator()``)
+y se escriben a medida que se leen, así que la memoria no depende de la
+cantidad de filas. El CSV se envía por bloques desde la primera fila; el XLSX
+(openpyxl en modo ``write_only``) necesita cerrar el ZIP antes de enviarlo,
+por lo que se arma en un archivo temporal y luego se envía por trozos.
+
+Con ASGI (``SERVIDOR=asgi``) Django leería un iterador síncrono completo con
+``sync_to_async(list)`` antes de enviar el primer byte; ``transmitir`` lo
+envuelve para pedir las partes de a una desde el event loop.
+"""
+import csv
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+FILAS_POR_BLOQUE = 500
+_TAMANO_TROZO = 64 * 1024
+_FIN = object()
+
+
+class _Eco:
+    """Destino de ``csv.writer`` que devuelve la línea en vez de guardarla."""
+
+    def write(self, linea):
+        return linea
+
+
+def fecha_local(valor):
+    """Fecha y hora local sin zona (Excel no admite zonas horarias)."""
+    if valor is None:
+        return None
+    return timezone.localtime(valor).replace(tzinfo=None, microsecond=0)
+
+
+def generar_csv(encabezados, filas):
+    # BOM: Excel reconoce el UTF-8 y la importación lo descarta (utf-8-sig).
+    escritor = csv.writer(_Eco())
+    bloque = ["\ufeff", escritor.writerow(encabezados)]
+    for fila in filas:
+        bloque.append(escritor.writerow(fila))
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            yield "".join(bloque).encode()
+            bloque = []
+    yield "".join(bloque).encode()
+
+
+def generar_xlsx(encabezados, filas, titulo="Datos"):
+    wb = Workbook(write_only=True)
+    hoja = wb.create_sheet(titulo)
+    hoja.append(encabezados)
+    for fila in filas:
+        hoja.append(fila)
+    with tempfile.TemporaryFile() as temporal:
+        wb.save(temporal)
+        temporal.seek(0)
+        while trozo := temporal.read(_TAMANO_TROZO):
+            yield trozo
+
+
+def generar(formato, encabezados, filas, titulo="Datos"):
+    """Partes del archivo en ``formato`` (``csv`` o ``xlsx``)."""
+    if formato == "xlsx":
+        return generar_xlsx(encabezados, filas, titulo)
+    return generar_csv(encabezados, filas)
+
+
+async def _asincrono(partes):
+    """Itera ``partes`` pidiendo cada una en el hilo de la petición."""
+    partes = iter(partes)
+    # next() con valor por defecto: StopIteration no puede cruzar sync_to_async.
+    siguiente = sync_to_async(next)
+    try:
+        while (parte := await siguiente(partes, _FIN)) is not _FIN:
+            yield parte
+    finally:
+        cerrar = getattr(partes, "close", None)
+        if cerrar:
+            await sync_to_async(cerrar)()
+
+
+def transmitir(request, partes, content_type, nombre):
+    """Descarga ``nombre`` que se envía a medida que se generan las ``partes``."""
+    if isinstance(request, ASGIRequest):
+        partes = _asincrono(partes)
+    response = StreamingHttpResponse(partes, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{nombre}"'
+    return response
+
+
+def respuesta(request, formato, nombre, encabezados, filas, titulo="Datos"):
+    """Descarga ``nombre.<formato>`` generada mientras se envía."""
+    return transmitir(request, generar(formato, encabezados, filas, titulo), FORMATOS[formato],
+                      f"{nombre}.{formato}")
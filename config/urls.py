@@ -9,4 +9,10 @@ urlpatterns = [
 
     # Catálogo (servicios)
     path('catalogo/', include('catalogo.urls')),
+
+    # Reportes (resúmenes precalculados)
+    path('reportes/', include('reportes.urls')),
+
+    # Métricas de rendimiento
+    path('metricas/', include('metricas.urls')),
 ]
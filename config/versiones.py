@@ -0,0 +1,38 @@
+"""Tokens de versión de datos guardados en la caché de Django.
+
+Cada conjunto de datos (p. ej. ``"catalogo"``) tiene un token opaco que cambia
+cada vez que se invalida. Índices en memoria y cachés derivadas guardan el
+token con el que se construyeron y se regeneran cuando deja de coincidir.
+"""
+import uuid
+
+from django.core.cache import cache
+
+_PREFIJO = "version:"
+
+
+def obtener(nombre):
+    """Token vigente de ``nombre``; si la caché no lo tiene, crea uno."""
+    clave = _PREFIJO + nombre
+    token = cache.get(clave)
+    if token is None:
+        token = uuid.uuid4().hex
+        if not cache.add(clave, token, None):
+            token = cache.get(clave, token)
+    return token
+
+
+async def aobtener(nombre):
+    """Versión async de ``obtener``."""
+    clave = _PREFIJO + nombre
+    token = await cache.aget(clave)
+    if token is None:
+        token = uuid.uuid4().hex
+        if not await cache.aadd(clave, token, None):
+            token = await cache.aget(clave, token)
+    return token
+
+
+def invalidar(*nombres):
+    """Asigna un token nuevo a cada uno de ``nombres``."""
+    cache.set_many({_PREFIJO + nombre: uuid.uuid4().hex for nombre in nombres}, None)
@@ -0,0 +1,33 @@
+"""Configuración de gunicorn (``gunicorn -c gunicorn.conf.py``).
+
+Con ``SERVIDOR=asgi`` se usan workers de uvicorn sobre ``config.asgi``: las
+vistas async (autocompletado de servicios, búsqueda de pacientes) comparten el
+event loop de cada worker en vez de ocupar un worker entero por petición. Por
+defecto se sigue usando WSGI con workers síncronos.
+
+El número de workers sale de ``WEB_CONCURRENCY`` y el puerto de ``PORT``
+(los valores por defecto de gunicorn). Con más de uno la caché tiene que ser
+compartida (ver ``config.caches``): con ``CACHE_URL=locmem://`` no arranca.
+"""
+import os
+
+from config import caches
+
+SERVIDOR = os.environ.get("SERVIDOR", "wsgi")
+
+if SERVIDOR == "asgi":
+    wsgi_app = "config.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "config.wsgi:application"
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+
+def on_starting(server):
+    url = os.environ.get("CACHE_URL", caches.POR_DEFECTO)
+    if server.cfg.workers > 1 and caches.es_local(url):
+        raise RuntimeError(
+            f"CACHE_URL={url} es una caché por proceso: con {server.cfg.workers} workers los cambios "
+            "hechos en uno no invalidarían los demás. Use file:// o redis://."
+        )
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class MetricasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'metricas'
+
+    def ready(self):
+        from . import registro
+
+        connection_created.connect(registro.instalar, dispatch_uid="metricas_consultas")
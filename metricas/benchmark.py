@@ -0,0 +1,266 @@
+"""Escenarios del benchmark de los endpoints más usados.
+
+Cada escenario prepara sus entradas con una semilla fija (las mismas
+consultas en cada corrida sobre los mismos datos) y ejecuta peticiones con el
+cliente de pruebas de Django, en el mismo proceso y sin red. Las escrituras se
+deshacen al final de cada petición para que el conjunto de datos no cambie
+entre corridas.
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from urllib.parse import quote
+
+import openpyxl
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from catalogo.importacion import aplicar_cambios, sincronizar_catalogo
+from catalogo.models import Servicio
+from proformas.models import Paciente, Proforma
+
+
+class _Deshacer(Exception):
+    pass
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicion = (len(ordenados) - 1) * p / 100
+    bajo = int(posicion)
+    alto = min(bajo + 1, len(ordenados) - 1)
+    return ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (posicion - bajo)
+
+
+def resumir(tiempos, consultas, unidades=None):
+    """Latencias en ms, rendimiento por segundo y consultas promedio."""
+    total = sum(tiempos)
+    return {
+        "n": len(tiempos),
+        "p50_ms": percentil(tiempos, 50) * 1000,
+        "p95_ms": percentil(tiempos, 95) * 1000,
+        "p99_ms": percentil(tiempos, 99) * 1000,
+        "promedio_ms": statistics.fmean(tiempos) * 1000,
+        "por_segundo": (unidades or len(tiempos)) / total if total else None,
+        "consultas": statistics.fmean(consultas),
+    }
+
+
+def medir(funcion, entradas, deshacer=False):
+    tiempos, consultas = [], []
+    for entrada in entradas:
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            if deshacer:
+                try:
+                    with transaction.atomic():
+                        funcion(entrada)
+                        raise _Deshacer
+                except _Deshacer:
+                    pass
+            else:
+                funcion(entrada)
+            tiempos.append(time.perf_counter() - inicio)
+        consultas.append(len(ctx.captured_queries))
+    return tiempos, consultas
+
+
+def _muestra(qs, campo, cantidad, azar):
+    """``cantidad`` valores de ``campo`` elegidos al azar sin recorrer la tabla."""
+    maximo = qs.order_by("-pk").values_list("pk", flat=True).first()
+    if maximo is None:
+        return []
+    valores = []
+    for _ in range(cantidad * 3):
+        valor = qs.filter(pk__gte=azar.randint(1, maximo)).order_by("pk").values_list(campo, flat=True).first()
+        if valor is not None:
+            valores.append(valor)
+        if len(valores) >= cantidad:
+            break
+    return valores
+
+
+def _verificar(response, esperado=200):
+    if response.status_code != esperado:
+        raise RuntimeError(f"respuesta {response.status_code} inesperada")
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def servicio_search(cliente, n, azar):
+    nombres = _muestra(Servicio.objects.filter(activo=True), "nombre", n, azar)
+    consultas = [nombre.split()[0][:azar.randint(2, 6)] for nombre in nombres]
+    return medir(lambda q: _verificar(cliente.get("/catalogo/buscar/", {"q": q})), consultas)
+
+
+def servicio_list(cliente, n, azar):
+    codigos = _muestra(Servicio.objects.all(), "codigo", n, azar)
+    return medir(lambda c: _verificar(cliente.get("/catalogo/", {"despues": c})), codigos)
+
+
+def servicio_list_busqueda(cliente, n, azar):
+    nombres = _muestra(Servicio.objects.all(), "nombre", n, azar)
+    return medir(lambda q: _verificar(cliente.get("/catalogo/", {"q": q.split()[0]})), nombres)
+
+
+def proforma_list(cliente, n, azar):
+    numeros = _muestra(Proforma.objects.all(), "numero", n, azar)
+    return medir(lambda num: _verificar(cliente.get("/", {"antes": num})), numeros)
+
+
+def proforma_list_busqueda(cliente, n, azar):
+    nombres = _muestra(Paciente.objects.all(), "nombre", n, azar)
+    consultas = [" ".join(nombre.split()[:2]) for nombre in nombres]
+    return medir(lambda q: _verificar(cliente.get("/", {"q": q})), consultas)
+
+
+def proforma_create(cliente, n, azar):
+    pacientes = list(Paciente.objects.values_list("cedula", "nombre")[:n]) or [("0999999999", "Paciente Prueba")]
+    servicios = list(Servicio.objects.values_list("nombre", "pvp_sugerido")[:50]) or [("Servicio", 10)]
+
+    def datos(i):
+        cedula, nombre = pacientes[i % len(pacientes)]
+        elegidos = azar.sample(servicios, min(5, len(servicios)))
+        return {
+            "cedula": cedula,
+            "nombre": nombre,
+            "observaciones": "",
+            "item_descripcion[]": [s[0] for s in elegidos],
+            "item_cantidad[]": ["1"] * len(elegidos),
+            "item_precio[]": [str(s[1]) for s in elegidos],
+        }
+
+    entradas = [datos(i) for i in range(n)]
+    return medir(lambda d: _verificar(cliente.post("/nueva/", d), 302), entradas, deshacer=True)
+
+
+def proforma_pdf(cliente, n, azar):
+    """PDF sin caché: cada petición es una proforma distinta (directorio de caché vacío)."""
+    numeros = list(dict.fromkeys(_muestra(Proforma.objects.all(), "numero", n, azar)))
+    return medir(lambda num: _verificar(cliente.get(f"/{num}/pdf/", {"ocultar": "0"})), numeros)
+
+
+def proforma_pdf_cache(cliente, n, azar):
+    """El mismo PDF una y otra vez: lo sirve la caché en disco."""
+    numero = Proforma.objects.order_by("-numero").values_list("numero", flat=True).first()
+    if numero is None:
+        return [], []
+    _verificar(cliente.get(f"/{numero}/pdf/", {"ocultar": "0"}))
+    return medir(lambda num: _verificar(cliente.get(f"/{num}/pdf/", {"ocultar": "0"})), [numero] * n)
+
+
+def importacion(cliente, n, azar, filas=5000):
+    """Sincroniza y aplica un .xlsx con ``filas`` servicios; se deshace al terminar.
+
+    El archivo solo trae un precio por servicio (que pasa a costo, PVP y precio
+    corporativo), así que sobre los datos generados casi todas las filas son
+    cambios: se mide el peor caso. Se hacen ``n // 20`` corridas (mínimo 3) y
+    el rendimiento se informa en filas/s.
+    """
+    servicios = list(Servicio.objects.order_by("codigo").values_list("codigo", "nombre", "area", "pvp_sugerido")[:filas])
+    fd, ruta = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        wb = openpyxl.Workbook(write_only=True)
+        hoja = wb.create_sheet()
+        hoja.append(["codigo", "nombre", "area", "precio"])
+        for codigo, nombre, area, precio in servicios:
+            if azar.random() < 0.1:
+                precio = precio + 1
+            hoja.append([codigo, nombre, area, float(precio)])
+        wb.save(ruta)
+
+        def sincronizar(_):
+            cambios, _ = sincronizar_catalogo(ruta)
+            aplicar_cambios(cambios)
+
+        tiempos, consultas = medir(sincronizar, range(max(3, n // 20)), deshacer=True)
+    finally:
+        os.remove(ruta)
+    return tiempos, consultas, len(servicios) * len(tiempos)
+
+
+async def _cliente(host, puerto, rutas, tiempos, errores):
+    """Un cliente HTTP/1.1 que pide ``rutas`` en orden, reusando la conexión si el servidor lo permite."""
+    conexion = None
+    try:
+        for ruta in rutas:
+            inicio = time.perf_counter()
+            try:
+                if conexion is None:
+                    conexion = await asyncio.open_connection(host, puerto)
+                reader, writer = conexion
+                writer.write(f"GET {ruta} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+                await writer.drain()
+                lineas = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+                cabeceras = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lineas[1:] if l)}
+                await reader.readexactly(int(cabeceras.get("content-length", 0)))
+                if lineas[0].split()[1] != "200":
+                    errores.append(lineas[0])
+                if cabeceras.get("connection", "").lower() == "close":
+                    writer.close()
+                    conexion = None
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                errores.append(repr(e))
+                conexion = None
+                continue
+            tiempos.append(time.perf_counter() - inicio)
+    finally:
+        if conexion is not None:
+            conexion[1].close()
+
+
+async def carga(host, puerto, rutas, clientes):
+    """``clientes`` conexiones simultáneas que se reparten ``rutas``.
+
+    Devuelve las latencias, los errores y los segundos que tomó todo.
+    """
+    tiempos, errores = [], []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_cliente(host, puerto, rutas[i::clientes], tiempos, errores)
+                           for i in range(clientes)))
+    return tiempos, errores, time.perf_counter() - inicio
+
+
+def rutas_autocompletado(cantidad, azar):
+    """Búsquedas de servicios y de pacientes como las que hace el formulario."""
+    nombres = _muestra(Servicio.objects.filter(activo=True), "nombre", 50, azar) or ["a"]
+    cedulas = _muestra(Paciente.objects.all(), "cedula", 50, azar) or ["0"]
+    rutas = []
+    for _ in range(cantidad):
+        if azar.random() < 0.8:
+            q = azar.choice(nombres).split()[0][:azar.randint(2, 6)]
+            rutas.append(f"/catalogo/buscar/?q={quote(q)}")
+        else:
+            rutas.append(f"/buscar-paciente/?cedula={quote(azar.choice(cedulas))}")
+    return rutas
+
+
+ESCENARIOS = {
+    "servicio_search": servicio_search,
+    "servicio_list": servicio_list,
+    "servicio_list_busqueda": servicio_list_busqueda,
+    "proforma_list": proforma_list,
+    "proforma_list_busqueda": proforma_list_busqueda,
+    "proforma_create": proforma_create,
+    "proforma_pdf": proforma_pdf,
+    "proforma_pdf_cache": proforma_pdf_cache,
+    "importacion": importacion,
+}
+
+
+def ejecutar(nombre, repeticiones, semilla):
+    azar = random.Random(f"{semilla}:{nombre}")
+    resultado = ESCENARIOS[nombre](Client(), repeticiones, azar)
+    tiempos, consultas, unidades = (resultado + (None,))[:3]
+    if not tiempos:
+        return None
+    return resumir(tiempos, consultas, unidades)
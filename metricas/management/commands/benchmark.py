@@ -0,0 +1,107 @@
+import json
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from catalogo.models import Servicio
+from metricas import benchmark
+from proformas.models import Paciente, Proforma, ProformaItem
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Mide p50/p95/p99, rendimiento y consultas de los endpoints principales sobre "
+            "los datos actuales (ver generar_datos) y guarda el resultado en JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escenarios", nargs="+", choices=list(benchmark.ESCENARIOS),
+                            default=list(benchmark.ESCENARIOS))
+        parser.add_argument("--repeticiones", type=int, default=100)
+        parser.add_argument("--semilla", type=int, default=2024)
+        parser.add_argument("--json", help="Archivo donde guardar los resultados.")
+        parser.add_argument("--comparar", help="Resultados anteriores (JSON) con los que comparar.")
+        parser.add_argument("--tolerancia", type=float, default=0.2,
+                            help="Aumento relativo del p95 que se considera regresión (0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        anterior = None
+        if options["comparar"]:
+            try:
+                with open(options["comparar"], encoding="utf-8") as f:
+                    anterior = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer {options['comparar']}: {e}")
+
+        resultados = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "base_de_datos": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "semilla": options["semilla"],
+            "repeticiones": options["repeticiones"],
+            "datos": {
+                "servicios": Servicio.objects.count(),
+                "pacientes": Paciente.objects.count(),
+                "proformas": Proforma.objects.count(),
+                "items": ProformaItem.objects.count(),
+            },
+            "escenarios": {},
+        }
+        self.stdout.write(", ".join(f"{k}: {v}" for k, v in resultados["datos"].items()))
+        self.stdout.write(f"{'escenario':<24}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'por seg':>10}{'consultas':>11}")
+
+        # Caché de PDF vacía para medir el render; se descarta al terminar.
+        with tempfile.TemporaryDirectory() as cache_pdf, override_settings(PDF_CACHE_DIR=cache_pdf):
+            for nombre in options["escenarios"]:
+                medida = benchmark.ejecutar(nombre, options["repeticiones"], options["semilla"])
+                if medida is None:
+                    self.stdout.write(f"{nombre:<24} sin datos")
+                    continue
+                resultados["escenarios"][nombre] = medida
+                self.stdout.write(
+                    f"{nombre:<24}{medida['p50_ms']:>9.1f}{medida['p95_ms']:>9.1f}{medida['p99_ms']:>9.1f}"
+                    f"{medida['por_segundo']:>10.1f}{medida['consultas']:>11.1f}"
+                )
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados guardados en {options['json']}")
+
+        if anterior:
+            self._comparar(anterior, resultados, options["tolerancia"])
+
+    def _comparar(self, anterior, actual, tolerancia):
+        self.stdout.write(f"\nComparación con {anterior.get('commit') or anterior.get('fecha')}:")
+        if anterior.get("datos") != actual["datos"]:
+            self.stdout.write(self.style.WARNING("⚠️ Los conjuntos de datos no coinciden; la comparación es orientativa."))
+        regresiones = 0
+        for nombre, medida in actual["escenarios"].items():
+            previa = anterior.get("escenarios", {}).get(nombre)
+            if not previa:
+                continue
+            cambio = medida["p95_ms"] / previa["p95_ms"] - 1 if previa["p95_ms"] else 0
+            linea = (f"  {nombre:<24} p95 {previa['p95_ms']:8.1f} -> {medida['p95_ms']:8.1f} ms ({cambio:+.0%}), "
+                     f"consultas {previa['consultas']:.1f} -> {medida['consultas']:.1f}")
+            if cambio > tolerancia or medida["consultas"] > previa["consultas"]:
+                regresiones += 1
+                self.stdout.write(self.style.ERROR(linea + "  ❌"))
+            else:
+                self.stdout.write(linea)
+        if regresiones:
+            raise CommandError(f"{regresiones} escenario(s) empeoraron más allá de la tolerancia.")
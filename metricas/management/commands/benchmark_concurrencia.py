@@ -0,0 +1,52 @@
+import asyncio
+import json
+import random
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from metricas import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Lanza muchos clientes simultáneos de autocompletado (servicios y pacientes) contra "
+            "un servidor en marcha, p. ej. para comparar gunicorn WSGI con SERVIDOR=asgi.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--clientes", type=int, default=200)
+        parser.add_argument("--peticiones", type=int, default=4000, help="Peticiones en total.")
+        parser.add_argument("--semilla", type=int, default=2024)
+        parser.add_argument("--json", help="Archivo donde guardar los resultados.")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("--url debe ser http://host:puerto")
+        rutas = benchmark.rutas_autocompletado(options["peticiones"], random.Random(options["semilla"]))
+        tiempos, errores, segundos = asyncio.run(
+            benchmark.carga(url.hostname, url.port or 80, rutas, options["clientes"]))
+        if not tiempos:
+            raise CommandError(f"Ninguna petición respondió: {errores[:3]}")
+
+        resultado = {
+            "url": options["url"],
+            "clientes": options["clientes"],
+            "peticiones": len(rutas),
+            "errores": len(errores),
+            "p50_ms": benchmark.percentil(tiempos, 50) * 1000,
+            "p95_ms": benchmark.percentil(tiempos, 95) * 1000,
+            "p99_ms": benchmark.percentil(tiempos, 99) * 1000,
+            "por_segundo": len(tiempos) / segundos,
+        }
+        self.stdout.write(
+            f"{resultado['clientes']} clientes, {resultado['peticiones']} peticiones: "
+            f"p50 {resultado['p50_ms']:.1f} ms, p95 {resultado['p95_ms']:.1f} ms, "
+            f"p99 {resultado['p99_ms']:.1f} ms, {resultado['por_segundo']:.0f}/s, "
+            f"{resultado['errores']} errores"
+        )
+        if errores:
+            self.stdout.write(self.style.WARNING(f"⚠️ Ejemplos de errores: {errores[:3]}"))
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as f:
+                json.dump(resultado, f, indent=2, ensure_ascii=False)
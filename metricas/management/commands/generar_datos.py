@@ -0,0 +1,153 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from catalogo import indice, paquetes, precios
+from catalogo.models import ImportacionCatalogo, Paquete, PaqueteItem, PrecioServicio, Servicio
+from config import versiones
+from proformas import busqueda
+from proformas.models import CENTAVOS, Paciente, Proforma, ProformaItem
+from reportes import acumulados
+from reportes.models import ResumenDiario, ResumenPaciente, ResumenServicio
+
+BLOQUE = 5000
+# Fecha fija para que las fechas generadas no dependan del día en que se corre.
+FECHA_BASE = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+AREAS = ["Laboratorio", "Imagen", "Consulta externa", "Cardiología", "Odontología",
+         "Rehabilitación", "Ginecología", "Pediatría", "Traumatología", "Oftalmología"]
+PRUEBAS = ["Hemograma", "Ecografía", "Radiografía", "Tomografía", "Resonancia", "Perfil",
+           "Cultivo", "Electrocardiograma", "Consulta", "Terapia", "Biopsia", "Examen"]
+DETALLES = ["abdominal", "completo", "lipídico", "tiroideo", "de tórax", "pélvica", "renal",
+            "hepático", "de control", "con contraste", "simple", "doppler", "pediátrico"]
+NOMBRES = ["Ana", "Luis", "María", "José", "Carmen", "Jorge", "Lucía", "Pedro", "Rosa", "Andrés",
+           "Sofía", "Diego", "Elena", "Miguel", "Valeria", "Carlos", "Gabriela", "Fernando"]
+APELLIDOS = ["Pérez", "Mora", "Zambrano", "Vera", "Castro", "Andrade", "Ortiz", "Muñoz",
+             "Salazar", "Cedeño", "Guerrero", "Villacís", "Paredes", "Ruiz", "Benítez", "Toral"]
+
+
+class Command(BaseCommand):
+    help = ("Genera un conjunto de datos reproducible (misma semilla, mismos datos) "
+            "para los benchmarks: servicios, pacientes y proformas con ítems.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servicios", type=int, default=50_000)
+        parser.add_argument("--pacientes", type=int, default=100_000)
+        parser.add_argument("--proformas", type=int, default=500_000)
+        parser.add_argument("--items", type=int, default=3, help="Ítems promedio por proforma.")
+        parser.add_argument("--semilla", type=int, default=2024)
+        parser.add_argument("--limpiar", action="store_true",
+                            help="Borra servicios, paquetes, importaciones, pacientes y proformas "
+                                 "existentes antes de generar.")
+
+    def handle(self, *args, **options):
+        existentes = Servicio.objects.exists() or Paciente.objects.exists() or Proforma.objects.exists()
+        if existentes and not options["limpiar"]:
+            raise CommandError("La base ya tiene datos; usa --limpiar para reemplazarlos.")
+
+        azar = random.Random(options["semilla"])
+        inicio = time.perf_counter()
+        if existentes:
+            self._limpiar()
+
+        servicios = self._servicios(azar, options["servicios"])
+        self._paso("servicios", options["servicios"], inicio)
+        self._pacientes(azar, options["pacientes"])
+        self._paso("pacientes", options["pacientes"], inicio)
+        items = self._proformas(azar, options["proformas"], options["items"], servicios)
+        self._paso(f"proformas ({items} ítems)", options["proformas"], inicio)
+        busqueda.reconstruir()
+        self._paso("índice de búsqueda", options["proformas"], inicio)
+        acumulados.reconstruir()
+        self._paso("resúmenes de reportes", options["proformas"], inicio)
+        indice.invalidar()
+        paquetes.invalidar()
+        # bulk_create no emite señales
+        versiones.invalidar("proformas")
+        self.stdout.write(self.style.SUCCESS(f"✅ Datos generados en {time.perf_counter() - inicio:.1f} s"))
+
+    def _paso(self, nombre, cantidad, inicio):
+        self.stdout.write(f"  {nombre}: {cantidad} ({time.perf_counter() - inicio:.1f} s)")
+
+    def _limpiar(self):
+        # Sin señales ni colector: se vacían las tablas directamente.
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Primero las tablas que apuntan a otras (las claves foráneas se verifican).
+            for modelo in (ResumenDiario, ResumenServicio, ResumenPaciente, ProformaItem, Proforma, Paciente,
+                           PaqueteItem, Paquete, PrecioServicio, Servicio, ImportacionCatalogo):
+                cursor.execute(f"DELETE FROM {modelo._meta.db_table}")
+            if busqueda.disponible():
+                cursor.execute(f"DELETE FROM {busqueda.TABLA}")
+
+    def _servicios(self, azar, cantidad):
+        generados = []
+        for inicio in range(0, cantidad, BLOQUE):
+            lote = []
+            for i in range(inicio, min(inicio + BLOQUE, cantidad)):
+                precio = Decimal(azar.randint(500, 50_000)) / 100
+                lote.append(Servicio(
+                    codigo=f"S{i:06d}",
+                    nombre=f"{azar.choice(PRUEBAS)} {azar.choice(DETALLES)} {i}",
+                    area=azar.choice(AREAS),
+                    costo_base=(precio * Decimal("0.6")).quantize(CENTAVOS),
+                    pvp_sugerido=precio,
+                    pvp_corporativo=(precio * Decimal("0.9")).quantize(CENTAVOS),
+                    porcentaje_ganancia=40,
+                    activo=azar.random() > 0.05,
+                ))
+            with transaction.atomic():
+                Servicio.objects.bulk_create(lote)
+            generados.extend((s.nombre, s.pvp_sugerido) for s in lote)
+        return generados
+
+    def _pacientes(self, azar, cantidad):
+        for inicio in range(0, cantidad, BLOQUE):
+            lote = [
+                Paciente(
+                    cedula=f"{1_000_000_000 + i}",
+                    nombre=f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}",
+                    celular=f"09{azar.randint(10_000_000, 99_999_999)}",
+                )
+                for i in range(inicio, min(inicio + BLOQUE, cantidad))
+            ]
+            with transaction.atomic():
+                Paciente.objects.bulk_create(lote)
+
+    def _proformas(self, azar, cantidad, items_promedio, servicios):
+        ids_pacientes = list(Paciente.objects.order_by("id").values_list("id", flat=True))
+        if not ids_pacientes:
+            raise CommandError("Hacen falta pacientes para generar proformas.")
+        if not servicios:
+            servicios = [("Servicio de prueba", Decimal("10.00"))]
+        total_items = 0
+        iva_porcentaje = precios.iva_porcentaje()
+        for inicio in range(0, cantidad, BLOQUE):
+            proformas, detalle = [], []
+            for _ in range(inicio, min(inicio + BLOQUE, cantidad)):
+                items = []
+                for _ in range(azar.randint(1, max(1, items_promedio * 2 - 1))):
+                    nombre, precio = azar.choice(servicios)
+                    cantidad_item = azar.randint(1, 3)
+                    items.append(ProformaItem(descripcion=nombre, cantidad=cantidad_item, precio_unitario=precio,
+                                              subtotal=(precio * cantidad_item).quantize(CENTAVOS)))
+                subtotal, iva, total = precios.totales((i.subtotal for i in items), iva_porcentaje)
+                proformas.append(Proforma(
+                    paciente_id=azar.choice(ids_pacientes),
+                    fecha=FECHA_BASE - timedelta(minutes=azar.randint(0, 2 * 365 * 24 * 60)),
+                    subtotal=subtotal, iva_porcentaje=iva_porcentaje, iva=iva, total=total,
+                ))
+                detalle.append(items)
+            with transaction.atomic():
+                Proforma.objects.bulk_create(proformas)
+                lote_items = []
+                for prof, items in zip(proformas, detalle):
+                    for item in items:
+                        item.proforma_id = prof.numero
+                    lote_items.extend(items)
+                ProformaItem.objects.bulk_create(lote_items)
+            total_items += len(lote_items)
+        return total_items
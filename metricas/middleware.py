@@ -0,0 +1,74 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import registro
+
+
+class MetricasMiddleware:
+    """Mide latencia, consultas SQL y tamaño de respuesta por nombre de URL.
+
+    Solo se mide una fracción ``METRICAS_MUESTREO`` de las peticiones (1.0 =
+    todas); las que no se muestrean no pagan más que un ``random()``. Funciona
+    con WSGI y con ASGI: bajo ASGI no obliga a Django a pasar las vistas async
+    a un hilo.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.muestreo = getattr(settings, "METRICAS_MUESTREO", 1.0)
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def _muestrear(self):
+        return self.muestreo > 0 and (self.muestreo >= 1 or random.random() < self.muestreo)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if not self._muestrear():
+            return self.get_response(request)
+
+        medicion = registro.Medicion()
+        token = registro.actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            registro.actual.reset(token)
+        self._registrar(request, response, medicion, time.perf_counter() - inicio)
+        return response
+
+    async def __acall__(self, request):
+        if not self._muestrear():
+            return await self.get_response(request)
+
+        medicion = registro.Medicion()
+        token = registro.actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            registro.actual.reset(token)
+        self._registrar(request, response, medicion, time.perf_counter() - inicio)
+        return response
+
+    def _registrar(self, request, response, medicion, segundos):
+        match = request.resolver_match
+        vista = (match.url_name or match.view_name) if match else "sin_ruta"
+        registro.registrar_peticion(vista, request.method, response.status_code, segundos,
+                                    medicion, _tamano(response))
+
+
+def _tamano(response):
+    if response.streaming:
+        # En las respuestas por partes solo se conoce si se declaró.
+        largo = response.get("Content-Length")
+        return int(largo) if largo else None
+    return len(response.content)
@@ -0,0 +1,188 @@
+"""Registro en memoria de las métricas del proceso.
+
+Guarda histogramas de latencia por vista y por tramo (``span``), contadores
+de consultas SQL y bytes enviados, y las últimas peticiones en un búfer
+circular. Todo vive en la memoria del proceso: con varios workers cada uno
+expone sus propios números.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Límites (en segundos) de los buckets de los histogramas.
+LIMITES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+# Medición de la petición en curso (None si no se está muestreando).
+actual = ContextVar("metricas_actual", default=None)
+
+
+class Histograma:
+    __slots__ = ("cubetas", "suma", "cuenta")
+
+    def __init__(self):
+        self.cubetas = [0] * (len(LIMITES) + 1)  # la última es +Inf
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, valor):
+        self.cubetas[bisect.bisect_left(LIMITES, valor)] += 1
+        self.suma += valor
+        self.cuenta += 1
+
+    def acumulado(self):
+        """``(limite, cuenta)`` acumulados, como los espera Prometheus."""
+        total = 0
+        for limite, cuenta in zip(LIMITES + (float("inf"),), self.cubetas):
+            total += cuenta
+            yield limite, total
+
+    def percentil(self, p):
+        """Estimación del percentil ``p`` (0-100) por el límite de su bucket."""
+        if not self.cuenta:
+            return None
+        objetivo = self.cuenta * p / 100
+        for limite, total in self.acumulado():
+            if total >= objetivo:
+                return limite
+        return None
+
+
+class Medicion:
+    """Lo que se mide durante una petición muestreada."""
+
+    __slots__ = ("consultas", "segundos_sql", "tramos")
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_sql = 0.0
+        self.tramos = []
+
+    def consulta(self, execute, sql, params, many, context):
+        """``execute_wrapper`` de Django: cuenta y cronometra cada consulta."""
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos_sql += time.perf_counter() - inicio
+
+
+class _Vista:
+    __slots__ = ("latencia", "estados", "consultas", "segundos_sql", "bytes")
+
+    def __init__(self):
+        self.latencia = Histograma()
+        self.estados = defaultdict(int)
+        self.consultas = 0
+        self.segundos_sql = 0.0
+        self.bytes = 0
+
+
+_vistas = defaultdict(_Vista)
+_tramos = defaultdict(Histograma)
+_recientes = None
+
+
+def _buffer():
+    global _recientes
+    if _recientes is None:
+        _recientes = deque(maxlen=getattr(settings, "METRICAS_RECIENTES", 500))
+    return _recientes
+
+
+def consulta(execute, sql, params, many, context):
+    """``execute_wrapper`` fijo de cada conexión: mide si hay una petición muestreada.
+
+    La medición llega por ``actual`` (una ``ContextVar``), así que también se
+    cuentan las consultas de las vistas async, que corren en otro hilo.
+    """
+    medicion = actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion.consulta(execute, sql, params, many, context)
+
+
+def instalar(sender, connection, **kwargs):
+    """Receptor de ``connection_created``: agrega ``consulta`` a la conexión nueva."""
+    # Al principio de la lista: ``execute_wrapper()`` quita siempre el último.
+    if consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, consulta)
+
+
+def registrar_peticion(vista, metodo, estado, segundos, medicion, tamano):
+    with _lock:
+        datos = _vistas[vista]
+        datos.latencia.observar(segundos)
+        datos.estados[estado] += 1
+        datos.consultas += medicion.consultas
+        datos.segundos_sql += medicion.segundos_sql
+        datos.bytes += tamano or 0
+        _buffer().append({
+            "hora": time.time(),
+            "vista": vista,
+            "metodo": metodo,
+            "estado": estado,
+            "ms": segundos * 1000,
+            "consultas": medicion.consultas,
+            "ms_sql": medicion.segundos_sql * 1000,
+            "bytes": tamano,
+            "tramos": medicion.tramos,
+        })
+
+
+def observar_tramo(nombre, segundos):
+    with _lock:
+        _tramos[nombre].observar(segundos)
+    medicion = actual.get()
+    if medicion is not None:
+        medicion.tramos.append((nombre, segundos * 1000))
+
+
+@contextmanager
+def tramo(nombre):
+    """Cronometra un bloque (render de PDF, lote de importación, búsqueda...)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar_tramo(nombre, time.perf_counter() - inicio)
+
+
+def instantanea():
+    """Copia de las métricas para exponerlas sin mantener el lock."""
+    with _lock:
+        vistas = {
+            nombre: {
+                "latencia": _copiar(datos.latencia),
+                "estados": dict(datos.estados),
+                "consultas": datos.consultas,
+                "segundos_sql": datos.segundos_sql,
+                "bytes": datos.bytes,
+            }
+            for nombre, datos in _vistas.items()
+        }
+        tramos = {nombre: _copiar(h) for nombre, h in _tramos.items()}
+        recientes = list(_buffer())
+    return vistas, tramos, recientes
+
+
+def _copiar(histograma):
+    copia = Histograma()
+    copia.cubetas = list(histograma.cubetas)
+    copia.suma = histograma.suma
+    copia.cuenta = histograma.cuenta
+    return copia
+
+
+def reiniciar():
+    global _recientes
+    with _lock:
+        _vistas.clear()
+        _tramos.clear()
+        _recientes = None
@@ -0,0 +1,82 @@
+import io
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalogo import precios
+from catalogo.models import ImportacionCatalogo, Paquete, PaqueteItem, Servicio
+from proformas.models import Paciente, Proforma
+
+from . import registro
+
+
+class MetricasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registro.reiniciar()
+
+    def test_mide_vistas_y_expone_prometheus(self):
+        self.client.get(reverse("proforma_list"))
+        with registro.tramo("prueba"):
+            pass
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+        texto = self.client.get(reverse("metricas_prometheus")).content.decode()
+        self.assertIn('proformas_web_peticion_segundos_count{vista="proforma_list"} 1', texto)
+        self.assertIn('proformas_web_peticiones_total{vista="proforma_list",estado="200"} 1', texto)
+        self.assertIn('proformas_web_tramo_segundos_count{tramo="prueba"} 1', texto)
+        vistas, _, recientes = registro.instantanea()
+        self.assertGreater(vistas["proforma_list"]["consultas"], 0)
+        self.assertEqual(recientes[0]["vista"], "proforma_list")
+
+    async def test_vistas_async_con_asgi(self):
+        await Paciente.objects.acreate(cedula="0102030405", nombre="Ana Pérez")
+        response = await self.async_client.get(reverse("buscar_paciente"), {"cedula": "0102030405"})
+        self.assertEqual(response.json()["nombre"], "Ana Pérez")
+        response = await self.async_client.get(reverse("servicio_search"), {"q": "eco"})
+        self.assertEqual(response.json(), [])
+        # Las consultas hechas desde el hilo del ORM se atribuyen a la petición.
+        vistas, _, _ = registro.instantanea()
+        self.assertEqual(vistas["buscar_paciente"]["consultas"], 1)
+        self.assertEqual(set(vistas), {"buscar_paciente", "servicio_search"})
+
+    @override_settings(METRICAS_TOKEN="secreto")
+    def test_token(self):
+        url = reverse("metricas_prometheus")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer secreto").status_code, 200)
+
+    def test_sin_token_solo_staff(self):
+        url = reverse("metricas_prometheus")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        with override_settings(METRICAS_PUBLICAS=True):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_panel_solo_staff(self):
+        self.assertEqual(self.client.get(reverse("metricas_panel")).status_code, 302)
+
+
+class GenerarDatosTests(TestCase):
+    def _generar(self, *args):
+        call_command("generar_datos", "--servicios", "20", "--pacientes", "10", "--proformas", "15", *args,
+                     stdout=io.StringIO())
+
+    def test_totales_coinciden_con_los_items(self):
+        self._generar()
+        for prof in Proforma.objects.prefetch_related("items"):
+            subtotal, iva, total = precios.totales((i.subtotal for i in prof.items.all()), prof.iva_porcentaje)
+            self.assertEqual((prof.subtotal, prof.iva, prof.total), (subtotal, iva, total))
+            self.assertEqual(prof.iva_porcentaje, precios.iva_porcentaje())
+            self.assertGreater(prof.iva, 0)
+
+    def test_limpiar_con_paquetes_e_importaciones(self):
+        self._generar()
+        paquete = Paquete.objects.create(nombre="Perfil básico")
+        PaqueteItem.objects.create(paquete=paquete, servicio=Servicio.objects.first())
+        ImportacionCatalogo.objects.create(archivo="/tmp/catalogo.csv", nombre_original="catalogo.csv")
+        self._generar("--limpiar")
+        self.assertFalse(Paquete.objects.exists() or PaqueteItem.objects.exists()
+                         or ImportacionCatalogo.objects.exists())
+        self.assertEqual((Servicio.objects.count(), Proforma.objects.count()), (20, 15))
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path("", views.panel, name="metricas_panel"),
+    path("prometheus/", views.prometheus, name="metricas_prometheus"),
+]
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import render
+
+from proformas import pacientes
+
+from . import registro
+
+_PREFIJO = "proformas_web"
+
+
+def _etiquetas(**valores):
+    partes = []
+    for clave, valor in valores.items():
+        texto = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{clave}="{texto}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _histograma(lineas, nombre, etiqueta, valor, h):
+    for limite, total in h.acumulado():
+        le = "+Inf" if limite == float("inf") else repr(limite)
+        lineas.append(f"{nombre}_bucket{_etiquetas(**{etiqueta: valor, 'le': le})} {total}")
+    lineas.append(f"{nombre}_sum{_etiquetas(**{etiqueta: valor})} {h.suma}")
+    lineas.append(f"{nombre}_count{_etiquetas(**{etiqueta: valor})} {h.cuenta}")
+
+
+def prometheus(request):
+    """Métricas del proceso en el formato de texto de Prometheus.
+
+    Con ``METRICAS_TOKEN`` basta ``Authorization: Bearer <token>``; si no, hace
+    falta un usuario del staff, como en el panel. Solo ``METRICAS_PUBLICAS``
+    la deja abierta sin autenticar.
+    """
+    token = getattr(settings, "METRICAS_TOKEN", "")
+    if getattr(settings, "METRICAS_PUBLICAS", False) or (
+            token and request.headers.get("Authorization") == f"Bearer {token}"):
+        return _exponer()
+    if token and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return _prometheus_staff(request)
+
+
+@staff_member_required
+def _prometheus_staff(request):
+    return _exponer()
+
+
+def _exponer():
+    vistas, tramos, _ = registro.instantanea()
+    p = _PREFIJO
+    lineas = [
+        f"# HELP {p}_peticion_segundos Latencia de las peticiones por vista.",
+        f"# TYPE {p}_peticion_segundos histogram",
+    ]
+    for vista, datos in sorted(vistas.items()):
+        _histograma(lineas, f"{p}_peticion_segundos", "vista", vista, datos["latencia"])
+
+    for metrica, tipo, ayuda, clave in [
+        ("peticion_consultas_total", "counter", "Consultas SQL por vista.", "consultas"),
+        ("peticion_sql_segundos_total", "counter", "Tiempo en SQL por vista.", "segundos_sql"),
+        ("respuesta_bytes_total", "counter", "Bytes de respuesta por vista.", "bytes"),
+    ]:
+        lineas += [f"# HELP {p}_{metrica} {ayuda}", f"# TYPE {p}_{metrica} {tipo}"]
+        for vista, datos in sorted(vistas.items()):
+            lineas.append(f"{p}_{metrica}{_etiquetas(vista=vista)} {datos[clave]}")
+
+    lineas += [f"# HELP {p}_peticiones_total Peticiones por vista y estado.",
+               f"# TYPE {p}_peticiones_total counter"]
+    for vista, datos in sorted(vistas.items()):
+        for estado, cuenta in sorted(datos["estados"].items()):
+            lineas.append(f"{p}_peticiones_total{_etiquetas(vista=vista, estado=estado)} {cuenta}")
+
+    lineas += [f"# HELP {p}_tramo_segundos Duración de tramos instrumentados.",
+               f"# TYPE {p}_tramo_segundos histogram"]
+    for nombre, h in sorted(tramos.items()):
+        _histograma(lineas, f"{p}_tramo_segundos", "tramo", nombre, h)
+
+    cache_pacientes = pacientes.estadisticas()
+    lineas += [f"# TYPE {p}_pacientes_cache_total counter",
+               f"{p}_pacientes_cache_total{_etiquetas(resultado='acierto')} {cache_pacientes['aciertos']}",
+               f"{p}_pacientes_cache_total{_etiquetas(resultado='fallo')} {cache_pacientes['fallos']}"]
+    return HttpResponse("\n".join(lineas) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _resumen(h):
+    return {
+        "cuenta": h.cuenta,
+        "promedio_ms": h.suma / h.cuenta * 1000 if h.cuenta else 0,
+        "p50": h.percentil(50),
+        "p95": h.percentil(95),
+        "p99": h.percentil(99),
+    }
+
+
+@staff_member_required
+def panel(request):
+    """Tablero con latencias por vista, tramos y últimas peticiones."""
+    vistas, tramos, recientes = registro.instantanea()
+    filas = []
+    for vista, datos in vistas.items():
+        fila = _resumen(datos["latencia"])
+        cuenta = fila["cuenta"] or 1
+        fila.update(
+            vista=vista,
+            consultas=datos["consultas"] / cuenta,
+            ms_sql=datos["segundos_sql"] / cuenta * 1000,
+            kb=datos["bytes"] / cuenta / 1024,
+            errores=sum(c for estado, c in datos["estados"].items() if estado >= 500),
+        )
+        filas.append(fila)
+    filas.sort(key=lambda f: f["cuenta"] * f["promedio_ms"], reverse=True)
+    return render(request, "metricas/panel.html", {
+        "vistas": filas,
+        "tramos": sorted(({"nombre": n, **_resumen(h)} for n, h in tramos.items()),
+                         key=lambda t: t["nombre"]),
+        "recientes": recientes[::-1][:50],
+        "pacientes": pacientes.estadisticas(),
+    })
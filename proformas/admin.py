@@ -4,6 +4,7 @@ from .models import Paciente, Proforma, ProformaItem
 class ProformaItemInline(admin.TabularInline):
     model = ProformaItem
     extra = 0
+    raw_id_fields = ("servicio",)
 
 @admin.register(Proforma)
 class ProformaAdmin(admin.ModelAdmin):
@@ -14,4 +15,7 @@ class ProformaAdmin(admin.ModelAdmin):
 class PacienteAdmin(admin.ModelAdmin):
     search_fields = ("cedula", "nombre", "email")
 
-admin.site.register(ProformaItem)
+@admin.register(ProformaItem)
+class ProformaItemAdmin(admin.ModelAdmin):
+    list_display = ("proforma", "codigo", "descripcion", "cantidad", "precio_unitario")
+    raw_id_fields = ("proforma", "servicio")
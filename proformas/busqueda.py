@@ -0,0 +1,139 @@
+"""Índice de búsqueda de texto completo de las proformas.
+
+Cada proforma tiene una fila con su número, el nombre y la cédula del
+paciente y las descripciones de sus ítems, en minúsculas y sin tildes. En
+SQLite es una tabla virtual FTS5 (``rowid`` = número) y en PostgreSQL una
+tabla con un ``tsvector`` y un índice GIN. El índice se mantiene en la misma
+transacción que los datos: ``crear_con_items`` lo escribe explícitamente y
+las señales cubren las ediciones y los borrados.
+
+Las búsquedas devuelven números en orden descendente y se paginan por
+*keyset* (``numero < antes``), así que una página profunda cuesta lo mismo
+que la primera.
+"""
+import re
+
+from django.db import connections, router
+
+from catalogo.indice import normalizar
+from metricas.registro import tramo
+
+TABLA = "proformas_busqueda"
+_TAMANO_BLOQUE = 500
+_disponible = {}
+
+
+def _conexion(using=None):
+    from .models import Proforma
+    return connections[using or router.db_for_write(Proforma)]
+
+
+def disponible(using=None):
+    """``True`` si la base tiene el índice (se consulta una vez por proceso)."""
+    connection = _conexion(using)
+    if connection.alias not in _disponible:
+        with connection.cursor() as cursor:
+            tablas = connection.introspection.table_names(cursor)
+        _disponible[connection.alias] = TABLA in tablas
+    return _disponible[connection.alias]
+
+
+def documento(numero, nombre, cedula, descripciones):
+    """Texto indexado de una proforma."""
+    partes = [str(numero), nombre or "", cedula or "", *descripciones]
+    return normalizar(" ".join(partes))
+
+
+def guardar(filas, using=None):
+    """Inserta o reemplaza ``(numero, texto)`` en el índice."""
+    connection = _conexion(using)
+    if not filas or not disponible(connection.alias):
+        return
+    if connection.vendor == "sqlite":
+        sql = f"INSERT OR REPLACE INTO {TABLA} (rowid, texto) VALUES (%s, %s)"
+    else:
+        sql = (
+            f"INSERT INTO {TABLA} (numero, documento) VALUES (%s, to_tsvector('simple', %s)) "
+            "ON CONFLICT (numero) DO UPDATE SET documento = EXCLUDED.documento"
+        )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, filas)
+
+
+def indexar(prof, items=None):
+    """Indexa una proforma; ``items`` evita volver a leerlos si ya se tienen."""
+    if items is None:
+        items = prof.items.all()
+    texto = documento(prof.numero, prof.paciente.nombre, prof.paciente.cedula,
+                      [item.descripcion for item in items])
+    guardar([(prof.numero, texto)])
+
+
+def indexar_consulta(qs):
+    """Indexa en bloques las proformas de ``qs``; devuelve cuántas fueron."""
+    total = 0
+    filas = []
+    qs = qs.select_related("paciente").prefetch_related("items").order_by("numero")
+    for prof in qs.iterator(chunk_size=_TAMANO_BLOQUE):
+        filas.append((prof.numero, documento(prof.numero, prof.paciente.nombre, prof.paciente.cedula,
+                                             [item.descripcion for item in prof.items.all()])))
+        if len(filas) >= _TAMANO_BLOQUE:
+            guardar(filas)
+            total += len(filas)
+            filas = []
+    guardar(filas)
+    return total + len(filas)
+
+
+def quitar(numero):
+    connection = _conexion()
+    if not disponible(connection.alias):
+        return
+    columna = "rowid" if connection.vendor == "sqlite" else "numero"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA} WHERE {columna} = %s", [numero])
+
+
+def reconstruir():
+    """Vacía el índice y lo vuelve a llenar con todas las proformas."""
+    from .models import Proforma
+    connection = _conexion()
+    if not disponible(connection.alias):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA}")
+    return indexar_consulta(Proforma.objects.all())
+
+
+def terminos(q):
+    return re.findall(r"\w+", normalizar(q))
+
+
+def buscar(q, antes=None, limite=50):
+    """Números de las proformas que contienen todos los términos (como prefijo).
+
+    Devuelve ``None`` si la base no tiene índice, para que se use otra búsqueda.
+    """
+    connection = _conexion()
+    if not disponible(connection.alias):
+        return None
+    palabras = terminos(q)
+    if not palabras:
+        return []
+    if connection.vendor == "sqlite":
+        consulta = " ".join(f'"{p}"*' for p in palabras)
+        sql = f"SELECT rowid FROM {TABLA} WHERE {TABLA} MATCH %s"
+        orden = "rowid"
+    else:
+        consulta = " & ".join(f"{p}:*" for p in palabras)
+        sql = f"SELECT numero FROM {TABLA} WHERE documento @@ to_tsquery('simple', %s)"
+        orden = "numero"
+    parametros = [consulta]
+    if antes is not None:
+        sql += f" AND {orden} < %s"
+        parametros.append(antes)
+    sql += f" ORDER BY {orden} DESC LIMIT %s"
+    parametros.append(limite)
+    with tramo("busqueda_proformas"), connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return [fila[0] for fila in cursor.fetchall()]
@@ -0,0 +1,25 @@
+"""Proformas con sus ítems en filas, para exportar a CSV o XLSX.
+
+Una fila por ítem con los datos de la proforma repetidos; las proformas sin
+ítems salen en una fila con las columnas del ítem vacías. Todo sale de una
+sola consulta (``LEFT JOIN`` a los ítems) leída por bloques.
+"""
+from config.tablas import fecha_local
+
+TAMANO_BLOQUE = 2000
+ENCABEZADOS = [
+    "numero", "fecha", "cedula", "paciente", "nivel_precio",
+    "descripcion", "cantidad", "precio_unitario", "subtotal_item",
+    "subtotal", "iva_porcentaje", "iva", "total", "observaciones",
+]
+
+
+def filas(qs):
+    """Filas de las proformas de ``qs`` (por ejemplo ``exportacion_pdf.filtrar``)."""
+    columnas = qs.order_by("numero", "items__id").values_list(
+        "numero", "fecha", "paciente__cedula", "paciente__nombre", "nivel_precio",
+        "items__descripcion", "items__cantidad", "items__precio_unitario", "items__subtotal",
+        "subtotal", "iva_porcentaje", "iva", "total", "observaciones",
+    )
+    for numero, fecha, *resto, observaciones in columnas.iterator(chunk_size=TAMANO_BLOQUE):
+        yield (numero, fecha_local(fecha), *resto, observaciones or "")
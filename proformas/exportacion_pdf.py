@@ -0,0 +1,110 @@
+"""Exportación de muchas proformas en un ZIP o en un único PDF.
+
+Las proformas se leen por bloques con paciente e ítems precargados (dos
+consultas por bloque). En el ZIP cada PDF sale de la caché en disco o se
+genera en el pool de ``pdf_pool`` (con el tope ``PDF_PROCESOS_LOTE`` para todas
+las exportaciones del worker), y cada archivo se envía apenas se agrega. El PDF unificado se dibuja en un solo lienzo, por lo que se genera
+en el proceso actual.
+"""
+import tempfile
+import zipfile
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from . import pdf_cache, pdf_pool
+from .models import Proforma
+from .pdf import dibujar_proforma, render_proforma
+
+TAMANO_BLOQUE = 200
+_TAMANO_TROZO = 64 * 1024
+
+
+def filtrar(desde=None, hasta=None, paciente=None, numero_desde=None, numero_hasta=None):
+    """Proformas que cumplen el filtro, ordenadas por número."""
+    qs = Proforma.objects.all()
+    if desde:
+        qs = qs.filter(fecha__gte=timezone.make_aware(datetime.combine(desde, time.min)))
+    if hasta:
+        qs = qs.filter(fecha__lte=timezone.make_aware(datetime.combine(hasta, time.max)))
+    if paciente:
+        qs = qs.filter(Q(paciente__cedula=paciente) | Q(paciente__nombre__icontains=paciente))
+    if numero_desde:
+        qs = qs.filter(numero__gte=numero_desde)
+    if numero_hasta:
+        qs = qs.filter(numero__lte=numero_hasta)
+    return qs.order_by("numero")
+
+
+def iterar(qs, tamano=TAMANO_BLOQUE):
+    """Genera ``(proforma, items)`` con paciente e ítems ya cargados."""
+    qs = qs.select_related("paciente").prefetch_related("items")
+    for prof in qs.iterator(chunk_size=tamano):
+        yield prof, list(prof.items.all())
+
+
+def nombre_archivo(prof):
+    return f"proforma_{prof.numero}.pdf"
+
+
+def _trabajos(qs, mostrar_precios):
+    for prof, items in iterar(qs):
+        ruta, _ = pdf_cache.ubicar(prof, items, mostrar_precios)
+        yield ruta, prof, items, mostrar_precios
+
+
+def _leer(ruta, prof, items, mostrar_precios):
+    try:
+        with open(ruta, "rb") as archivo:
+            return archivo.read()
+    except FileNotFoundError:
+        # El recorte de la caché lo borró entre que se generó y se leyó.
+        return render_proforma(prof, mostrar_precios, items)
+
+
+class _Salida:
+    """Destino de escritura que acumula bytes hasta que se vacía."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self.partes)
+        self.partes = []
+        return datos
+
+
+def generar_zip(qs, mostrar_precios=True, procesos=None):
+    """Genera el ZIP por partes para enviarlo mientras se construye.
+
+    ``procesos`` es solo para comandos: usa un pool propio de ese tamaño.
+    """
+    salida = _Salida()
+    # Los PDF ya vienen comprimidos: se guardan sin volver a comprimir.
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_STORED) as zf:
+        for trabajo in pdf_pool.generar_lote(_trabajos(qs, mostrar_precios), procesos):
+            zf.writestr(nombre_archivo(trabajo[1]), _leer(*trabajo))
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+def generar_pdf_unico(qs, mostrar_precios=True):
+    """Genera un PDF con todas las proformas y lo devuelve por trozos."""
+    with tempfile.TemporaryFile() as temporal:
+        p = canvas.Canvas(temporal, pagesize=letter)
+        for prof, items in iterar(qs):
+            dibujar_proforma(p, prof, mostrar_precios, items)
+        p.save()
+        temporal.seek(0)
+        while trozo := temporal.read(_TAMANO_TROZO):
+            yield trozo
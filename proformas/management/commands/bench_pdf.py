@@ -0,0 +1,58 @@
+import time
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from proformas.models import Paciente, Proforma, ProformaItem
+from proformas.pdf import dibujar_proforma, precargar
+
+
+def proforma_de_prueba(cantidad_items):
+    """Proforma sin guardar con ``cantidad_items`` ítems de descripción variable."""
+    prof = Proforma(
+        numero=cantidad_items,
+        paciente=Paciente(cedula="0000000000", nombre="Paciente de prueba"),
+        fecha=timezone.now(),
+        observaciones="Observación de prueba. " * 10,
+    )
+    items = []
+    for i in range(cantidad_items):
+        descripcion = f"Servicio {i} " + ("con una descripción bastante larga que ocupa varias líneas " if i % 5 == 0 else "")
+        item = ProformaItem(descripcion=descripcion[:200], cantidad=1 + i % 3, precio_unitario=Decimal("12.50"))
+        item.subtotal = item.precio_unitario * item.cantidad
+        items.append(item)
+    prof.total = sum((i.subtotal for i in items), Decimal("0"))
+    return prof, items
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo de generación del PDF de proformas con 10, 100 y 1000 ítems."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000])
+        parser.add_argument("--repeticiones", type=int, default=5)
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        precargar()
+        self.stdout.write(f"Precarga de logo y fuentes: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+        for cantidad in options["items"]:
+            prof, items = proforma_de_prueba(cantidad)
+            tiempos = []
+            for _ in range(options["repeticiones"]):
+                inicio = time.perf_counter()
+                buffer = BytesIO()
+                p = canvas.Canvas(buffer, pagesize=letter)
+                paginas = dibujar_proforma(p, prof, True, items)
+                p.save()
+                tiempos.append(time.perf_counter() - inicio)
+            mejor = min(tiempos) * 1000
+            self.stdout.write(
+                f"{cantidad:>5} ítems: {paginas:>3} páginas, {mejor:8.1f} ms por PDF, "
+                f"{mejor / paginas:6.2f} ms por página, {len(buffer.getvalue()) / 1024:7.1f} KB"
+            )
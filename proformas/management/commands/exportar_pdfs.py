@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from proformas import exportacion_pdf
+
+
+class Command(BaseCommand):
+    help = "Exporta las proformas filtradas a un ZIP de PDFs o a un único PDF."
+
+    def add_arguments(self, parser):
+        parser.add_argument("salida", help="Archivo a generar (.zip o .pdf).")
+        parser.add_argument("--desde", help="Fecha inicial AAAA-MM-DD.")
+        parser.add_argument("--hasta", help="Fecha final AAAA-MM-DD.")
+        parser.add_argument("--paciente", help="Cédula o parte del nombre.")
+        parser.add_argument("--numero-desde", type=int)
+        parser.add_argument("--numero-hasta", type=int)
+        parser.add_argument("--ocultar-precios", action="store_true")
+        parser.add_argument("--procesos", type=int, help="Procesos para generar los PDF del ZIP.")
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for campo in ("desde", "hasta"):
+            valor = options[campo]
+            fechas[campo] = parse_date(valor) if valor else None
+            if valor and fechas[campo] is None:
+                raise CommandError(f"Fecha inválida: {valor}")
+
+        proformas = exportacion_pdf.filtrar(
+            paciente=options["paciente"],
+            numero_desde=options["numero_desde"],
+            numero_hasta=options["numero_hasta"],
+            **fechas,
+        )
+        total = proformas.count()
+        if not total:
+            raise CommandError("No hay proformas que coincidan con el filtro.")
+
+        mostrar_precios = not options["ocultar_precios"]
+        if options["salida"].lower().endswith(".pdf"):
+            partes = exportacion_pdf.generar_pdf_unico(proformas, mostrar_precios)
+        else:
+            partes = exportacion_pdf.generar_zip(proformas, mostrar_precios, options["procesos"])
+
+        with open(options["salida"], "wb") as f:
+            for parte in partes:
+                f.write(parte)
+        self.stdout.write(self.style.SUCCESS(f"{total} proformas exportadas a {options['salida']}."))
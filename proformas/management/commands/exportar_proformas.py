@@ -0,0 +1,43 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from config import tablas
+from proformas import exportacion_datos, exportacion_pdf
+
+
+class Command(BaseCommand):
+    help = "Exporta las proformas filtradas con sus ítems a CSV o Excel (.csv o .xlsx)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("salida", help="Archivo a generar (.csv o .xlsx).")
+        parser.add_argument("--desde", help="Fecha inicial AAAA-MM-DD.")
+        parser.add_argument("--hasta", help="Fecha final AAAA-MM-DD.")
+        parser.add_argument("--paciente", help="Cédula o parte del nombre.")
+        parser.add_argument("--numero-desde", type=int)
+        parser.add_argument("--numero-hasta", type=int)
+
+    def handle(self, *args, **options):
+        formato = os.path.splitext(options["salida"])[1].lower().lstrip(".")
+        if formato not in tablas.FORMATOS:
+            raise CommandError("La salida debe terminar en .csv o .xlsx.")
+
+        fechas = {}
+        for campo in ("desde", "hasta"):
+            valor = options[campo]
+            fechas[campo] = parse_date(valor) if valor else None
+            if valor and fechas[campo] is None:
+                raise CommandError(f"Fecha inválida: {valor}")
+
+        proformas = exportacion_pdf.filtrar(
+            paciente=options["paciente"],
+            numero_desde=options["numero_desde"],
+            numero_hasta=options["numero_hasta"],
+            **fechas,
+        )
+        filas = exportacion_datos.filas(proformas)
+        with open(options["salida"], "wb") as f:
+            for parte in tablas.generar(formato, exportacion_datos.ENCABEZADOS, filas, "Proformas"):
+                f.write(parte)
+        self.stdout.write(self.style.SUCCESS(f"✅ Proformas exportadas a {options['salida']}."))
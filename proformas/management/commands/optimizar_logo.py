@@ -0,0 +1,42 @@
+import io
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from proformas import pdf
+
+
+class Command(BaseCommand):
+    help = ("Reduce el logo a la resolución con que se dibuja en el PDF y lo guarda como PNG "
+            "con paleta. La misma imagen se sirve en la web; correr una vez al cambiar el logo "
+            "y antes de collectstatic.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--colores", type=int, default=256)
+
+    def handle(self, *args, **options):
+        ruta = pdf.ruta_logo()
+        try:
+            with Image.open(ruta) as imagen:
+                imagen.load()
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir {ruta}: {e}")
+
+        antes = ruta.stat().st_size
+        escala = pdf.LOGO_DPI / 72
+        tamano = (round(pdf.LOGO_ANCHO * escala), round(pdf.LOGO_ALTO * escala))
+        imagen = imagen.convert("RGBA")
+        if imagen.width > tamano[0] or imagen.height > tamano[1]:
+            imagen.thumbnail(tamano, Image.LANCZOS)
+        # FASTOCTREE es el método de Pillow que conserva la transparencia.
+        imagen = imagen.quantize(options["colores"], method=Image.Quantize.FASTOCTREE)
+
+        salida = io.BytesIO()
+        imagen.save(salida, "PNG", optimize=True)
+        if salida.tell() >= antes:
+            self.stdout.write(f"El logo ya está optimizado ({antes} bytes).")
+            return
+        ruta.write_bytes(salida.getvalue())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Logo {imagen.width}x{imagen.height}: {antes} -> {salida.tell()} bytes"
+        ))
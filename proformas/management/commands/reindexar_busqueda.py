@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from proformas import busqueda
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de texto completo de las proformas."
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            total = busqueda.reconstruir()
+        if total is None:
+            raise CommandError("La base de datos no tiene el índice de búsqueda (¿faltan migraciones o FTS5?).")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} proformas indexadas en {time.perf_counter() - inicio:.1f} s"
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from config import versiones
+from proformas import vinculacion
+
+
+class Command(BaseCommand):
+    help = "Enlaza con el catálogo los ítems de proforma sin servicio cuya descripción coincide con un servicio."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=vinculacion.TAMANO_LOTE,
+                            help="Ítems por transacción.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        revisados, vinculados = vinculacion.vincular(options["lote"])
+        if vinculados:
+            versiones.invalidar("proformas")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {vinculados} de {revisados} ítems enlazados en {time.perf_counter() - inicio:.1f} s"
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proformas', '0002_proforma_mostrar_precios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['nombre'], name='paciente_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proforma',
+            index=models.Index(fields=['fecha'], name='proforma_fecha_idx'),
+        ),
+    ]
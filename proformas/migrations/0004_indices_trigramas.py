@@ -0,0 +1,39 @@
+"""Índices GIN de trigramas para búsquedas ``icontains`` en PostgreSQL.
+
+En SQLite no hace nada.
+"""
+from django.db import migrations
+
+INDICES = [
+    ("paciente_nombre_trgm", "proformas_paciente", "nombre"),
+    ("paciente_cedula_trgm", "proformas_paciente", "cedula"),
+]
+
+
+def crear(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for nombre, tabla, columna in INDICES:
+        # Misma expresión que genera Django para icontains: UPPER(columna::text).
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gin (UPPER({columna}::text) gin_trgm_ops)"
+        )
+
+
+def borrar(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proformas', '0003_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear, borrar),
+    ]
@@ -0,0 +1,76 @@
+"""Índice de texto completo de las proformas (FTS5 en SQLite, tsvector en PostgreSQL).
+
+La migración no importa ``proformas.busqueda``: el SQL y la normalización se
+copian aquí para que siga aplicándose igual aunque ese módulo cambie.
+"""
+import unicodedata
+
+from django.db import migrations
+
+TABLA = "proformas_busqueda"
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c)).casefold().strip()
+
+
+def _soporta_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(fila[0] == "ENABLE_FTS5" for fila in cursor.fetchall())
+
+
+def crear(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        if not _soporta_fts5(connection):
+            return
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5("
+            "texto, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        sql = f"INSERT OR REPLACE INTO {TABLA} (rowid, texto) VALUES (%s, %s)"
+    elif connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLA} (numero integer PRIMARY KEY, documento tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLA}_documento ON {TABLA} USING gin (documento)"
+        )
+        sql = (
+            f"INSERT INTO {TABLA} (numero, documento) VALUES (%s, to_tsvector('simple', %s)) "
+            "ON CONFLICT (numero) DO UPDATE SET documento = EXCLUDED.documento"
+        )
+    else:
+        return
+
+    Proforma = apps.get_model("proformas", "Proforma")
+    ProformaItem = apps.get_model("proformas", "ProformaItem")
+    descripciones = {}
+    for numero, descripcion in ProformaItem.objects.values_list("proforma_id", "descripcion").iterator():
+        descripciones.setdefault(numero, []).append(descripcion)
+    filas = [
+        (numero, normalizar(" ".join([str(numero), nombre or "", cedula or "", *descripciones.get(numero, [])])))
+        for numero, nombre, cedula in Proforma.objects.values_list(
+            "numero", "paciente__nombre", "paciente__cedula").iterator()
+    ]
+    if filas:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, filas)
+
+
+def borrar(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proformas', '0004_indices_trigramas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear, borrar),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:04
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def subtotal_desde_total(apps, schema_editor):
+    # Las proformas anteriores no cobraban IVA: su subtotal es el total.
+    Proforma = apps.get_model("proformas", "Proforma")
+    Proforma.objects.using(schema_editor.connection.alias).update(subtotal=F("total"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proformas', '0005_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proforma',
+            name='iva',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='proforma',
+            name='iva_porcentaje',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='proforma',
+            name='nivel_precio',
+            field=models.CharField(choices=[('sugerido', 'PVP sugerido'), ('corporativo', 'PVP corporativo'), ('costo_margen', 'Costo + margen')], default='sugerido', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='proforma',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(subtotal_desde_total, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0006_precios_servicio'),
+        ('proformas', '0006_totales_iva'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proformaitem',
+            name='codigo',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='proformaitem',
+            name='precio_catalogo',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='proformaitem',
+            name='servicio',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='items_proforma', to='catalogo.servicio'),
+        ),
+    ]
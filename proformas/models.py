@@ -1,7 +1,12 @@
 from django.db import models
+from django.dispatch import Signal
 from django.utils import timezone
 from decimal import Decimal
 
+from catalogo import precios
+
+from . import busqueda
+
 
 class Paciente(models.Model):
     cedula = models.CharField(max_length=20, unique=True)
@@ -10,28 +15,74 @@ class Paciente(models.Model):
     celular = models.CharField(max_length=20, blank=True, null=True)
     direccion = models.CharField(max_length=200, blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["nombre"], name="paciente_nombre_idx")]
+
     def __str__(self):
         return f"{self.nombre} ({self.cedula})"
 
 
+CENTAVOS = Decimal("0.01")
+
+# Se envía con ``proforma`` e ``items`` cuando crear_con_items guarda los ítems en bloque.
+items_creados = Signal()
+
+
+class ProformaManager(models.Manager):
+    def crear_con_items(self, items, **campos):
+        """Crea la proforma y sus ítems con dos INSERT sin importar cuántos ítems haya.
+
+        ``items`` son ``ProformaItem`` sin guardar; los subtotales, el IVA y el
+        total se calculan aquí con ``Decimal``. Los que traen ``servicio_id``
+        reciben el código y el precio del catálogo de ese momento.
+        """
+        for item in items:
+            item.subtotal = (Decimal(item.precio_unitario) * item.cantidad).quantize(CENTAVOS)
+        campos.setdefault("iva_porcentaje", precios.iva_porcentaje())
+        precios.copiar_catalogo(items, campos.get("nivel_precio", precios.SUGERIDO))
+        subtotal, iva, total = precios.totales((i.subtotal for i in items), campos["iva_porcentaje"])
+        prof = self.create(subtotal=subtotal, iva=iva, total=total, **campos)
+        for item in items:
+            item.proforma = prof
+        ProformaItem.objects.bulk_create(items)
+        # bulk_create no emite señales: el índice de búsqueda se actualiza aquí.
+        busqueda.indexar(prof, items)
+        items_creados.send(sender=ProformaItem, proforma=prof, items=items)
+        return prof
+
+
 class Proforma(models.Model):
     numero = models.AutoField(primary_key=True)
     paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE)
     fecha = models.DateTimeField(default=timezone.now)
     observaciones = models.TextField(blank=True, null=True)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    iva_porcentaje = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    iva = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    nivel_precio = models.CharField(max_length=20, choices=precios.NIVELES, default=precios.SUGERIDO)
 
     # ✅ Nuevo campo para controlar visibilidad de precios en PDF
     mostrar_precios = models.BooleanField(default=True)
 
+    objects = ProformaManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["fecha"], name="proforma_fecha_idx")]
+
     def recomputar(self):
-        total = Decimal("0.00")
+        """Recalcula subtotales, IVA y total; solo escribe los ítems que cambiaron."""
+        subtotales = []
+        cambiados = []
         for item in self.items.all():
-            item.subtotal = Decimal(item.precio_unitario) * Decimal(item.cantidad)
-            item.save()
-            total += item.subtotal
-        self.total = total
-        self.save()
+            subtotal = (item.precio_unitario * item.cantidad).quantize(CENTAVOS)
+            if item.subtotal != subtotal:
+                item.subtotal = subtotal
+                cambiados.append(item)
+            subtotales.append(subtotal)
+        ProformaItem.objects.bulk_update(cambiados, ["subtotal"])
+        self.subtotal, self.iva, self.total = precios.totales(subtotales, self.iva_porcentaje)
+        self.save(update_fields=["subtotal", "iva", "total"])
 
     def __str__(self):
         return f"Proforma {self.numero} - {self.paciente.nombre}"
@@ -43,9 +94,15 @@ class ProformaItem(models.Model):
     cantidad = models.PositiveIntegerField(default=1)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Servicio del catálogo del que salió el ítem, con su código y precio al cotizar:
+    # la copia se conserva aunque el servicio cambie o se borre.
+    servicio = models.ForeignKey("catalogo.Servicio", related_name="items_proforma",
+                                 on_delete=models.SET_NULL, blank=True, null=True)
+    codigo = models.CharField(max_length=20, blank=True, default="")
+    precio_catalogo = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
 
     def save(self, *args, **kwargs):
-        self.subtotal = Decimal(self.precio_unitario) * Decimal(self.cantidad)
+        self.subtotal = (Decimal(self.precio_unitario) * Decimal(self.cantidad)).quantize(CENTAVOS)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -0,0 +1,124 @@
+"""Búsquedas de pacientes para el formulario de proformas.
+
+``obtener`` lee a través de la caché de Django: guarda el paciente (o su
+ausencia) por cédula y las señales borran la entrada cuando el paciente se
+guarda o se elimina. Los aciertos y fallos se cuentan en la misma caché, así
+que los contadores suman todos los procesos que la compartan.
+
+``sugerir`` devuelve coincidencias parciales por cédula o nombre, ordenadas
+por relevancia y con un límite.
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from metricas.registro import tramo
+
+from .models import Paciente
+
+DURACION = 15 * 60
+LIMITE = 10
+_CAMPOS = ("id", "cedula", "nombre", "email", "celular", "direccion")
+_NO_EXISTE = "-"
+_ACIERTOS = "pacientes:aciertos"
+_FALLOS = "pacientes:fallos"
+
+
+def _clave(cedula):
+    if not cedula.isalnum():
+        cedula = hashlib.md5(cedula.encode()).hexdigest()
+    return f"paciente:{cedula}"
+
+
+def _contar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # La clave no existe todavía (o la caché se vació).
+        if not cache.add(clave, 1, None):
+            cache.incr(clave)
+
+
+async def _acontar(clave):
+    try:
+        await cache.aincr(clave)
+    except ValueError:
+        if not await cache.aadd(clave, 1, None):
+            await cache.aincr(clave)
+
+
+def obtener(cedula):
+    """Datos del paciente con esa cédula como ``dict``, o ``None``."""
+    if not cedula:
+        return None
+    clave = _clave(cedula)
+    datos = cache.get(clave)
+    if datos is not None:
+        _contar(_ACIERTOS)
+        return None if datos == _NO_EXISTE else datos
+    _contar(_FALLOS)
+    datos = Paciente.objects.filter(cedula=cedula).values(*_CAMPOS).first()
+    cache.set(clave, _NO_EXISTE if datos is None else datos, DURACION)
+    return datos
+
+
+async def aobtener(cedula):
+    """Versión async de ``obtener`` para las vistas async."""
+    if not cedula:
+        return None
+    clave = _clave(cedula)
+    datos = await cache.aget(clave)
+    if datos is not None:
+        await _acontar(_ACIERTOS)
+        return None if datos == _NO_EXISTE else datos
+    await _acontar(_FALLOS)
+    datos = await Paciente.objects.filter(cedula=cedula).values(*_CAMPOS).afirst()
+    await cache.aset(clave, _NO_EXISTE if datos is None else datos, DURACION)
+    return datos
+
+
+def invalidar(*cedulas):
+    cache.delete_many([_clave(c) for c in cedulas if c])
+
+
+def estadisticas():
+    aciertos = cache.get(_ACIERTOS, 0)
+    fallos = cache.get(_FALLOS, 0)
+    consultas = aciertos + fallos
+    return {
+        "aciertos": aciertos,
+        "fallos": fallos,
+        "tasa_aciertos": round(aciertos / consultas, 3) if consultas else None,
+    }
+
+
+def _siguiente_prefijo(prefijo):
+    """Menor cadena mayor que todas las que empiezan con ``prefijo``."""
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def sugerir(q, limite=LIMITE):
+    """Pacientes cuya cédula o nombre coincide en parte con ``q``.
+
+    Primero la cédula exacta, luego las cédulas que empiezan con ``q`` (un
+    rango sobre el índice único), después los nombres que empiezan con ``q`` y
+    al final los que lo contienen.
+    """
+    q = q.strip()
+    if not q:
+        return []
+    resultados = {}
+
+    def agregar(qs):
+        faltan = limite - len(resultados)
+        if faltan > 0:
+            for datos in qs.exclude(id__in=list(resultados)).values(*_CAMPOS)[:faltan]:
+                resultados[datos["id"]] = datos
+
+    with tramo("sugerir_pacientes"):
+        if q.isdigit():
+            agregar(Paciente.objects.filter(cedula__gte=q, cedula__lt=_siguiente_prefijo(q)).order_by("cedula"))
+        else:
+            agregar(Paciente.objects.filter(nombre__istartswith=q).order_by("nombre"))
+            agregar(Paciente.objects.filter(nombre__icontains=q).order_by("nombre"))
+    return list(resultados.values())
@@ -0,0 +1,244 @@
+"""Diseño del PDF de una proforma con ReportLab.
+
+El logo y las métricas de las fuentes se cargan una vez por proceso. Las
+filas se miden antes de dibujarlas: las descripciones largas se parten en
+varias líneas, cada página nueva repite el encabezado de la tabla y, si se
+muestran precios, el subtotal acumulado se arrastra de una página a otra.
+"""
+import threading
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image
+from reportlab import rl_config
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+# Subir cuando cambie el diseño para que la caché no sirva PDFs viejos.
+VERSION_DISENO = 3
+
+ANCHO, ALTO = letter
+FUENTE = "Helvetica"
+FUENTE_NEGRITA = "Helvetica-Bold"
+
+# Columnas de la tabla de ítems (x de cada columna)
+COL_DESCRIPCION = 100
+COL_CANTIDAD = 300
+COL_PRECIO = 350
+COL_SUBTOTAL = 420
+ANCHO_DESCRIPCION = COL_CANTIDAD - COL_DESCRIPCION - 8
+
+LOGO_ANCHO = 220
+LOGO_ALTO = 90
+LOGO_DPI = 150
+
+INTERLINEA = 12
+RELLENO_FILA = 8
+MARGEN_SUPERIOR = 750
+MARGEN_INFERIOR = 50
+# Las filas no bajan de aquí para dejar lugar al "Van" de la página.
+LIMITE_TABLA = 90
+OBS_Y = 120
+OBS_INTERLINEA = 14
+OBS_X = 200
+OBS_ANCHO = ANCHO - 200
+
+_lock = threading.Lock()
+_logo = None
+_precargado = False
+
+
+def ruta_logo():
+    return Path(settings.BASE_DIR) / "static" / "img" / "logo.png"
+
+
+def precargar():
+    """Decodifica el logo y carga las métricas de las fuentes del proceso."""
+    global _logo, _precargado
+    if _precargado:
+        return
+    with _lock:
+        if _precargado:
+            return
+        for fuente in (FUENTE, FUENTE_NEGRITA):
+            pdfmetrics.getFont(fuente)
+        # Los flujos binarios evitan la codificación ASCII85, que es lenta.
+        rl_config.useA85 = 0
+        try:
+            with Image.open(ruta_logo()) as imagen:
+                imagen.load()
+                # reportlab no maneja la transparencia de los PNG con paleta.
+                if imagen.mode not in ("RGB", "RGBA"):
+                    imagen = imagen.convert("RGBA")
+                # Se reduce a la resolución con que se dibuja (LOGO_DPI).
+                escala = LOGO_DPI / 72
+                tamano = (round(LOGO_ANCHO * escala), round(LOGO_ALTO * escala))
+                if imagen.width > tamano[0] or imagen.height > tamano[1]:
+                    imagen.thumbnail(tamano, Image.LANCZOS)
+                _logo = ImageReader(imagen.copy())
+        except Exception:
+            _logo = None
+        _precargado = True
+
+
+def _dinero(valor):
+    return f"{valor:.2f}"
+
+
+class _Pagina:
+    """Cursor sobre el lienzo que sabe cuándo saltar de página."""
+
+    def __init__(self, p, prof, mostrar_precios):
+        self.p = p
+        self.prof = prof
+        self.mostrar_precios = mostrar_precios
+        self.acumulado = 0
+        self.paginas = 1
+        self.y = self._primera_pagina()
+
+    def _primera_pagina(self):
+        p = self.p
+        if _logo is not None:
+            p.drawImage(_logo, (ANCHO - LOGO_ANCHO) / 2, ALTO - 120,
+                        width=LOGO_ANCHO, height=LOGO_ALTO, mask="auto")
+
+        titulo_y = ALTO - 150
+        p.setFont(FUENTE_NEGRITA, 16)
+        p.drawCentredString(ANCHO / 2, titulo_y, "Proforma")
+
+        p.setFont(FUENTE, 10)
+        p.drawString(100, titulo_y - 20, f"Número: {self.prof.numero}")
+        p.drawString(100, titulo_y - 35, f"Paciente: {self.prof.paciente.nombre}")
+        p.drawString(100, titulo_y - 50, f"Fecha: {self.prof.fecha.strftime('%d/%m/%Y')}")
+
+        # Línea divisoria debajo del encabezado
+        y_linea = titulo_y - 65
+        p.setLineWidth(0.8)
+        p.line(80, y_linea, ANCHO - 80, y_linea)
+        return y_linea - 20
+
+    def encabezado_tabla(self):
+        p = self.p
+        p.setFont(FUENTE_NEGRITA, 10)
+        p.drawString(COL_DESCRIPCION, self.y, "Descripción")
+        p.drawString(COL_CANTIDAD, self.y, "Cant.")
+        if self.mostrar_precios:
+            p.drawString(COL_PRECIO, self.y, "P.Unit")
+            p.drawString(COL_SUBTOTAL, self.y, "Subtotal")
+        p.setFont(FUENTE, 10)
+
+    def nueva_pagina(self, con_tabla=True):
+        p = self.p
+        if con_tabla and self.mostrar_precios:
+            p.setFont(FUENTE_NEGRITA, 10)
+            p.drawString(COL_PRECIO, LIMITE_TABLA - 20, "Van:")
+            p.drawString(COL_SUBTOTAL, LIMITE_TABLA - 20, _dinero(self.acumulado))
+        p.showPage()
+        self.paginas += 1
+
+        p.setFont(FUENTE, 9)
+        p.drawString(80, MARGEN_SUPERIOR + 10, f"Proforma {self.prof.numero} - {self.prof.paciente.nombre} (continuación)")
+        p.setLineWidth(0.5)
+        p.line(80, MARGEN_SUPERIOR + 5, ANCHO - 80, MARGEN_SUPERIOR + 5)
+        self.y = MARGEN_SUPERIOR - 15
+        if con_tabla:
+            self.encabezado_tabla()
+            if self.mostrar_precios:
+                self.y -= 16
+                p.setFont(FUENTE_NEGRITA, 10)
+                p.drawString(COL_PRECIO, self.y, "Vienen:")
+                p.drawString(COL_SUBTOTAL, self.y, _dinero(self.acumulado))
+                p.setFont(FUENTE, 10)
+
+    def fila(self, item):
+        lineas = simpleSplit(item.descripcion or "", FUENTE, 10, ANCHO_DESCRIPCION) or [""]
+        alto = len(lineas) * INTERLINEA + RELLENO_FILA
+        if self.y - alto < LIMITE_TABLA:
+            self.nueva_pagina()
+
+        p = self.p
+        self.y -= alto
+        base = self.y + (len(lineas) - 1) * INTERLINEA
+        for i, linea in enumerate(lineas):
+            p.drawString(COL_DESCRIPCION, base - i * INTERLINEA, linea)
+        p.drawString(COL_CANTIDAD, base, str(item.cantidad))
+        if self.mostrar_precios:
+            p.drawString(COL_PRECIO, base, _dinero(item.precio_unitario))
+            p.drawString(COL_SUBTOTAL, base, _dinero(item.subtotal))
+        self.acumulado += item.subtotal
+
+    def total(self):
+        # Subtotal e IVA solo si la proforma cobra IVA (las anteriores no lo tienen).
+        lineas = []
+        if self.prof.iva_porcentaje:
+            lineas = [("Subtotal:", self.prof.subtotal),
+                      (f"IVA {self.prof.iva_porcentaje.normalize():f}%:", self.prof.iva)]
+        alto = 40 + 16 * len(lineas)
+        if self.y - alto < LIMITE_TABLA:
+            self.nueva_pagina(con_tabla=False)
+        self.y -= 24
+        p = self.p
+        p.setFont(FUENTE, 10)
+        for etiqueta, valor in lineas:
+            p.drawString(COL_PRECIO, self.y, etiqueta)
+            p.drawString(COL_SUBTOTAL, self.y, _dinero(valor))
+            self.y -= 16
+        self.y -= 16
+        p.setFont(FUENTE_NEGRITA, 12)
+        p.drawString(COL_PRECIO, self.y, "Total:")
+        p.drawString(COL_SUBTOTAL, self.y, _dinero(self.prof.total))
+
+    def observaciones(self):
+        texto = self.prof.observaciones or ""
+        lineas = simpleSplit(texto, FUENTE, 10, OBS_ANCHO) if texto else [""]
+        # El bloque va al pie; si es más largo que el pie, crece hacia arriba.
+        obs_y = max(OBS_Y, MARGEN_INFERIOR + OBS_INTERLINEA * (len(lineas) - 1))
+        if obs_y + 20 > MARGEN_SUPERIOR:
+            obs_y = MARGEN_SUPERIOR - 20  # no entra en una página: sigue en las próximas
+        if obs_y + 40 > self.y:
+            self.nueva_pagina(con_tabla=False)
+
+        p = self.p
+        p.setLineWidth(0.8)
+        p.line(80, obs_y + 20, ANCHO - 80, obs_y + 20)
+        p.setFont(FUENTE_NEGRITA, 10)
+        p.drawString(100, obs_y, "Observaciones:")
+        p.setFont(FUENTE, 10)
+        y = obs_y
+        for linea in lineas:
+            if y < MARGEN_INFERIOR:
+                self.nueva_pagina(con_tabla=False)
+                p.setFont(FUENTE, 10)
+                y = self.y
+            p.drawString(OBS_X, y, linea)
+            y -= OBS_INTERLINEA
+
+
+def dibujar_proforma(p, prof, mostrar_precios, items=None):
+    """Dibuja la proforma en ``p`` a partir de una página nueva.
+
+    Devuelve la cantidad de páginas usadas.
+    """
+    precargar()
+    if items is None:
+        items = prof.items.all()
+    pagina = _Pagina(p, prof, mostrar_precios)
+    pagina.encabezado_tabla()
+    for item in items:
+        pagina.fila(item)
+    pagina.total()
+    pagina.observaciones()
+    p.showPage()
+    return pagina.paginas
+
+
+def render_proforma(prof, mostrar_precios, items=None):
+    """Devuelve los bytes del PDF de ``prof``."""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    dibujar_proforma(p, prof, mostrar_precios, items)
+    p.save()
+    return buffer.getvalue()
@@ -0,0 +1,127 @@
+"""Caché en disco de los PDF de proformas.
+
+Cada archivo se nombra ``<numero>-<variante>-<huella>.pdf``: la huella resume
+el encabezado, los ítems, las observaciones y la versión del diseño, así que
+un cambio en la proforma nunca devuelve un PDF viejo. Cuando el directorio
+supera ``PDF_CACHE_MAX_BYTES`` se borran primero los archivos usados hace más
+tiempo (según su fecha de último acceso).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from . import pdf_pool
+from .pdf import VERSION_DISENO
+
+_recorte_lock = threading.Lock()
+
+
+def _directorio():
+    return Path(getattr(settings, "PDF_CACHE_DIR", Path(settings.BASE_DIR) / "cache" / "pdf"))
+
+
+def _maximo():
+    return getattr(settings, "PDF_CACHE_MAX_BYTES", 200 * 1024 * 1024)
+
+
+def huella(prof, items, mostrar_precios):
+    """Hash del contenido que se dibuja en el PDF."""
+    datos = [
+        VERSION_DISENO,
+        prof.numero,
+        prof.paciente.nombre,
+        prof.fecha.isoformat(),
+        str(prof.subtotal),
+        str(prof.iva),
+        str(prof.total),
+        prof.observaciones or "",
+        bool(mostrar_precios),
+        [(i.descripcion, i.cantidad, str(i.precio_unitario), str(i.subtotal)) for i in items],
+    ]
+    return hashlib.sha256(json.dumps(datos, ensure_ascii=False).encode()).hexdigest()[:32]
+
+
+def _ruta(numero, mostrar_precios, firma):
+    variante = "p" if mostrar_precios else "s"
+    return _directorio() / f"{numero}-{variante}-{firma}.pdf"
+
+
+def ubicar(prof, items, mostrar_precios):
+    """``(ruta, huella)`` del PDF en la caché, exista o no."""
+    firma = huella(prof, items, mostrar_precios)
+    return _ruta(prof.numero, mostrar_precios, firma), firma
+
+
+def abrir(prof, items, mostrar_precios):
+    """Abre el PDF en caché, generándolo si hace falta.
+
+    Devuelve ``(archivo, huella, fecha_de_modificacion)``; el archivo queda
+    abierto aunque el recorte lo borre mientras se envía. Si hay que generarlo
+    y el pool está saturado se propaga ``pdf_pool.Saturado``.
+    """
+    ruta, firma = ubicar(prof, items, mostrar_precios)
+    try:
+        archivo = open(ruta, "rb")
+    except FileNotFoundError:
+        pdf_pool.generar(ruta, prof, items, mostrar_precios)
+        archivo = open(ruta, "rb")
+    modificado = os.fstat(archivo.fileno()).st_mtime
+    # El último acceso decide qué se recorta primero; la fecha de modificación no cambia.
+    try:
+        os.utime(ruta, (time.time(), modificado))
+    except FileNotFoundError:
+        pass
+    return archivo, firma, modificado
+
+
+def guardar(ruta, contenido):
+    """Escritura atómica: otros procesos nunca ven un archivo a medias."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=ruta.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+    recortar(ruta.parent)
+
+
+def invalidar(numero):
+    """Borra todas las variantes guardadas de una proforma."""
+    directorio = _directorio()
+    if not directorio.exists():
+        return
+    for ruta in directorio.glob(f"{numero}-*.pdf"):
+        ruta.unlink(missing_ok=True)
+
+
+def recortar(directorio=None):
+    """Libera espacio borrando los PDF menos usados si se pasó del máximo."""
+    maximo = _maximo()
+    if not _recorte_lock.acquire(blocking=False):
+        return
+    try:
+        archivos = []
+        total = 0
+        for entrada in os.scandir(directorio or _directorio()):
+            if entrada.name.endswith(".pdf"):
+                info = entrada.stat()
+                archivos.append((info.st_atime, info.st_size, entrada.path))
+                total += info.st_size
+        if total <= maximo:
+            return
+        # Se recorta hasta el 90% para no hacerlo en cada escritura.
+        for _, tamano, ruta in sorted(archivos):
+            if total <= maximo * 0.9:
+                break
+            try:
+                os.remove(ruta)
+                total -= tamano
+            except FileNotFoundError:
+                pass
+    finally:
+        _recorte_lock.release()
@@ -0,0 +1,214 @@
+"""Pool de procesos para generar los PDF de proformas fuera del hilo de la petición.
+
+Los procesos se crean una vez por worker web, ya con las fuentes y el logo
+cargados (``pdf.precargar``), y cada uno escribe el PDF directamente en la
+caché en disco. La petición espera como máximo ``PDF_POOL_TIMEOUT`` segundos;
+si el PDF tarda más, el proceso termina su trabajo igual y lo deja en la
+caché, así que el reintento lo encuentra listo.
+
+Se admiten a lo sumo ``PDF_POOL_COLA`` PDF en vuelo (generándose o en cola);
+por encima de eso se rechaza la petición con ``Saturado`` para que la vista
+responda 503 con ``Retry-After`` en vez de acumular trabajo.
+
+Las exportaciones masivas (``generar_lote``) usan los mismos procesos, con su
+propio tope: entre todas las del worker hay a lo sumo ``PDF_PROCESOS_LOTE``
+PDF en vuelo y el resto espera turno, sin quitarle lugares a las descargas
+individuales ni crear procesos nuevos.
+
+Con ``PDF_POOL_PROCESOS=0`` se genera en el proceso actual, como antes.
+Se registran dos tramos: ``pdf_cola`` (espera hasta que un proceso toma el
+trabajo) y ``pdf_render`` (lo que tarda el dibujo).
+"""
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturoDemorado
+
+from django.conf import settings
+
+from metricas.registro import observar_tramo, tramo
+
+from . import pdf_cache
+from .pdf import precargar, render_proforma
+
+_lock = threading.Lock()
+_pool = None
+_en_vuelo = 0
+_lote = threading.Condition()
+_lote_en_vuelo = 0
+# True dentro de los procesos del pool (y de los pools propios de generar_lote): ahí se dibuja directamente.
+_en_trabajador = False
+
+
+class Saturado(Exception):
+    """Hay demasiados PDF en vuelo o el PDF no estuvo a tiempo; conviene reintentar."""
+
+    def __init__(self, mensaje, reintentar):
+        super().__init__(mensaje)
+        self.reintentar = reintentar
+
+
+def procesos():
+    return 0 if _en_trabajador else getattr(settings, "PDF_POOL_PROCESOS", 0)
+
+
+def _limite():
+    return getattr(settings, "PDF_POOL_COLA", None) or procesos() * 4
+
+
+def _reintentar():
+    return getattr(settings, "PDF_POOL_REINTENTAR", 5)
+
+
+def iniciar_proceso():
+    """Inicializador de los procesos: Django listo, fuentes y logo cargados."""
+    global _en_trabajador
+    import django
+    django.setup()
+    _en_trabajador = True
+    precargar()
+
+
+def _calentar():
+    return True
+
+
+def _crear(cantidad):
+    # spawn: no se hereda el estado (hilos, conexiones) del servidor web.
+    return ProcessPoolExecutor(max_workers=cantidad, initializer=iniciar_proceso,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+def _obtener_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            cantidad = procesos()
+            _pool = _crear(cantidad)
+            for _ in range(cantidad):
+                _pool.submit(_calentar)
+        return _pool
+
+
+def cerrar():
+    """Termina el pool (se vuelve a crear en la próxima petición)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _reservar():
+    global _en_vuelo
+    with _lock:
+        if _en_vuelo >= _limite():
+            return False
+        _en_vuelo += 1
+        return True
+
+
+def _liberar(_futuro=None):
+    global _en_vuelo
+    with _lock:
+        _en_vuelo -= 1
+
+
+def _renderizar(ruta, prof, items, mostrar_precios):
+    """Se ejecuta en el pool: dibuja, guarda en la caché y devuelve cuándo empezó y cuánto tardó."""
+    inicio = time.time()
+    contenido = render_proforma(prof, mostrar_precios, items)
+    pdf_cache.guardar(ruta, contenido)
+    return inicio, time.time() - inicio
+
+
+def generar(ruta, prof, items, mostrar_precios):
+    """Deja en ``ruta`` el PDF de la proforma, en el pool si está activo."""
+    if not procesos():
+        with tramo("pdf_render"):
+            pdf_cache.guardar(ruta, render_proforma(prof, mostrar_precios, items))
+        return
+
+    if not _reservar():
+        raise Saturado("⏳ Se están generando muchos PDF; intente de nuevo en unos segundos.", _reintentar())
+    encolado = time.time()
+    try:
+        futuro = _obtener_pool().submit(_renderizar, ruta, prof, items, mostrar_precios)
+    except Exception:
+        _liberar()
+        raise
+    # El lugar se libera cuando el proceso termina, no cuando la petición se rinde.
+    futuro.add_done_callback(_liberar)
+    try:
+        inicio, segundos = futuro.result(timeout=getattr(settings, "PDF_POOL_TIMEOUT", 30))
+    except FuturoDemorado:
+        raise Saturado("⏳ El PDF está tardando más de lo normal; intente de nuevo en unos segundos.",
+                       _reintentar())
+    observar_tramo("pdf_cola", max(0.0, inicio - encolado))
+    observar_tramo("pdf_render", segundos)
+
+
+def _limite_lote():
+    return getattr(settings, "PDF_PROCESOS_LOTE", 0) or 2
+
+
+def _reservar_lote():
+    """Espera un lugar: una exportación ya empezó a enviarse, así que no se responde 503."""
+    global _lote_en_vuelo
+    with _lote:
+        _lote.wait_for(lambda: _lote_en_vuelo < _limite_lote())
+        _lote_en_vuelo += 1
+
+
+def _liberar_lote(_futuro=None):
+    global _lote_en_vuelo
+    with _lote:
+        _lote_en_vuelo -= 1
+        _lote.notify_all()
+
+
+def _en_orden(pool, trabajos, reservar, liberar):
+    pendientes = deque()
+    for trabajo in trabajos:
+        futuro = None
+        if not trabajo[0].exists():
+            reservar()
+            try:
+                futuro = pool.submit(_renderizar, *trabajo)
+            except Exception:
+                liberar()
+                raise
+            futuro.add_done_callback(liberar)
+        pendientes.append((trabajo, futuro))
+        while pendientes and (pendientes[0][1] is None or pendientes[0][1].done()):
+            trabajo, futuro = pendientes.popleft()
+            if futuro is not None:
+                futuro.result()
+            yield trabajo
+    for trabajo, futuro in pendientes:
+        if futuro is not None:
+            futuro.result()
+        yield trabajo
+
+
+def generar_lote(trabajos, propios=None):
+    """Genera los PDF de una exportación y devuelve cada trabajo, en orden, cuando está listo.
+
+    ``trabajos`` son ``(ruta, prof, items, mostrar_precios)``; los que ya están
+    en la caché no se vuelven a generar. ``propios`` (solo para comandos, fuera
+    del servidor web) usa un pool aparte de ese tamaño.
+    """
+    if propios:
+        ventana = threading.BoundedSemaphore(propios * 2)
+        with _crear(propios) as pool:
+            yield from _en_orden(pool, trabajos, ventana.acquire, lambda _futuro=None: ventana.release())
+        return
+    if not procesos():
+        for ruta, prof, items, mostrar_precios in trabajos:
+            if not ruta.exists():
+                with tramo("pdf_render"):
+                    pdf_cache.guardar(ruta, render_proforma(prof, mostrar_precios, items))
+            yield ruta, prof, items, mostrar_precios
+        return
+    yield from _en_orden(_obtener_pool(), trabajos, _reservar_lote, _liberar_lote)
@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from config import versiones
+
+from . import busqueda, pacientes, pdf_cache
+from .models import Paciente, Proforma, ProformaItem
+
+
+@receiver([post_save, post_delete], sender=Proforma)
+def proforma_modificada(sender, instance, **kwargs):
+    """Descarta los PDF guardados de la proforma."""
+    numero = instance.numero
+    transaction.on_commit(lambda: pdf_cache.invalidar(numero))
+
+
+@receiver(post_save, sender=Proforma)
+def proforma_guardada(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and "paciente" not in update_fields):
+        return
+    # Al crearla no tiene ítems todavía; crear_con_items y las señales de ítems la completan.
+    busqueda.indexar(instance, [] if created else None)
+
+
+@receiver(post_delete, sender=Proforma)
+def proforma_borrada(sender, instance, **kwargs):
+    busqueda.quitar(instance.numero)
+
+
+@receiver([post_save, post_delete], sender=ProformaItem)
+def item_modificado(sender, instance, raw=False, origin=None, **kwargs):
+    numero = instance.proforma_id
+    transaction.on_commit(lambda: pdf_cache.invalidar(numero))
+    # Si se borra la proforma entera, sus ítems no se reindexan uno por uno.
+    borrando_proforma = getattr(origin, "model", type(origin)) is Proforma
+    if not raw and not borrando_proforma:
+        busqueda.indexar(instance.proforma)
+
+
+@receiver([post_save, post_delete], sender=Paciente)
+def paciente_guardado(sender, instance, **kwargs):
+    """Borra la entrada de la caché de búsqueda (también la de "no existe")."""
+    cedula = instance.cedula
+    transaction.on_commit(lambda: pacientes.invalidar(cedula))
+
+
+@receiver(pre_save, sender=Paciente)
+def paciente_por_guardar(sender, instance, raw=False, update_fields=None, **kwargs):
+    """En un ``save()`` completo recuerda el nombre y la cédula indexados."""
+    instance._indexado = None
+    if not raw and not instance._state.adding and update_fields is None:
+        instance._indexado = Paciente.objects.filter(pk=instance.pk).values_list("nombre", "cedula").first()
+
+
+@receiver(post_save, sender=Paciente)
+def paciente_modificado(sender, instance, created, update_fields=None, **kwargs):
+    """El nombre del paciente aparece en el PDF de todas sus proformas."""
+    if created:
+        return
+    numeros = list(instance.proforma_set.values_list("numero", flat=True))
+    # Solo se reindexan sus proformas si cambió lo que el índice guarda del paciente.
+    if update_fields is None:
+        cambio = getattr(instance, "_indexado", None) != (instance.nombre, instance.cedula)
+    else:
+        cambio = bool({"nombre", "cedula"} & set(update_fields))
+    if cambio:
+        busqueda.indexar_consulta(instance.proforma_set.all())
+
+    def invalidar_todas():
+        for numero in numeros:
+            pdf_cache.invalidar(numero)
+
+    transaction.on_commit(invalidar_todas)
+
+
+def _invalidar_listado():
+    versiones.invalidar("proformas")
+
+
+@receiver([post_save, post_delete], sender=Proforma)
+@receiver([post_save, post_delete], sender=ProformaItem)
+@receiver([post_save, post_delete], sender=Paciente)
+def listado_modificado(sender, **kwargs):
+    """Nueva versión del listado: deja de responder 304 y descarta sus fragmentos."""
+    transaction.on_commit(_invalidar_listado)
@@ -0,0 +1,414 @@
+import csv
+import io
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+import openpyxl
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalogo import precios
+from catalogo.models import Servicio
+from metricas import registro
+
+from . import pacientes, pdf_cache, pdf_pool, views, vinculacion
+from .models import Paciente, Proforma, ProformaItem
+
+
+class ProformaCreateTests(TestCase):
+    def setUp(self):
+        Paciente.objects.create(cedula="0102030405", nombre="Ana Pérez")
+
+    def _crear(self, cantidad_items):
+        datos = {
+            "cedula": "0102030405",
+            "nombre": "Ana Pérez",
+            "observaciones": "",
+            "item_descripcion[]": [f"Servicio {i}" for i in range(cantidad_items)],
+            "item_cantidad[]": ["3"] * cantidad_items,
+            "item_precio[]": ["0.10"] * cantidad_items,
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("proforma_create"), datos)
+        self.assertEqual(response.status_code, 302)
+        return len(ctx.captured_queries)
+
+    def test_consultas_no_dependen_de_la_cantidad_de_items(self):
+        self.assertEqual(self._crear(1), self._crear(50))
+
+    def test_totales_con_decimal(self):
+        self._crear(3)
+        prof = Proforma.objects.get()
+        # El IVA (12 % por defecto) se calcula una vez sobre el subtotal.
+        self.assertEqual((prof.subtotal, prof.iva_porcentaje), (Decimal("0.90"), Decimal("12")))
+        self.assertEqual((prof.iva, prof.total), (Decimal("0.11"), Decimal("1.01")))
+        self.assertEqual(
+            list(prof.items.values_list("subtotal", flat=True)),
+            [Decimal("0.30")] * 3,
+        )
+
+    def _post(self, precios, cantidades):
+        return self.client.post(reverse("proforma_create"), {
+            "cedula": "0102030405", "nombre": "Ana Pérez", "observaciones": "",
+            "item_descripcion[]": [f"Servicio {i}" for i in range(len(precios))],
+            "item_precio[]": precios, "item_cantidad[]": cantidades,
+        })
+
+    def test_filas_invalidas_se_omiten(self):
+        response = self._post(["1", "1e30", "1", "NaN", "abc", "5", "99999999", "2.50"],
+                              ["inf", "1", "1e30", "1", "1", "-1", "2", "2"])
+        self.assertEqual(response.status_code, 302)
+        prof = Proforma.objects.get()
+        self.assertEqual(list(prof.items.values_list("descripcion", "subtotal")), [("Servicio 7", Decimal("5.00"))])
+
+    def test_total_fuera_de_rango(self):
+        response = self._post(["60000000", "40000000"], ["1", "1"])
+        self.assertContains(response, "El total de la proforma supera")
+        self.assertFalse(Proforma.objects.exists())
+
+    def test_recomputar(self):
+        self._crear(2)
+        prof = Proforma.objects.get()
+        prof.items.update(subtotal=0)
+        prof.total = 0
+        prof.recomputar()
+        prof.refresh_from_db()
+        self.assertEqual((prof.subtotal, prof.iva, prof.total), (Decimal("0.60"), Decimal("0.07"), Decimal("0.67")))
+
+    @override_settings(IVA_PORCENTAJE=Decimal("0"))
+    def test_sin_iva(self):
+        self._crear(3)
+        prof = Proforma.objects.get()
+        self.assertEqual((prof.subtotal, prof.iva, prof.total), (Decimal("0.90"), Decimal("0.00"), Decimal("0.90")))
+
+
+class ProformaBusquedaTests(TestCase):
+    def setUp(self):
+        ana = Paciente.objects.create(cedula="0102030405", nombre="Ana Pérez")
+        luis = Paciente.objects.create(cedula="0911111111", nombre="Luis Mora")
+        self.ana = Proforma.objects.crear_con_items(
+            [ProformaItem(descripcion="Ecografía abdominal", cantidad=1, precio_unitario=Decimal("30"))],
+            paciente=ana,
+        )
+        self.luis = Proforma.objects.crear_con_items(
+            [ProformaItem(descripcion="Hemograma", cantidad=1, precio_unitario=Decimal("8"))],
+            paciente=luis,
+        )
+
+    def _numeros(self, **params):
+        response = self.client.get(reverse("proforma_list"), params)
+        self.assertEqual(response.status_code, 200)
+        return [p.numero for p in response.context["pagina"]["proformas"]]
+
+    def test_busca_sin_tildes_y_por_prefijo(self):
+        self.assertEqual(self._numeros(q="perez"), [self.ana.numero])
+        self.assertEqual(self._numeros(q="ECOGRAF"), [self.ana.numero])
+        self.assertEqual(self._numeros(q="0911"), [self.luis.numero])
+
+    def test_numero_exacto(self):
+        self.assertEqual(self._numeros(q=str(self.luis.numero)), [self.luis.numero])
+
+    def test_numero_primero_y_luego_las_demas_coincidencias(self):
+        Proforma.objects.crear_con_items(
+            [ProformaItem(descripcion="Glucosa", cantidad=1, precio_unitario=Decimal("3"))],
+            paciente=self.ana.paciente, numero=911,
+        )
+        # "0911" es la proforma 911 y también el comienzo de la cédula de Luis.
+        self.assertEqual(self._numeros(q="0911"), [911, self.luis.numero])
+        self.assertEqual(self._numeros(q="911"), [911])
+
+    def test_indice_sigue_los_cambios(self):
+        paciente = self.luis.paciente
+        paciente.nombre = "Luisa Vera"
+        paciente.save(update_fields=["nombre"])
+        self.assertEqual(self._numeros(q="vera"), [self.luis.numero])
+        self.ana.items.first().delete()
+        self.assertEqual(self._numeros(q="ecografia"), [])
+        self.luis.delete()
+        self.assertEqual(self._numeros(q="hemograma"), [])
+
+    def test_paginacion_por_numero(self):
+        paciente = self.ana.paciente
+        for _ in range(views.POR_PAGINA):
+            Proforma.objects.crear_con_items([], paciente=paciente)
+        primera = self.client.get(reverse("proforma_list"), {"q": "ana"}).context["pagina"]
+        self.assertEqual(len(primera["proformas"]), views.POR_PAGINA)
+        self.assertEqual(self._numeros(q="ana", antes=primera["siguiente"]), [self.ana.numero])
+
+
+class PacienteBusquedaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Paciente.objects.create(cedula="0102030405", nombre="Ana Pérez")
+        Paciente.objects.create(cedula="0102999999", nombre="Mariana Ruiz")
+
+    def test_cache_por_cedula(self):
+        url = reverse("buscar_paciente")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {"cedula": "0102030405"})
+            respuesta = self.client.get(url, {"cedula": "0102030405"}).json()
+        self.assertEqual(respuesta["nombre"], "Ana Pérez")
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(pacientes.estadisticas()["aciertos"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Paciente.objects.filter(cedula="0102030405").get().save()
+        self.client.get(url, {"cedula": "0102030405"})
+        self.assertEqual(pacientes.estadisticas()["fallos"], 2)
+
+    def test_crear_solo_escribe_los_campos_que_cambiaron(self):
+        def guardar(datos):
+            peticion = RequestFactory().post(reverse("proforma_create"), {"cedula": "0102030405", **datos})
+            with mock.patch.object(Paciente, "save", autospec=True) as save:
+                views._get_or_create_paciente_from_post(peticion)
+            return save
+
+        self.assertFalse(guardar({"nombre": "Ana Pérez"}).called)
+        self.assertEqual(guardar({"nombre": "Ana Pérez", "celular": "0991234567"}).call_args.kwargs,
+                         {"update_fields": ["celular"]})
+
+    def test_sugerencias_ordenadas(self):
+        url = reverse("sugerir_pacientes")
+        resultados = self.client.get(url, {"q": "0102"}).json()["resultados"]
+        self.assertEqual([r["cedula"] for r in resultados], ["0102030405", "0102999999"])
+        resultados = self.client.get(url, {"q": "ana"}).json()["resultados"]
+        self.assertEqual([r["nombre"] for r in resultados], ["Ana Pérez", "Mariana Ruiz"])
+        self.assertEqual(len(self.client.get(url, {"q": "ana", "limite": 1}).json()["resultados"]), 1)
+
+
+class EstaticosTests(TestCase):
+    def test_nombres_con_hash_comprimidos_y_cache_larga(self):
+        # Solo los estáticos propios (sin los del admin) para que la prueba sea rápida.
+        solo_propios = ["django.contrib.staticfiles.finders.FileSystemFinder"]
+        with tempfile.TemporaryDirectory() as destino, \
+                override_settings(STATIC_ROOT=destino, STATICFILES_FINDERS=solo_propios):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            cliente = Client()
+            url = re.search(r'href="(/static/proformas/base\.\w+\.css)"',
+                            cliente.get(reverse("proforma_list")).content.decode()).group(1)
+            response = cliente.get(url, HTTP_ACCEPT_ENCODING="br, gzip")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Encoding"], "br")
+            self.assertIn("immutable", response["Cache-Control"])
+            response.close()
+
+
+class ListadoCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.paciente = Paciente.objects.create(cedula="0102030405", nombre="Ana Pérez")
+
+    def _crear(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Proforma.objects.crear_con_items(
+                [ProformaItem(descripcion="Hemograma", cantidad=1, precio_unitario=Decimal("8"))],
+                paciente=self.paciente,
+            )
+
+    def test_304_hasta_que_cambian_los_datos(self):
+        self._crear()
+        url = reverse("proforma_list")
+        response = self.client.get(url)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Sin ETag se vuelve a generar la página, pero la tabla sale de la caché.
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), "Ana Pérez")
+
+        nueva = self._crear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse("proforma_detail", args=[nueva.numero]))
+
+
+class PdfPoolTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.addCleanup(pdf_pool.cerrar)
+        paciente = Paciente.objects.create(cedula="0102030405", nombre="Ana Pérez")
+        self.prof = Proforma.objects.crear_con_items(
+            [ProformaItem(descripcion="Hemograma", cantidad=1, precio_unitario=Decimal("8"))],
+            paciente=paciente,
+        )
+        self.url = reverse("proforma_pdf", args=[self.prof.numero])
+
+    def test_pool_genera_y_mide_la_espera(self):
+        registro.reiniciar()
+        with override_settings(PDF_CACHE_DIR=self.directorio.name, PDF_POOL_PROCESOS=1):
+            response = self.client.get(self.url)
+            contenido = b"".join(response.streaming_content)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(contenido.startswith(b"%PDF"))
+        _, tramos, _ = registro.instantanea()
+        self.assertLessEqual({"pdf_cola", "pdf_render"}, set(tramos))
+
+    def test_saturado_responde_503(self):
+        with override_settings(PDF_CACHE_DIR=self.directorio.name, PDF_POOL_PROCESOS=1,
+                               PDF_POOL_COLA=2, PDF_POOL_REINTENTAR=7), \
+                mock.patch.object(pdf_pool, "_en_vuelo", 2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+
+    def test_revalidacion_no_genera_el_pdf(self):
+        with override_settings(PDF_CACHE_DIR=self.directorio.name, PDF_POOL_PROCESOS=0):
+            etag = self.client.get(self.url)["ETag"]
+            pdf_cache.invalidar(self.prof.numero)
+            with mock.patch.object(pdf_pool, "generar") as generar, \
+                    mock.patch.object(pdf_cache, "abrir") as abrir:
+                response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        generar.assert_not_called()
+        abrir.assert_not_called()
+
+    def test_exportaciones_simultaneas_respetan_el_tope(self):
+        activos = maximo = 0
+        candado = threading.Lock()
+
+        def renderizar(ruta, prof, items, mostrar_precios):
+            nonlocal activos, maximo
+            with candado:
+                activos += 1
+                maximo = max(maximo, activos)
+            time.sleep(0.02)
+            with candado:
+                activos -= 1
+            pdf_cache.guardar(ruta, b"%PDF")
+
+        items = list(self.prof.items.all())
+
+        def exportar(n):
+            trabajos = [(Path(self.directorio.name) / f"{n}-{i}.pdf", self.prof, items, True) for i in range(6)]
+            return len(list(pdf_pool.generar_lote(trabajos)))
+
+        with override_settings(PDF_CACHE_DIR=self.directorio.name, PDF_POOL_PROCESOS=4, PDF_PROCESOS_LOTE=2), \
+                ThreadPoolExecutor(8) as pool, \
+                mock.patch.object(pdf_pool, "_obtener_pool", return_value=pool), \
+                mock.patch.object(pdf_pool, "_renderizar", renderizar), \
+                ThreadPoolExecutor(2) as clientes:
+            self.assertEqual(list(clientes.map(exportar, [1, 2])), [6, 6])
+        # Dos exportaciones a la vez, pero nunca más de PDF_PROCESOS_LOTE PDF en vuelo.
+        self.assertEqual(maximo, 2)
+
+
+class ExportacionDatosTests(TestCase):
+    def setUp(self):
+        paciente = Paciente.objects.create(cedula="0102030405", nombre="Ana Pérez")
+        Proforma.objects.crear_con_items(
+            [ProformaItem(descripcion="Hemograma", cantidad=2, precio_unitario=Decimal("8")),
+             ProformaItem(descripcion="Glucosa", cantidad=1, precio_unitario=Decimal("3"))],
+            paciente=paciente,
+        )
+        Proforma.objects.create(paciente=paciente)
+
+    def test_una_fila_por_item(self):
+        response = self.client.get(reverse("proforma_exportar"), {"formato": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        texto = b"".join(response.streaming_content).decode("utf-8-sig")
+        filas = list(csv.DictReader(io.StringIO(texto)))
+        self.assertEqual([(f["descripcion"], f["subtotal_item"]) for f in filas],
+                         [("Hemograma", "16.00"), ("Glucosa", "3.00"), ("", "")])
+        self.assertEqual(filas[0]["cedula"], "0102030405")
+
+    def test_comando_xlsx(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = f"{directorio}/proformas.xlsx"
+            call_command("exportar_proformas", salida, stdout=io.StringIO())
+            filas = list(openpyxl.load_workbook(salida).active.iter_rows(values_only=True))
+        self.assertEqual(len(filas), 4)
+        self.assertEqual(filas[1][5:8], ("Hemograma", 2, 8))
+
+
+class VinculacionTests(TestCase):
+    def setUp(self):
+        self.hemograma = Servicio.objects.create(
+            codigo="LAB01", nombre="Hemograma", costo_base=5, pvp_sugerido=8, pvp_corporativo=7,
+            porcentaje_ganancia=40)
+        self.glucosa = Servicio.objects.create(
+            codigo="LAB02", nombre="Glucosa", costo_base=2, pvp_sugerido=3, porcentaje_ganancia=40)
+        precios.recalcular()
+
+    def test_formulario_guarda_servicio_codigo_y_precio(self):
+        self.client.post(reverse("proforma_create"), {
+            "cedula": "0102030405", "nombre": "Ana Pérez", "nivel": precios.CORPORATIVO,
+            "item_descripcion[]": ["Hemograma", "Manual", "Perdido"],
+            "item_cantidad[]": ["1", "1", "1"],
+            "item_precio[]": ["6.50", "2", "1"],
+            "item_servicio[]": [str(self.hemograma.pk), "", "999999"],
+        })
+        items = list(ProformaItem.objects.order_by("id").values_list(
+            "servicio_id", "codigo", "precio_catalogo", "precio_unitario"))
+        self.assertEqual(items, [
+            (self.hemograma.pk, "LAB01", Decimal("7.00"), Decimal("6.50")),
+            (None, "", None, Decimal("2.00")),
+            (None, "", None, Decimal("1.00")),
+        ])
+
+        # Si el servicio se borra, el ítem conserva la copia.
+        self.hemograma.delete()
+        self.assertEqual(ProformaItem.objects.values_list("codigo", flat=True).first(), "LAB01")
+
+    def test_vincular_historicos(self):
+        Servicio.objects.create(codigo="OLD02", nombre="GLUCOSA", costo_base=2, pvp_sugerido=3,
+                                porcentaje_ganancia=40, activo=False)
+        Servicio.objects.create(codigo="ECO01", nombre="Ecografía", costo_base=2, pvp_sugerido=3,
+                                porcentaje_ganancia=40)
+        Servicio.objects.create(codigo="ECO02", nombre="ECOGRAFIA", costo_base=2, pvp_sugerido=3,
+                                porcentaje_ganancia=40)
+        paciente = Paciente.objects.create(cedula="0102030405", nombre="Ana Pérez")
+        Proforma.objects.crear_con_items([
+            ProformaItem(descripcion=d, cantidad=1, precio_unitario=Decimal("1"))
+            for d in ("hemograma", "Glucosa ", "Ecografía", "Otro")
+        ], paciente=paciente)
+
+        out = io.StringIO()
+        call_command("vincular_items", "--lote", "2", stdout=out)
+        self.assertIn("2 de 4", out.getvalue())
+        # El nombre repetido entre dos activos es ambiguo; el inactivo pierde contra el activo.
+        self.assertEqual(
+            list(ProformaItem.objects.order_by("id").values_list("servicio_id", "codigo")),
+            [(self.hemograma.pk, "LAB01"), (self.glucosa.pk, "LAB02"), (None, ""), (None, "")],
+        )
+        self.assertEqual(vinculacion.vincular(), (2, 0))
+
+
+class DuplicarTests(TestCase):
+    def setUp(self):
+        self.paciente = Paciente.objects.create(cedula="0102030405", nombre="Ana Pérez")
+
+    def _duplicar(self, cantidad_items):
+        prof = Proforma.objects.crear_con_items([
+            ProformaItem(descripcion=f"Servicio {i}", cantidad=2, precio_unitario=Decimal("1.25"), codigo=f"S{i}")
+            for i in range(cantidad_items)
+        ], paciente=self.paciente, iva_porcentaje=Decimal("15"), observaciones="Ayuno")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("proforma_duplicar", args=[prof.numero]))
+        copia = Proforma.objects.latest("numero")
+        self.assertRedirects(response, reverse("proforma_detail", args=[copia.numero]))
+        return prof, copia, len(ctx.captured_queries)
+
+    def test_copia_items_y_totales(self):
+        prof, copia, _ = self._duplicar(3)
+        self.assertNotEqual(copia.numero, prof.numero)
+        self.assertEqual((copia.paciente_id, copia.observaciones, copia.iva_porcentaje, copia.total),
+                         (prof.paciente_id, "Ayuno", prof.iva_porcentaje, prof.total))
+        campos = ("descripcion", "cantidad", "precio_unitario", "subtotal", "codigo")
+        self.assertEqual(list(copia.items.order_by("id").values_list(*campos)),
+                         list(prof.items.order_by("id").values_list(*campos)))
+
+    def test_consultas_no_dependen_de_la_cantidad_de_items(self):
+        self.assertEqual(self._duplicar(1)[2], self._duplicar(40)[2])
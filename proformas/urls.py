@@ -4,8 +4,12 @@ from . import views
 urlpatterns = [
     path("", views.proforma_list, name="proforma_list"),
     path("nueva/", views.proforma_create, name="proforma_create"),
+    path("exportar/", views.proforma_exportar, name="proforma_exportar"),
     path("<int:numero>/", views.proforma_detail, name="proforma_detail"),
     path("<int:numero>/pdf/", views.proforma_pdf, name="proforma_pdf"),
+    path("<int:numero>/duplicar/", views.proforma_duplicar, name="proforma_duplicar"),
     path("<int:numero>/eliminar/", views.proforma_delete, name="proforma_delete"),
     path("buscar-paciente/", views.buscar_paciente, name="buscar_paciente"),  # 👈 nuevo endpoint
+    path("sugerir-pacientes/", views.sugerir_pacientes, name="sugerir_pacientes"),
+    path("buscar-paciente/cache/", views.pacientes_cache, name="pacientes_cache"),
 ]
@@ -1,31 +1,82 @@
+from decimal import Decimal, InvalidOperation
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import FileResponse, JsonResponse
+from django.contrib import messages
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.db import transaction
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.utils import simpleSplit
-
-from .models import Paciente, Proforma, ProformaItem
+from django.db.models import Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_http_methods
+
+from catalogo import paquetes
+from catalogo import precios as catalogo_precios
+from config import condicional, tablas, versiones
+
+from . import busqueda, exportacion_datos, exportacion_pdf, pacientes, pdf_cache, pdf_pool
+from .models import CENTAVOS, Paciente, Proforma, ProformaItem
 from .forms import PacienteInlineForm, ProformaObservForm
 
 
-def proforma_list(request):
-    query = request.GET.get("q", "")
-    proformas = Proforma.objects.select_related("paciente")
+POR_PAGINA = 50
+# Mayor importe que cabe en las columnas DecimalField(max_digits=10, decimal_places=2).
+IMPORTE_MAXIMO = Decimal("99999999.99")
 
-    if query:
-        proformas = (proformas.filter(numero__icontains=query) |
-                     proformas.filter(paciente__nombre__icontains=query) |
-                     proformas.filter(paciente__cedula__icontains=query))
 
-    proformas = proformas.order_by("-numero")[:200]
+def proforma_list(request):
+    """Listado por número descendente, paginado con ``?antes=<numero>``.
+
+    Si la búsqueda es un número, la proforma con ese número va primero y luego
+    las demás coincidencias (cédula, nombre, ítems) del índice de texto
+    completo (o ``icontains`` si la base no lo tiene).
+    Mientras no cambien proformas, ítems ni pacientes la página se revalida con
+    un 304, y la tabla sale de la caché de fragmentos sin consultar la base.
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        antes = int(request.GET.get("antes") or 0) or None
+    except ValueError:
+        return HttpResponseBadRequest("Página inválida.")
+
+    def pagina():
+        proformas = Proforma.objects.select_related("paciente").order_by("-numero")
+        filas = []
+        limite = POR_PAGINA + 1
+        # Más de 9 dígitos ya no es un número de proforma sino, p. ej., una cédula.
+        if query.isdigit() and len(query) <= 9:
+            numero = int(query)
+            if antes is None:
+                filas = list(proformas.filter(numero=numero))
+            # Ya se mostró arriba en la primera página: no se repite en ninguna.
+            proformas = proformas.exclude(numero=numero)
+            limite += 1
+
+        if query:
+            numeros = busqueda.buscar(query, antes, limite)
+            if numeros is None:
+                proformas = proformas.filter(Q(paciente__nombre__icontains=query) |
+                                             Q(paciente__cedula__icontains=query))
+            else:
+                proformas = proformas.filter(numero__in=numeros)
+        if antes:
+            proformas = proformas.filter(numero__lt=antes)
+        filas += proformas[:POR_PAGINA + 1]
+
+        return {
+            "proformas": filas[:POR_PAGINA],
+            "siguiente": filas[POR_PAGINA - 1].numero if len(filas) > POR_PAGINA else None,
+        }
 
-    return render(request, "proformas/proforma_list.html", {
-        "proformas": proformas,
-        "query": query,
-    })
+    return condicional.responder(request, condicional.etag(request, "proformas"), lambda: render(
+        request, "proformas/proforma_list.html", {
+            "pagina": SimpleLazyObject(pagina),
+            "query": query,
+            "antes": antes,
+            "version": versiones.obtener("proformas"),
+        },
+    ))
 
 
 def _get_or_create_paciente_from_post(request):
@@ -48,29 +99,52 @@ def _get_or_create_paciente_from_post(request):
         },
     )
     if not created:
-        if nombre:
-            paciente.nombre = nombre
-        if email:
-            paciente.email = email
-        if celular:
-            paciente.celular = celular
-        if direccion:
-            paciente.direccion = direccion
-        paciente.save()
+        # Solo se escriben los campos que cambiaron (si no cambió nada, no hay UPDATE,
+        # ni se invalida la caché del paciente ni se reindexan sus proformas).
+        cambios = {campo: valor for campo, valor in (
+            ("nombre", nombre), ("email", email), ("celular", celular), ("direccion", direccion),
+        ) if valor and getattr(paciente, campo) != valor}
+        if cambios:
+            for campo, valor in cambios.items():
+                setattr(paciente, campo, valor)
+            paciente.save(update_fields=list(cambios))
 
     return paciente
 
 
+def _leer_item(precio, cantidad):
+    """``(precio, cantidad)`` de una fila del formulario, o ``None`` si hay que omitirla.
+
+    Se omiten los valores no numéricos, infinitos o NaN, las cantidades
+    negativas y los importes que no caben en las columnas.
+    """
+    try:
+        precio, cantidad = Decimal(precio), Decimal(cantidad)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if not (precio.is_finite() and cantidad.is_finite()) or cantidad < 0:
+        return None
+    cantidad = int(cantidad)
+    if abs(precio) > IMPORTE_MAXIMO or abs(precio) * cantidad > IMPORTE_MAXIMO:
+        return None
+    return precio.quantize(CENTAVOS), cantidad
+
+
+def _formulario_con_error(request, error):
+    return render(request, "proformas/proforma_form.html", {
+        "p_form": PacienteInlineForm(data=request.POST),
+        "o_form": ProformaObservForm(data=request.POST),
+        "error": error,
+        **_contexto_precios(request.POST.get("nivel")),
+    })
+
+
 @transaction.atomic
 def proforma_create(request):
     if request.method == "POST":
         paciente = _get_or_create_paciente_from_post(request)
         if paciente is None:
-            return render(request, "proformas/proforma_form.html", {
-                "p_form": PacienteInlineForm(data=request.POST),
-                "o_form": ProformaObservForm(data=request.POST),
-                "error": "Debe ingresar una cédula para guardar la proforma."
-            })
+            return _formulario_con_error(request, "Debe ingresar una cédula para guardar la proforma.")
 
         obs_form = ProformaObservForm(request.POST)
         obs_form.is_valid()
@@ -78,40 +152,83 @@ def proforma_create(request):
 
         mostrar_precios = bool(request.POST.get("mostrar_precios"))
 
-        prof = Proforma.objects.create(
+        descs = request.POST.getlist("item_descripcion[]")
+        precios = request.POST.getlist("item_precio[]")
+        cants = request.POST.getlist("item_cantidad[]")
+        # Id del servicio elegido en el autocompletado ("" en los ítems manuales).
+        servicios = request.POST.getlist("item_servicio[]")
+        servicios += [""] * (len(descs) - len(servicios))
+
+        items = []
+        for d, pu, c, s in zip(descs, precios, cants, servicios):
+            valores = _leer_item(pu, c) if (d or "").strip() else None
+            if valores is None:
+                continue
+            items.append(ProformaItem(
+                descripcion=d.strip()[:200],
+                precio_unitario=valores[0],
+                cantidad=valores[1],
+                servicio_id=int(s) if s.isdigit() else None,
+            ))
+        _, _, total = catalogo_precios.totales(item.precio_unitario * item.cantidad for item in items)
+        if total > IMPORTE_MAXIMO:
+            return _formulario_con_error(request, f"El total de la proforma supera {IMPORTE_MAXIMO}.")
+
+        prof = Proforma.objects.crear_con_items(
+            items,
             paciente=paciente,
             observaciones=observaciones,
+            nivel_precio=catalogo_precios.nivel_valido(request.POST.get("nivel")),
         )
         request.session[f"mostrar_precios_{prof.numero}"] = mostrar_precios
 
-        descs = request.POST.getlist("item_descripcion[]")
-        precios = request.POST.getlist("item_precio[]")
-        cants = request.POST.getlist("item_cantidad[]")
-
-        for d, pu, c in zip(descs, precios, cants):
-            if not (d or "").strip():
-                continue
-            try:
-                pu_val = float(pu)
-                c_val = int(float(c))
-            except Exception:
-                continue
-            ProformaItem.objects.create(
-                proforma=prof,
-                descripcion=d.strip(),
-                precio_unitario=pu_val,
-                cantidad=c_val
-            )
-
-        prof.recomputar()
         return redirect("proforma_detail", numero=prof.numero)
 
     return render(request, "proformas/proforma_form.html", {
         "p_form": PacienteInlineForm(),
         "o_form": ProformaObservForm(),
+        **_contexto_precios(),
     })
 
 
+def _contexto_precios(nivel=None):
+    """Niveles de precio, porcentaje de IVA y paquetes para el formulario de proforma."""
+    return {
+        "niveles": catalogo_precios.NIVELES,
+        "nivel": catalogo_precios.nivel_valido(nivel),
+        "iva_porcentaje": catalogo_precios.iva_porcentaje(),
+        "paquetes": paquetes.listar(),
+    }
+
+
+@require_http_methods(["POST"])
+@transaction.atomic
+def proforma_duplicar(request, numero):
+    """Proforma nueva para el mismo paciente con los mismos ítems y precios.
+
+    Cuesta las mismas consultas que crear una proforma, tenga los ítems que tenga.
+    """
+    prof = get_object_or_404(Proforma.objects.select_related("paciente"), pk=numero)
+    items = [
+        ProformaItem(descripcion=item.descripcion, cantidad=item.cantidad, precio_unitario=item.precio_unitario,
+                     servicio_id=item.servicio_id, codigo=item.codigo, precio_catalogo=item.precio_catalogo)
+        for item in prof.items.all()
+    ]
+    copia = Proforma.objects.crear_con_items(
+        items,
+        paciente=prof.paciente,
+        observaciones=prof.observaciones,
+        iva_porcentaje=prof.iva_porcentaje,
+        nivel_precio=prof.nivel_precio,
+        mostrar_precios=prof.mostrar_precios,
+    )
+    clave = f"mostrar_precios_{prof.numero}"
+    if clave in request.session:
+        request.session[f"mostrar_precios_{copia.numero}"] = request.session[clave]
+    messages.success(request, f"✅ Proforma #{copia.numero} creada a partir de la #{prof.numero}.")
+    return redirect("proforma_detail", numero=copia.numero)
+
+
 def proforma_detail(request, numero):
     prof = get_object_or_404(Proforma.objects.select_related("paciente"), pk=numero)
     items = prof.items.all()
@@ -125,7 +242,7 @@ def proforma_detail(request, numero):
 
 def proforma_pdf(request, numero):
     prof = get_object_or_404(Proforma.objects.select_related("paciente"), pk=numero)
-    items = prof.items.all()
+    items = list(prof.items.all())
 
     if request.GET.get("ocultar") == "1":
         mostrar_precios = False
@@ -136,90 +253,62 @@ def proforma_pdf(request, numero):
 
     request.session[f"mostrar_precios_{prof.numero}"] = mostrar_precios
 
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    page_width, page_height = letter
+    # El ETag es la huella del contenido: si coincide se responde 304 sin abrir ni generar el PDF.
+    _, firma = pdf_cache.ubicar(prof, items, mostrar_precios)
+    etag = quote_etag(firma)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response.headers["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    try:
+        archivo, firma, modificado = pdf_cache.abrir(prof, items, mostrar_precios)
+    except pdf_pool.Saturado as e:
+        response = HttpResponse(str(e), status=503, content_type="text/plain; charset=utf-8")
+        response.headers["Retry-After"] = str(e.reintentar)
+        return response
+    last_modified = int(modificado)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = FileResponse(archivo, as_attachment=True, filename=f"proforma_{prof.numero}.pdf")
+    else:
+        archivo.close()
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-    logo_path = "static/img/logo.png"
+
+def proforma_exportar(request):
+    """Descarga varias proformas como ZIP o un único PDF, o sus datos en CSV o Excel."""
     try:
-        p.drawImage(ImageReader(logo_path), (page_width - 220) / 2, page_height - 120,
-                    width=220, height=90, mask='auto')
-    except Exception:
-        pass
-
-    title_y = page_height - 150
-    p.setFont("Helvetica-Bold", 16)
-    p.drawCentredString(page_width / 2, title_y, "Proforma")
-
-    p.setFont("Helvetica", 10)
-    p.drawString(100, title_y - 20, f"Número: {prof.numero}")
-    p.drawString(100, title_y - 35, f"Paciente: {prof.paciente.nombre}")
-    p.drawString(100, title_y - 50, f"Fecha: {prof.fecha.strftime('%d/%m/%Y')}")
-
-    # 👉 Línea divisoria debajo del encabezado
-    y_line = title_y - 65
-    p.setLineWidth(0.8)
-    p.line(80, y_line, page_width - 80, y_line)
-
-    # Cabecera de ítems
-    y = y_line - 20
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(100, y, "Descripción")
-    p.drawString(300, y, "Cant.")
-    if mostrar_precios:
-        p.drawString(350, y, "P.Unit")
-        p.drawString(420, y, "Subtotal")
-
-    # Cuerpo
-    p.setFont("Helvetica", 10)
-    for item in items:
-        y -= 20
-        if y < 150:  # margen para no pisar el bloque inferior
-            p.showPage()
-            y = 750
-            p.setFont("Helvetica-Bold", 10)
-            p.drawString(100, y, "Descripción")
-            p.drawString(300, y, "Cant.")
-            if mostrar_precios:
-                p.drawString(350, y, "P.Unit")
-                p.drawString(420, y, "Subtotal")
-            p.setFont("Helvetica", 10)
-            y -= 20
-
-        p.drawString(100, y, item.descripcion)
-        p.drawString(300, y, str(item.cantidad))
-        if mostrar_precios:
-            p.drawString(350, y, f"{item.precio_unitario:.2f}")
-            p.drawString(420, y, f"{item.subtotal:.2f}")
-
-    # Total (arriba del bloque observaciones)
-    y -= 40
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(350, y, "Total:")
-    p.drawString(420, y, f"{prof.total:.2f}")
-
-    # 👉 Línea divisoria para observaciones
-    obs_y = 120  # altura fija del bloque inferior
-    p.setLineWidth(0.8)
-    p.line(80, obs_y + 20, page_width - 80, obs_y + 20)
-
-    # Observaciones al pie
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(100, obs_y, "Observaciones:")
-    p.setFont("Helvetica", 10)
-
-    obs_text = prof.observaciones or ""
-    max_width = page_width - 200
-    lines = simpleSplit(obs_text, "Helvetica", 10, max_width) if obs_text else [""]
-
-    offset = 14
-    for i, line in enumerate(lines):
-        p.drawString(200, obs_y - offset * i, line)
-
-    p.showPage()
-    p.save()
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f"proforma_{prof.numero}.pdf")
+        filtro = {
+            "desde": parse_date(request.GET.get("desde") or "") or None,
+            "hasta": parse_date(request.GET.get("hasta") or "") or None,
+            "paciente": (request.GET.get("paciente") or "").strip(),
+            "numero_desde": int(request.GET.get("numero_desde") or 0) or None,
+            "numero_hasta": int(request.GET.get("numero_hasta") or 0) or None,
+        }
+    except ValueError:
+        return HttpResponseBadRequest("Filtro inválido.")
+
+    proformas = exportacion_pdf.filtrar(**filtro)
+    if not proformas.exists():
+        messages.warning(request, "⚠️ No hay proformas que coincidan con el filtro.")
+        return redirect("proforma_list")
+
+    formato = request.GET.get("formato")
+    if formato in tablas.FORMATOS:
+        return tablas.respuesta(request, formato, "proformas", exportacion_datos.ENCABEZADOS,
+                                exportacion_datos.filas(proformas), "Proformas")
+
+    mostrar_precios = request.GET.get("ocultar") != "1"
+    if formato == "pdf":
+        return tablas.transmitir(request, exportacion_pdf.generar_pdf_unico(proformas, mostrar_precios),
+                                 "application/pdf", "proformas.pdf")
+    return tablas.transmitir(request, exportacion_pdf.generar_zip(proformas, mostrar_precios),
+                             "application/zip", "proformas.zip")
 
 
 def proforma_delete(request, numero):
@@ -228,20 +317,32 @@ def proforma_delete(request, numero):
     return redirect("proforma_list")
 
 
-def buscar_paciente(request):
-    cedula = request.GET.get("cedula")
+async def buscar_paciente(request):
+    """Datos de un paciente por cédula exacta (desde la caché si está)."""
+    paciente = await pacientes.aobtener((request.GET.get("cedula") or "").strip())
+    if paciente is None:
+        return JsonResponse({"existe": False})
+    return JsonResponse({
+        "existe": True,
+        "nombre": paciente["nombre"],
+        "email": paciente["email"],
+        "celular": paciente["celular"],
+        "direccion": paciente["direccion"],
+    })
+
+
+def sugerir_pacientes(request):
+    """Coincidencias parciales por cédula o nombre, las más relevantes primero."""
     try:
-        paciente = Paciente.objects.get(cedula=cedula)
-        data = {
-            "existe": True,
-            "nombre": paciente.nombre,
-            "email": paciente.email,
-            "celular": paciente.celular,
-            "direccion": paciente.direccion,
-        }
-    except Paciente.DoesNotExist:
-        data = {"existe": False}
-    return JsonResponse(data)
+        limite = min(max(int(request.GET.get("limite") or pacientes.LIMITE), 1), 50)
+    except ValueError:
+        return HttpResponseBadRequest("Límite inválido.")
+    return JsonResponse({"resultados": pacientes.sugerir(request.GET.get("q", ""), limite)})
+
+
+def pacientes_cache(request):
+    """Contadores de aciertos y fallos de la caché de pacientes."""
+    return JsonResponse(pacientes.estadisticas())
 
 
 # ====== FORMULARIOS ======
@@ -0,0 +1,64 @@
+"""Enlace de los ítems históricos con el catálogo.
+
+Antes de ``ProformaItem.servicio`` los ítems solo guardaban la descripción.
+``vincular`` recorre los ítems sin servicio por bloques de ``id`` y los enlaza
+cuando la descripción coincide (sin mayúsculas ni tildes) con el nombre de un
+único servicio. El catálogo se carga una vez en un diccionario, así que cada
+ítem cuesta una búsqueda en memoria y no una consulta.
+
+El precio del catálogo de esa época no se conoce: en estos ítems
+``precio_catalogo`` queda vacío.
+"""
+from django.db import transaction
+
+from catalogo.indice import normalizar
+from catalogo.models import Servicio
+from config import sql
+
+from .models import ProformaItem
+
+TAMANO_LOTE = 5000
+
+
+def indice_nombres():
+    """``{nombre normalizado: (id, codigo)}`` del catálogo.
+
+    Si dos servicios se llaman igual gana el activo; si los dos están activos
+    (o inactivos) el nombre es ambiguo y queda fuera.
+    """
+    indice, ambiguos = {}, set()
+    filas = Servicio.objects.order_by("-activo", "id").values_list("id", "codigo", "nombre", "activo")
+    for pk, codigo, nombre, activo in filas.iterator(chunk_size=2000):
+        clave = normalizar(nombre)
+        if clave in indice:
+            if indice[clave][2] == activo:
+                ambiguos.add(clave)
+            continue
+        indice[clave] = (pk, codigo, activo)
+    return {clave: (pk, codigo) for clave, (pk, codigo, _) in indice.items() if clave not in ambiguos}
+
+
+def vincular(tamano_lote=TAMANO_LOTE):
+    """Enlaza los ítems sin servicio. Devuelve ``(revisados, vinculados)``."""
+    indice = indice_nombres()
+    claves = {}  # Las descripciones se repiten mucho: se normaliza cada una una vez.
+    revisados = vinculados = 0
+    ultimo = 0
+    while True:
+        bloque = list(ProformaItem.objects.filter(servicio__isnull=True, id__gt=ultimo)
+                      .order_by("id").values_list("id", "descripcion")[:tamano_lote])
+        if not bloque:
+            break
+        filas = []
+        for pk, descripcion in bloque:
+            clave = claves.get(descripcion)
+            if clave is None:
+                clave = claves[descripcion] = normalizar(descripcion)
+            servicio = indice.get(clave)
+            if servicio:
+                filas.append((pk, *servicio))
+        with transaction.atomic():
+            vinculados += sql.actualizar(ProformaItem, ["id"], ["servicio", "codigo"], filas)
+        revisados += len(bloque)
+        ultimo = bloque[-1][0]
+    return revisados, vinculados
@@ -0,0 +1,127 @@
+"""Resúmenes precalculados de las proformas para los reportes.
+
+Hay tres tablas pequeñas:
+
+* ``ResumenDiario``: proformas, subtotal, IVA y total de cada día.
+* ``ResumenServicio``: ítems, cantidad e importe por mes y descripción.
+* ``ResumenPaciente``: proformas y total por mes y paciente.
+
+Con miles de servicios y pacientes, las filas mensuales de un año siguen
+siendo decenas de miles; por eso esas dos tablas también tienen una fila
+``anual`` (``mes`` = 1 de enero) y los reportes leen los años completos de ahí.
+
+Las señales de ``reportes.signals`` las mantienen al día sumando o restando
+la parte de cada proforma que se crea, cambia o borra (``config.sql.acumular``:
+``INSERT ... ON CONFLICT DO UPDATE SET x = x + ...``), en la misma transacción
+que el cambio. ``reconstruir`` las vuelve a calcular desde cero para cargar el
+histórico o corregir desvíos (por ejemplo tras un ``bulk_create`` sin señales).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncYear
+from django.utils import timezone
+
+from config import sql
+from proformas.models import Proforma, ProformaItem
+
+from .models import ResumenDiario, ResumenPaciente, ResumenServicio
+
+TAMANO_LOTE = 1000
+
+
+def dia(fecha):
+    """Día local de una fecha y hora."""
+    return timezone.localdate(fecha)
+
+
+def mes(fecha):
+    return dia(fecha).replace(day=1)
+
+
+def _periodos(inicio):
+    """Claves ``(anual, mes)`` de la fila mensual y la anual de un mes."""
+    return [(False, inicio), (True, inicio.replace(month=1))]
+
+
+def sumar_proforma(fecha, paciente_id, subtotal, iva, total, signo=1):
+    """Suma (o resta, con ``signo=-1``) una proforma al resumen diario y al del paciente."""
+    hoy = dia(fecha)
+    sql.acumular(ResumenDiario, ["fecha"], ["proformas", "subtotal", "iva", "total"],
+                 [(hoy, signo, signo * subtotal, signo * iva, signo * total)])
+    sql.acumular(ResumenPaciente, ["anual", "mes", "paciente"], ["proformas", "total"], [
+        (anual, periodo, paciente_id, signo, signo * total) for anual, periodo in _periodos(hoy.replace(day=1))
+    ])
+
+
+def sumar_items(fecha, items, signo=1):
+    """Suma (o resta) ítems ``(descripcion, cantidad, subtotal)`` al resumen del mes."""
+    grupos = defaultdict(lambda: [0, 0, Decimal(0)])
+    for descripcion, cantidad, subtotal in items:
+        grupo = grupos[descripcion]
+        grupo[0] += 1
+        grupo[1] += cantidad
+        grupo[2] += subtotal
+    sql.acumular(ResumenServicio, ["anual", "mes", "descripcion"], ["items", "cantidad", "importe"], [
+        (anual, periodo, descripcion, signo * n, signo * cantidad, signo * importe)
+        for anual, periodo in _periodos(mes(fecha))
+        for descripcion, (n, cantidad, importe) in grupos.items()
+    ])
+
+
+def items_de(numero):
+    return list(ProformaItem.objects.filter(proforma_id=numero).values_list("descripcion", "cantidad", "subtotal"))
+
+
+def reconstruir():
+    """Recalcula los resúmenes: una consulta agregada por tabla sobre las
+    proformas y otra para pasar las filas mensuales a anuales.
+
+    Devuelve cuántas filas quedaron en cada tabla.
+    """
+    dias = (Proforma.objects.annotate(dia=TruncDate("fecha")).values("dia")
+            .annotate(n=Count("numero"), subtotal=Sum("subtotal"), iva=Sum("iva"), total=Sum("total"))
+            .order_by())
+    servicios = (ProformaItem.objects
+                 .annotate(mes=TruncMonth("proforma__fecha", output_field=DateField()))
+                 .values("mes", "descripcion")
+                 .annotate(n=Count("id"), cantidad=Sum("cantidad"), importe=Sum("subtotal"))
+                 .order_by())
+    pacientes = (Proforma.objects.annotate(mes=TruncMonth("fecha", output_field=DateField()))
+                 .values("mes", "paciente")
+                 .annotate(n=Count("numero"), total=Sum("total"))
+                 .order_by())
+
+    with transaction.atomic():
+        for modelo in (ResumenDiario, ResumenServicio, ResumenPaciente):
+            modelo.objects.all().delete()
+        ResumenDiario.objects.bulk_create((
+            ResumenDiario(fecha=f["dia"], proformas=f["n"], subtotal=f["subtotal"], iva=f["iva"], total=f["total"])
+            for f in dias.iterator()
+        ), batch_size=TAMANO_LOTE)
+        ResumenServicio.objects.bulk_create((
+            ResumenServicio(mes=f["mes"], descripcion=f["descripcion"], items=f["n"],
+                            cantidad=f["cantidad"], importe=f["importe"])
+            for f in servicios.iterator()
+        ), batch_size=TAMANO_LOTE)
+        ResumenPaciente.objects.bulk_create((
+            ResumenPaciente(mes=f["mes"], paciente_id=f["paciente"], proformas=f["n"], total=f["total"])
+            for f in pacientes.iterator()
+        ), batch_size=TAMANO_LOTE)
+
+        anios = ResumenServicio.objects.annotate(anio=TruncYear("mes")).values("anio", "descripcion")
+        ResumenServicio.objects.bulk_create((
+            ResumenServicio(anual=True, mes=f["anio"], descripcion=f["descripcion"], items=f["n"],
+                            cantidad=f["cantidad"], importe=f["importe"])
+            for f in anios.annotate(n=Sum("items"), cantidad=Sum("cantidad"), importe=Sum("importe"))
+            .order_by().iterator()
+        ), batch_size=TAMANO_LOTE)
+        anios = ResumenPaciente.objects.annotate(anio=TruncYear("mes")).values("anio", "paciente")
+        ResumenPaciente.objects.bulk_create((
+            ResumenPaciente(anual=True, mes=f["anio"], paciente_id=f["paciente"], proformas=f["n"], total=f["total"])
+            for f in anios.annotate(n=Sum("proformas"), total=Sum("total")).order_by().iterator()
+        ), batch_size=TAMANO_LOTE)
+    return {modelo.__name__: modelo.objects.count()
+            for modelo in (ResumenDiario, ResumenServicio, ResumenPaciente)}
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from config import versiones
+from reportes import acumulados
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los resúmenes de los reportes (histórico o tras cargas sin señales)."
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        filas = acumulados.reconstruir()
+        versiones.invalidar("proformas")
+        detalle = ", ".join(f"{modelo}: {cantidad}" for modelo, cantidad in filas.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Resúmenes reconstruidos en {time.perf_counter() - inicio:.1f} s ({detalle})."))
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('proformas', '0006_totales_iva'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('proformas', models.IntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('iva', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenServicio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anual', models.BooleanField(default=False, help_text='Fila del año completo (mes = 1 de enero)')),
+                ('mes', models.DateField(help_text='Primer día del mes')),
+                ('descripcion', models.CharField(max_length=200)),
+                ('items', models.IntegerField(default=0)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('anual', 'mes', 'descripcion'), name='resumen_servicio_periodo')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenPaciente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anual', models.BooleanField(default=False, help_text='Fila del año completo (mes = 1 de enero)')),
+                ('mes', models.DateField(help_text='Primer día del mes')),
+                ('proformas', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='proformas.paciente')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('anual', 'mes', 'paciente'), name='resumen_paciente_periodo')],
+            },
+        ),
+    ]
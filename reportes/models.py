@@ -0,0 +1,55 @@
+from django.db import models
+
+from proformas.models import Paciente
+
+
+class ResumenDiario(models.Model):
+    """Proformas emitidas y montos de un día (hora local)."""
+
+    fecha = models.DateField(unique=True)
+    proformas = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    iva = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.fecha}: {self.proformas} proformas"
+
+
+class ResumenServicio(models.Model):
+    """Ítems cotizados de un mes (o de un año, con ``anual``), por descripción."""
+
+    anual = models.BooleanField(default=False, help_text="Fila del año completo (mes = 1 de enero)")
+    mes = models.DateField(help_text="Primer día del mes")
+    descripcion = models.CharField(max_length=200)
+    items = models.IntegerField(default=0)
+    cantidad = models.IntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["anual", "mes", "descripcion"], name="resumen_servicio_periodo"),
+        ]
+
+    def __str__(self):
+        periodo = self.mes.year if self.anual else f"{self.mes:%Y-%m}"
+        return f"{periodo} {self.descripcion}"
+
+
+class ResumenPaciente(models.Model):
+    """Proformas y total cotizado a un paciente en un mes (o en un año, con ``anual``)."""
+
+    anual = models.BooleanField(default=False, help_text="Fila del año completo (mes = 1 de enero)")
+    mes = models.DateField(help_text="Primer día del mes")
+    paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE)
+    proformas = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["anual", "mes", "paciente"], name="resumen_paciente_periodo"),
+        ]
+
+    def __str__(self):
+        periodo = self.mes.year if self.anual else f"{self.mes:%Y-%m}"
+        return f"{periodo} {self.paciente_id}"
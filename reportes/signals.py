@@ -0,0 +1,87 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from proformas.models import Paciente, Proforma, ProformaItem, items_creados
+
+from . import acumulados
+
+# Campos de la proforma que entran en los resúmenes, en el orden de ``sumar_proforma``.
+_CAMPOS = ("fecha", "paciente_id", "subtotal", "iva", "total")
+_CAMPOS_ITEM = ("descripcion", "cantidad", "subtotal")
+
+
+def _valores(instance, campos):
+    return tuple(getattr(instance, campo) for campo in campos)
+
+
+@receiver(pre_save, sender=Proforma)
+def proforma_por_guardar(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Recuerda cómo estaba la proforma para restar su parte vieja al guardarla."""
+    instance._resumen_anterior = None
+    if raw or instance._state.adding:
+        return
+    if update_fields and not {"fecha", "paciente", "subtotal", "iva", "total"} & set(update_fields):
+        return
+    instance._resumen_anterior = Proforma.objects.filter(pk=instance.pk).values_list(*_CAMPOS).first()
+
+
+@receiver(post_save, sender=Proforma)
+def proforma_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    actual = _valores(instance, _CAMPOS)
+    if created:
+        acumulados.sumar_proforma(*actual)
+        return
+    anterior = getattr(instance, "_resumen_anterior", None)
+    if anterior is None or anterior == actual:
+        return
+    acumulados.sumar_proforma(*anterior, signo=-1)
+    acumulados.sumar_proforma(*actual)
+    if acumulados.mes(anterior[0]) != acumulados.mes(actual[0]):
+        items = acumulados.items_de(instance.pk)
+        acumulados.sumar_items(anterior[0], items, signo=-1)
+        acumulados.sumar_items(actual[0], items)
+
+
+@receiver(pre_delete, sender=Proforma)
+def proforma_por_borrar(sender, instance, **kwargs):
+    """Resta la proforma y sus ítems antes de que la cascada los borre."""
+    acumulados.sumar_proforma(*_valores(instance, _CAMPOS), signo=-1)
+    acumulados.sumar_items(instance.fecha, acumulados.items_de(instance.pk), signo=-1)
+
+
+@receiver(items_creados)
+def items_en_bloque(sender, proforma, items, **kwargs):
+    """``crear_con_items`` guarda los ítems con ``bulk_create``, que no emite ``post_save``."""
+    acumulados.sumar_items(proforma.fecha, [_valores(item, _CAMPOS_ITEM) for item in items])
+
+
+@receiver(pre_save, sender=ProformaItem)
+def item_por_guardar(sender, instance, raw=False, **kwargs):
+    instance._resumen_anterior = None
+    if not raw and not instance._state.adding:
+        instance._resumen_anterior = (ProformaItem.objects.filter(pk=instance.pk)
+                                      .values_list(*_CAMPOS_ITEM).first())
+
+
+@receiver(post_save, sender=ProformaItem)
+def item_guardado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, "_resumen_anterior", None)
+    actual = _valores(instance, _CAMPOS_ITEM)
+    if anterior == actual:
+        return
+    fecha = instance.proforma.fecha
+    if anterior is not None:
+        acumulados.sumar_items(fecha, [anterior], signo=-1)
+    acumulados.sumar_items(fecha, [actual])
+
+
+@receiver(post_delete, sender=ProformaItem)
+def item_borrado(sender, instance, origin=None, **kwargs):
+    # Si se borra la proforma (o el paciente), ya se restó en proforma_por_borrar.
+    if getattr(origin, "model", type(origin)) in (Proforma, Paciente):
+        return
+    acumulados.sumar_items(instance.proforma.fecha, [_valores(instance, _CAMPOS_ITEM)], signo=-1)
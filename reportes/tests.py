@@ -0,0 +1,80 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from proformas.models import Paciente, Proforma, ProformaItem
+
+from . import acumulados
+from .models import ResumenDiario, ResumenPaciente, ResumenServicio
+
+
+class ResumenesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = Paciente.objects.create(cedula="0102030405", nombre="Ana Pérez")
+        self.luis = Paciente.objects.create(cedula="0911223344", nombre="Luis Mora")
+        self.fecha = timezone.make_aware(datetime(2025, 3, 10, 23, 30))
+
+    def _crear(self, paciente, *items, fecha=None):
+        return Proforma.objects.crear_con_items(
+            [ProformaItem(descripcion=d, cantidad=c, precio_unitario=Decimal(p)) for d, c, p in items],
+            paciente=paciente, fecha=fecha or self.fecha, iva_porcentaje=Decimal("0"),
+        )
+
+    def _estado(self):
+        return (
+            sorted(ResumenDiario.objects.filter(proformas__gt=0).values_list("fecha", "proformas", "total")),
+            sorted(ResumenServicio.objects.filter(items__gt=0)
+                   .values_list("anual", "mes", "descripcion", "cantidad", "importe")),
+            sorted(ResumenPaciente.objects.filter(proformas__gt=0)
+                   .values_list("anual", "mes", "paciente_id", "proformas", "total")),
+        )
+
+    def test_incremental_coincide_con_reconstruir(self):
+        self._crear(self.ana, ("Hemograma", 2, "8"), ("Glucosa", 1, "3"))
+        segunda = self._crear(self.luis, ("Hemograma", 1, "8"))
+        borrada = self._crear(self.ana, ("Urea", 1, "4"), fecha=timezone.make_aware(datetime(2025, 4, 2, 9)))
+        item = segunda.items.get()
+        item.cantidad = 3
+        item.save()
+        segunda.recomputar()
+        borrada.delete()
+
+        dias, servicios, pacientes = self._estado()
+        # Hora local: la proforma de las 23:30 cuenta en el día 10.
+        self.assertEqual(dias, [(self.fecha.date(), 2, Decimal("43.00"))])
+        self.assertIn((False, self.fecha.date().replace(day=1), "Hemograma", 5, Decimal("40.00")), servicios)
+        self.assertIn((True, self.fecha.date().replace(month=1, day=1), "Hemograma", 5, Decimal("40.00")), servicios)
+        self.assertEqual(len(pacientes), 4)
+
+        incremental = self._estado()
+        acumulados.reconstruir()
+        self.assertEqual(self._estado(), incremental)
+
+    def test_borrar_paciente_resta_sus_proformas(self):
+        self._crear(self.ana, ("Hemograma", 1, "8"))
+        self._crear(self.luis, ("Glucosa", 1, "3"))
+        self.ana.delete()
+        dias, servicios, _ = self._estado()
+        self.assertEqual(dias, [(self.fecha.date(), 1, Decimal("3.00"))])
+        self.assertEqual({s[2] for s in servicios}, {"Glucosa"})
+
+    def test_panel_solo_lee_resumenes(self):
+        self._crear(self.ana, ("Hemograma", 2, "8"))
+        url = reverse("reportes_panel")
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {"desde": "2025-01", "hasta": "2025-12"})
+        self.assertContains(response, "Hemograma")
+        self.assertContains(response, "Ana Pérez")
+        # Con un mes suelto lee las filas mensuales y da lo mismo.
+        parcial = self.client.get(url, {"desde": "2025-03", "hasta": "2025-03"})
+        self.assertEqual(parcial.context["servicios"], response.context["servicios"])
+        self.assertEqual(
+            self.client.get(url, {"desde": "2025-01", "hasta": "2025-12"},
+                            HTTP_IF_NONE_MATCH=response["ETag"]).status_code,
+            304,
+        )
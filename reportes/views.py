@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+
+from django.db.models import Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.shortcuts import render
+from django.utils import timezone
+
+from config import condicional
+from proformas.models import Paciente
+
+from .models import ResumenDiario, ResumenPaciente, ResumenServicio
+
+RANKING = 20
+
+
+def _mes(texto):
+    """``AAAA-MM`` a la fecha del primer día del mes (o ``None``)."""
+    try:
+        anio, mes = (int(parte) for parte in (texto or "").split("-"))
+        return date(anio, mes, 1)
+    except ValueError:
+        return None
+
+
+def _sumar_meses(inicio, meses):
+    indice = inicio.year * 12 + inicio.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _periodo(desde, hasta, actual):
+    """Filtro de resúmenes de servicio/paciente para los meses ``desde``..``hasta``.
+
+    Los años cubiertos enteros (o hasta el mes en curso) se leen de la fila
+    anual; los meses sueltos de los extremos, de las mensuales.
+    """
+    filtro = Q()
+    for anio in range(desde.year, hasta.year + 1):
+        inicio = max(desde, date(anio, 1, 1))
+        ultimo = min(hasta, date(anio, 12, 1))
+        if inicio.month == 1 and (ultimo.month == 12 or (anio == actual.year and ultimo >= actual)):
+            filtro |= Q(anual=True, mes=inicio)
+        else:
+            filtro |= Q(anual=False, mes__gte=inicio, mes__lte=ultimo)
+    return filtro
+
+
+def panel(request):
+    """Ingresos, proformas por mes y los servicios y pacientes principales de un rango de meses.
+
+    Solo se leen los resúmenes (``reportes.acumulados``), nunca las proformas,
+    así que un año entero cuesta unas pocas consultas sobre tablas chicas.
+    Por defecto muestra el año en curso.
+    """
+    actual = timezone.localdate().replace(day=1)
+    hasta = _mes(request.GET.get("hasta")) or actual
+    desde = _mes(request.GET.get("desde")) or hasta.replace(month=1)
+    if desde > hasta:
+        desde, hasta = hasta, desde
+
+    def generar():
+        return render(request, "reportes/panel.html", _datos(desde, hasta, actual))
+
+    return condicional.responder(request, condicional.etag(request, "proformas"), generar)
+
+
+def _datos(desde, hasta, actual):
+    fin = _sumar_meses(hasta, 1)
+    dias = ResumenDiario.objects.filter(fecha__gte=desde, fecha__lt=fin)
+    totales = dias.aggregate(proformas=Sum("proformas"), subtotal=Sum("subtotal"),
+                             iva=Sum("iva"), total=Sum("total"))
+    meses = list(dias.annotate(mes=TruncMonth("fecha")).values("mes")
+                 .annotate(maximo=Max("proformas"), cantidad=Sum("proformas"), monto=Sum("total"))
+                 .order_by("mes"))
+    manana = timezone.localdate() + timedelta(days=1)
+    for fila in meses:
+        # El mes en curso se promedia solo sobre los días transcurridos.
+        dias_mes = (min(_sumar_meses(fila["mes"], 1), manana) - fila["mes"]).days
+        fila["promedio"] = fila["cantidad"] / max(dias_mes, 1)
+
+    periodo = _periodo(desde, hasta, actual)
+    servicios = (ResumenServicio.objects.filter(periodo)
+                 .values("descripcion")
+                 .annotate(items=Sum("items"), cantidad=Sum("cantidad"), importe=Sum("importe"))
+                 .filter(items__gt=0)
+                 .order_by("-importe")[:RANKING])
+    # Agrupar solo por el id (sin unir pacientes) y buscar después los nombres de los 20.
+    pacientes = list(ResumenPaciente.objects.filter(periodo)
+                     .values("paciente_id")
+                     .annotate(proformas=Sum("proformas"), total=Sum("total"))
+                     .filter(proformas__gt=0)
+                     .order_by("-total")[:RANKING])
+    datos = Paciente.objects.only("nombre", "cedula").in_bulk([fila["paciente_id"] for fila in pacientes])
+    for fila in pacientes:
+        fila["paciente__nombre"] = datos[fila["paciente_id"]].nombre
+        fila["paciente__cedula"] = datos[fila["paciente_id"]].cedula
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "totales": totales,
+        "meses": meses,
+        "servicios": list(servicios),
+        "pacientes": pacientes,
+    }